@@ -1,6 +1,7 @@
 import React, { useContext, useEffect, useState } from "react";
 import { ChatContext } from "./context/ChatContext";
 import socketService from "./services/socketServices";
+import { uploadAttachment } from "./services/attachmentService";
 import "../App.css";
 import ChatHeader from "./chat_panel/ChatHeader";
 import ConversationSummary from "./chat_panel/ConversationSummary";
@@ -12,6 +13,9 @@ import AIToolsPanel from "./chat_panel/AIToolsPanel";
 function ChatPanel() {
   // State management
   const [messages, setMessages] = useState([]);
+  const [hasOlderMessages, setHasOlderMessages] = useState(false);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [isLoadingOlder, setIsLoadingOlder] = useState(false);
   const [text, setText] = useState("");
   const [img, setImg] = useState(null);
   const { data } = useContext(ChatContext);
@@ -35,6 +39,7 @@ function ChatPanel() {
     // Join room and fetch messages
     socketService.joinRoom(data.chatId);
     socketService.fetchMessages(data.chatId);
+    socketService.markChatRead(data.chatId, email);
 
     // Set up event listeners
     setupSocketListeners();
@@ -58,7 +63,19 @@ const shouldShowSmartReplies = () => {
   const setupSocketListeners = () => {
     socketService.onMessagesReceived((response) => {
       console.log("Messages fetched:", response.messages);
-      setMessages(response.messages);
+      if (response.is_page && response.direction === "after") {
+        setMessages((prevMessages) => [...prevMessages, ...response.messages]);
+        return;
+      }
+      if (response.is_page) {
+        // Older history page: prepend it
+        setMessages((prevMessages) => [...response.messages, ...prevMessages]);
+        setIsLoadingOlder(false);
+      } else {
+        setMessages(response.messages);
+      }
+      setHasOlderMessages(response.has_more);
+      setOlderCursor(response.before_cursor);
     });
 
     socketService.onNewMessage((newMessage) => {
@@ -68,6 +85,8 @@ const shouldShowSmartReplies = () => {
       console.log("Current user_id:", data.user.user_id);
       
       setMessages((prevMessages) => [...prevMessages, newMessage]);
+      // The chat is open, so the message is already read
+      socketService.markChatRead(data.chatId, email);
       
       // Auto-generate smart replies for received messages
       // Since backend swaps sender/receiver:
@@ -82,6 +101,16 @@ const shouldShowSmartReplies = () => {
       }
     });
 
+    socketService.onMessageAnnotated((annotation) => {
+      setMessages((prevMessages) =>
+        prevMessages.map((message) =>
+          message.message_id === annotation.message_id
+            ? { ...message, ai_analysis: annotation.ai_analysis }
+            : message
+        )
+      );
+    });
+
     socketService.onSmartRepliesGenerated((response) => {
       setSmartReplies(response.suggestions);
     });
@@ -112,13 +141,29 @@ const shouldShowSmartReplies = () => {
     });
   };
 
+  const loadOlderMessages = () => {
+    if (!hasOlderMessages || isLoadingOlder || !olderCursor) return;
+    setIsLoadingOlder(true);
+    socketService.fetchMessages(data.chatId, { before: olderCursor });
+  };
+
   // Message handling
-  const handleSend = () => {
+  const handleSend = async () => {
   if (!text || typeof text !== 'string' || !text.trim()) {
     console.log("No valid text to send");
     return;
   }
 
+  let image = null;
+  if (img) {
+    try {
+      image = await uploadAttachment(img);
+    } catch (error) {
+      console.error("Attachment upload failed:", error);
+      return;
+    }
+  }
+
   const messageData = {
     chat_id: data.chatId,
     sender_id: data.user.user_id,
@@ -126,11 +171,7 @@ const shouldShowSmartReplies = () => {
     receiver_id: receiverId || localStorage.getItem("ReceiverId"),
     receiver_email: email,
     message: text.trim(),
-    image: img ? {
-      file_name: img.name,
-      file_type: img.type,
-      file_data: URL.createObjectURL(img),
-    } : null,
+    image,
   };
 
   console.log("Sending message with data:", messageData);
@@ -249,6 +290,8 @@ const shouldShowSmartReplies = () => {
       {/* Messages Container */}
       <MessagesContainer 
         messages={messages}
+        hasOlderMessages={hasOlderMessages}
+        onLoadOlder={loadOlderMessages}
         currentUserId={data.user.user_id}
         // Note: Backend swaps sender/receiver, so current user's messages have receiver_id matching currentUserId
         isCurrentUserMessage={(message) => message.receiver_id && message.receiver_id.toString() === data.user.user_id.toString()}
@@ -68,7 +68,7 @@ export default function Header({sidebarVisible}) {
   <div className="flex items-center gap-x-4">
     <img
       className="inline-block h-14 w-14 duration-300 rounded-full ring-2 ring-[#FBE6A3]"
-      src={`data:image/jpeg;base64,${user.profile_image}`}
+      src={user.profile_image_url || "https://via.placeholder.com/150"}
       alt=""
     />
     <h3 className="text-2xl">{user.username}</h3>
@@ -1,6 +1,7 @@
 import React, { useState, useContext, useEffect } from "react";
 import io from "socket.io-client";
 import { ChatContext } from "./context/ChatContext";
+import { uploadAttachment } from "./services/attachmentService";
 
 // Initialize your Socket.IO client connection
 const socket = io("http://localhost:5000");
@@ -16,18 +17,16 @@ const InputField = () => {
       setEmail(storedEmail);
     }
   },[])
-  const handleSend = () => {
+  const handleSend = async () => {
     const messageData = {
+      // Reused if the message is sent again, so the server stores it once
+      message_id: crypto.randomUUID(),
       chat_id: data.chatId,
       sender_email: data.user.email, // Assuming user object contains the sender's ID
       receiver_email: email,
       message: text,
-      // Include image if it's available
-      image: img ? {
-        file_name: img.name,
-        file_type: img.type,
-        file_data: URL.createObjectURL(img) // Or handle image differently
-      } : null
+      // Upload the image first; the message only carries its reference
+      image: img ? await uploadAttachment(img) : null
     };
 
     // Emit the message event
@@ -390,7 +390,7 @@ export default function Sidebar() {
                   className={`inline-block ${
                     open ? "h-10 w-10" : "h-6 w-6"
                   } duration-300 rounded-full ring-2 ring-[#FBE6A3]`}
-                  src={`data:image/jpeg;base64,${contact.profile_image}`}
+                  src={contact.profile_image_url || "https://via.placeholder.com/150"}
                   alt=""
                   onClick={() => handleUserClick(contact)}
                 />
@@ -448,7 +448,7 @@ export default function Sidebar() {
                   >
                     <img
                       className="h-8 w-8 rounded-full ring-1 ring-[#FBE6A3]"
-                      src={`data:image/jpeg;base64,${user.profile_image}`}
+                      src={user.profile_image_url || "https://via.placeholder.com/150"}
                       alt=""
                     />
                     <div>
@@ -1,19 +1,27 @@
 import React, { useEffect, useRef } from 'react';
 import Message from './Message';
 
-const MessagesContainer = ({ messages, currentUserId }) => {
+const MessagesContainer = ({ messages, currentUserId, hasOlderMessages, onLoadOlder }) => {
   const messagesEndRef = useRef(null);
+  const lastMessageId = messages.length ? messages[messages.length - 1].message_id : null;
 
   const scrollToBottom = () => {
     messagesEndRef.current?.scrollIntoView({ behavior: "smooth" });
   };
 
+  // Only follow the newest message; prepending older history must not jump
   useEffect(() => {
     scrollToBottom();
-  }, [messages]);
+  }, [lastMessageId]);
+
+  const handleScroll = (e) => {
+    if (e.currentTarget.scrollTop === 0 && hasOlderMessages && onLoadOlder) {
+      onLoadOlder();
+    }
+  };
 
   return (
-    <div className="messages-container flex-1 overflow-y-auto p-3">
+    <div className="messages-container flex-1 overflow-y-auto p-3" onScroll={handleScroll}>
       {messages.length === 0 ? (
         <div className="flex items-center justify-center h-full text-gray-400">
           <p>No messages yet. Start the conversation!</p>
@@ -88,7 +88,7 @@ const ProfileImage = ({ email, className, size = 'md' }) => {
 
   return (
     <img
-      src={`data:image/jpeg;base64,${imageData.split('?')[0]}?v=${timestamp}`}
+      src={imageData} // content-hash URL: changes whenever the image does
       alt="Profile"
       className={`${sizeClasses[size]} ${className} rounded-full object-cover`}
       key={timestamp} // Force React to re-render when timestamp changes
@@ -0,0 +1,59 @@
+const API_URL = "http://localhost:5000/api/attachments/uploads";
+const MAX_RETRIES = 5;
+
+async function sha256Hex(file) {
+  const digest = await crypto.subtle.digest("SHA-256", await file.arrayBuffer());
+  return Array.from(new Uint8Array(digest))
+    .map((b) => b.toString(16).padStart(2, "0"))
+    .join("");
+}
+
+// Upload a file in chunks, resuming after failures; resolves to the message's image reference
+export async function uploadAttachment(file) {
+  const createResponse = await fetch(API_URL, {
+    method: "POST",
+    headers: { "Content-Type": "application/json" },
+    body: JSON.stringify({
+      file_name: file.name,
+      file_type: file.type,
+      size: file.size,
+      sha256: await sha256Hex(file),
+    }),
+  });
+  let upload = await createResponse.json();
+  if (!createResponse.ok) {
+    throw new Error(upload.message);
+  }
+
+  let retries = 0;
+  while (!upload.complete) {
+    try {
+      const response = await fetch(`${API_URL}/${upload.upload_id}`, {
+        method: "PATCH",
+        headers: { "Upload-Offset": String(upload.offset) },
+        body: file.slice(upload.offset, upload.offset + upload.chunk_size),
+      });
+      const body = await response.json();
+      if (response.ok) {
+        upload = body;
+        retries = 0;
+      } else if (response.status === 409 && body.offset !== undefined) {
+        upload = { ...upload, offset: body.offset };
+      } else {
+        throw new Error(body.message);
+      }
+    } catch (error) {
+      if (++retries > MAX_RETRIES) throw error;
+      // Ask the server how much arrived before retrying
+      await new Promise((resolve) => setTimeout(resolve, 1000 * retries));
+      const status = await fetch(`${API_URL}/${upload.upload_id}`);
+      if (status.ok) upload = await status.json();
+    }
+  }
+
+  return {
+    attachment_id: upload.attachment_id,
+    file_name: file.name,
+    file_type: file.type,
+  };
+}
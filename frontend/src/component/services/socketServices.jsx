@@ -47,15 +47,24 @@ class SocketService {
     }
   }
 
-  fetchMessages(chatId) {
+  // options: { before, after, limit } - cursors come from a previous "messages_fetched" page
+  fetchMessages(chatId, options = {}) {
     if (this.socket) {
-      this.socket.emit("fetch_messages", { chat_id: chatId });
+      this.socket.emit("fetch_messages", { chat_id: chatId, ...options });
     }
   }
 
+  // Reset the unread count shown in /api/last-messages for this user
+  markChatRead(chatId, email) {
+    if (this.socket) {
+      this.socket.emit("mark_chat_read", { chat_id: chatId, email });
+    }
+  }
+
+  // Pass the same message_id again to resend without storing a duplicate
   sendMessage(messageData) {
     if (this.socket) {
-      this.socket.emit("send_message", messageData);
+      this.socket.emit("send_message", { message_id: crypto.randomUUID(), ...messageData });
     }
   }
 
@@ -85,6 +94,29 @@ class SocketService {
 
 
 
+  // Translate a page of history; answered by "messages_translated"
+  translateMessages(chatId, messageIds, targetLanguage) {
+    if (this.socket) {
+      this.socket.emit("translate_messages", {
+        chat_id: chatId,
+        message_ids: messageIds,
+        target_language: targetLanguage
+      });
+    }
+  }
+
+  // Full-text search over the user's chats; answered by "messages_found"
+  searchMessages(email, query, page = 1, chatId = null) {
+    if (this.socket) {
+      this.socket.emit("search_messages", {
+        email: email,
+        query: query,
+        page: page,
+        chat_id: chatId
+      });
+    }
+  }
+
   enhanceMessage(text, enhancementType) {
   return new Promise((resolve, reject) => {
     if (this.socket) {
@@ -126,6 +158,13 @@ class SocketService {
     }
   }
 
+  // AI analysis for an already delivered message
+  onMessageAnnotated(callback) {
+    if (this.socket) {
+      this.socket.on("message_annotated", callback);
+    }
+  }
+
   onSmartRepliesGenerated(callback) {
     if (this.socket) {
       this.socket.on("smart_replies_generated", callback);
@@ -138,6 +177,18 @@ class SocketService {
     }
   }
 
+  onMessagesTranslated(callback) {
+    if (this.socket) {
+      this.socket.on("messages_translated", callback);
+    }
+  }
+
+  onMessagesFound(callback) {
+    if (this.socket) {
+      this.socket.on("messages_found", callback);
+    }
+  }
+
   onMessageEnhanced(callback) {
     if (this.socket) {
       this.socket.on("message_enhanced", callback);
@@ -161,8 +212,11 @@ class SocketService {
     if (this.socket) {
       this.socket.off("messages_fetched");
       this.socket.off("new_message");
+      this.socket.off("message_annotated");
       this.socket.off("smart_replies_generated");
       this.socket.off("message_translated");
+      this.socket.off("messages_translated");
+      this.socket.off("messages_found");
       this.socket.off("message_enhanced");
       this.socket.off("conversation_summarized");
       this.socket.off("room_joined");
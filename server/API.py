@@ -1,76 +1,15 @@
-import mysql.connector
-import os
-from dotenv import load_dotenv
-import base64
-from Auth import connection
 import logging
-from mysql.connector import Error
-
-load_dotenv()
-
-HOST_NAME = os.getenv('HOST_NAME')
-USER_NAME = os.getenv('USER_NAME')
-PASSWORD = os.getenv('PASSWORD')
-DATABASE = os.getenv('DATABASE')
-# Establish a database connection (this can be moved to a config or utility file if needed)
-connection = mysql.connector.connect(
-    host=HOST_NAME,
-    user=USER_NAME,
-    passwd=PASSWORD,
-    database=DATABASE
-)
-
-def All_Users():
-    try:
-        if connection.is_connected():
-            print("Connected to MySQL database")
-            cursor = connection.cursor()
-
-            # Check if 'user_id' column exists
-            cursor.execute("SHOW COLUMNS FROM users LIKE 'user_id'")
-            result = cursor.fetchone()
-            if not result:
-                print("Column 'user_id' not found in users table.")
-                return []
-
-            # Query all users
-            sql_query = "SELECT user_id, username, email, profile_image FROM users"
-            cursor.execute(sql_query)
-            all_users = cursor.fetchall()
-
-            users_list = []
-            for user in all_users:
-                user_id, username, email, profile_image = user
-                profile_image_base64 = None
-                if profile_image:
-                    profile_image_base64 = base64.b64encode(profile_image).decode('utf-8')
-
-                users_list.append({
-                    "user_id": user_id,
-                    "username": username,
-                    "email": email,
-                    "profile_image": profile_image_base64
-                })
-
-            return users_list
-
-    except Error as e:
-        print("Error while fetching users:", e)
-        return []
-
-# Call the function
-All_Users()
-
-# Add these functions to your existing API.py file
-
-
+from db import get_db_connection
+from identity import identity
+from profile_images import image_url
 
 def All_Users():
     """Function to fetch all users from the database."""
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         cursor.execute("""
-            SELECT user_id, username, email, profile_image
+            SELECT user_id, username, email, profile_image_hash
             FROM users
         """)
         users = cursor.fetchall()
@@ -78,16 +17,13 @@ def All_Users():
         # Process the results
         processed_users = []
         for user in users:
-            # Convert binary profile image to base64 string if it exists
-            profile_image = None
-            if user['profile_image']:
-                profile_image = base64.b64encode(user['profile_image']).decode('utf-8')
-                
+            # Images are fetched separately from their content-hash URL
             processed_users.append({
                 'user_id': user['user_id'],
                 'username': user['username'],
                 'email': user['email'],
-                'profile_image': profile_image
+                'profile_image_hash': user['profile_image_hash'],
+                'profile_image_url': image_url(user['profile_image_hash'])
             })
             
         return processed_users
@@ -99,21 +35,19 @@ def All_Users():
 
 def Get_User_Contacts(email):
     """Function to fetch all contacts for a specific user."""
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user ID from email
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-        user_result = cursor.fetchone()
+        user_id = identity.resolve(connection, email)
         
-        if not user_result:
+        if not user_id:
             return []
-            
-        user_id = user_result['user_id']
         
         # Get all contacts for this user
         cursor.execute("""
-            SELECT u.user_id, u.username, u.email, u.profile_image 
+            SELECT u.user_id, u.username, u.email, u.profile_image_hash
             FROM contact c
             JOIN users u ON c.contact_user_id = u.user_id
             WHERE c.user_id = %s
@@ -124,16 +58,13 @@ def Get_User_Contacts(email):
         # Process the results
         processed_contacts = []
         for contact in contacts:
-            # Convert binary profile image to base64 string if it exists
-            profile_image = None
-            if contact['profile_image']:
-                profile_image = base64.b64encode(contact['profile_image']).decode('utf-8')
-                
+            # Images are fetched separately from their content-hash URL
             processed_contacts.append({
                 'user_id': contact['user_id'],
                 'username': contact['username'],
                 'email': contact['email'],
-                'profile_image': profile_image
+                'profile_image_hash': contact['profile_image_hash'],
+                'profile_image_url': image_url(contact['profile_image_hash'])
             })
             
         return processed_contacts
@@ -145,21 +76,18 @@ def Get_User_Contacts(email):
 
 def Add_Contact(user_email, contact_email):
     """Function to add a contact for a user."""
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user IDs from emails
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (user_email,))
-        user_result = cursor.fetchone()
+        user_ids = identity.resolve_many(connection, [user_email, contact_email])
         
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (contact_email,))
-        contact_result = cursor.fetchone()
-        
-        if not user_result or not contact_result:
+        if user_email not in user_ids or contact_email not in user_ids:
             return {"status": "error", "message": "One or both users not found"}
             
-        user_id = user_result['user_id']
-        contact_user_id = contact_result['user_id']
+        user_id = user_ids[user_email]
+        contact_user_id = user_ids[contact_email]
         
         # Check if the contact already exists
         cursor.execute("""
@@ -200,21 +128,18 @@ def Add_Contact(user_email, contact_email):
 
 def Remove_Contact(user_email, contact_email):
     """Function to remove a contact for a user."""
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user IDs from emails
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (user_email,))
-        user_result = cursor.fetchone()
-        
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (contact_email,))
-        contact_result = cursor.fetchone()
+        user_ids = identity.resolve_many(connection, [user_email, contact_email])
         
-        if not user_result or not contact_result:
+        if user_email not in user_ids or contact_email not in user_ids:
             return {"status": "error", "message": "One or both users not found"}
             
-        user_id = user_result['user_id']
-        contact_user_id = contact_result['user_id']
+        user_id = user_ids[user_email]
+        contact_user_id = user_ids[contact_email]
         
         # Remove contact in both directions
         cursor.execute("""
@@ -1,34 +1,20 @@
-import mysql.connector
 import hashlib
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
-
-HOST_NAME = os.getenv('HOST_NAME')
-USER_NAME = os.getenv('USER_NAME')
-PASSWORD = os.getenv('PASSWORD')
-DATABASE = os.getenv('DATABASE')
-# Establish a database connection (this can be moved to a config or utility file if needed)
-connection = mysql.connector.connect(
-    host=HOST_NAME,
-    user=USER_NAME,
-    passwd=PASSWORD,
-    database=DATABASE
-)
+from db import get_db_connection
+from profile_images import image_hash
 
 def register_user(username, password, email, profile_image=None):
     """Register a new user in the Users table."""
+    connection = get_db_connection()
     if connection.is_connected():
         password_hash = hashlib.sha256(password.encode()).hexdigest()
 
         sql_query = """
-            INSERT INTO users (username, password_hash, email, profile_image)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO users (username, password_hash, email, profile_image, profile_image_hash)
+            VALUES (%s, %s, %s, %s, %s)
             """
             
         cursor = connection.cursor()
-        cursor.execute(sql_query, (username, password_hash, email, profile_image))
+        cursor.execute(sql_query, (username, password_hash, email, profile_image, image_hash(profile_image)))
         connection.commit()
         
         return {"status": "User registered successfully"}
@@ -38,6 +24,7 @@ def register_user(username, password, email, profile_image=None):
 
 # Function to login a user
 def login_user(username, password):
+    connection = get_db_connection()
     if connection.is_connected():
         cursor = connection.cursor()
             
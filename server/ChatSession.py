@@ -2,16 +2,8 @@ from flask_socketio import emit, join_room
 from datetime import datetime
 from ai_services import AIService
 from flask import request
-import mysql.connector
 from API import All_Users
-# Establish MySQL connection (reuse your original configuration)
-db = mysql.connector.connect(
-    host="localhost",
-    user="root",
-    password="Ashu@123",
-    database="ChatApp"
-)
-cursor = db.cursor(dictionary=True)
+from db import get_db_connection
 
 chat_rooms = {}
 message_history = {}
@@ -37,6 +29,8 @@ def register_socket_handlers(socketio):
         data['sentiment'] = sentiment
 
         # Save message to MySQL
+        db = get_db_connection()
+        cursor = db.cursor(dictionary=True)
         cursor.execute("INSERT INTO ChatMessages (chat_id, sender_id, receiver_id, message, timestamp) VALUES (%s, %s, %s, %s, %s)",
                        (chat_id, data['sender_email'], data['receiver_email'], data['message'], datetime.now()))
         db.commit()
@@ -46,6 +40,7 @@ def register_socket_handlers(socketio):
     @socketio.on('fetch_messages')
     def handle_fetch_messages(data):
         chat_id = data.get('chat_id')
+        cursor = get_db_connection().cursor(dictionary=True)
         cursor.execute("SELECT * FROM ChatMessages WHERE chat_id = %s", (chat_id,))
         messages = cursor.fetchall()
         emit('messages_fetched', {'messages': messages})
@@ -1,11 +1,14 @@
-import requests
-from transformers import pipeline
 from dotenv import load_dotenv
 import os
-import time
 import logging
 from typing import Dict, List, Optional, Any
-import re
+from batching import MicroBatcher, run_blocking
+import hf_api
+import langid
+import text_rules
+from models import registry as model_registry, TRANSLATION_MODELS
+from inference import detect_language, marian_translate
+from summarization import MapReduceSummarizer, conversation_lines
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -13,17 +16,21 @@ logger = logging.getLogger(__name__)
 
 load_dotenv()
 HF_API_KEY = os.getenv("HF_API_KEY")
-HF_API_URL = "https://api-inference.huggingface.co/models/"
+SENTIMENT_MAX_BATCH_SIZE = int(os.getenv("SENTIMENT_MAX_BATCH_SIZE", 32))
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", 10))
+SENTIMENT_TIMEOUT = float(os.getenv("SENTIMENT_TIMEOUT", 30))
 
 class AIService:
     def __init__(self):
-        # Initialize local models with better error handling
-        self.sentiment_analyzer = None
-        self.summarizer = None
+        # Local models come from the shared, lazily loading registry
         self.translator = None
-        
-        # Try to load local models
-        self._initialize_local_models()
+        self.sentiment_batcher = MicroBatcher(
+            self._run_sentiment_batch,
+            max_batch_size=SENTIMENT_MAX_BATCH_SIZE,
+            max_wait_ms=SENTIMENT_MAX_WAIT_MS,
+            name="sentiment-batcher"
+        )
+        self.map_reduce = MapReduceSummarizer(self._summarize_chunk, count_tokens=self._count_tokens)
         
         # Sentiment label mapping for Twitter RoBERTa model
         self.sentiment_labels = {
@@ -46,77 +53,60 @@ class AIService:
             'hindi': 'hi_IN'
         }
 
-    def _initialize_local_models(self):
-        """Initialize local transformer models"""
-        try:
-            logger.info("Loading sentiment analysis model...")
-            self.sentiment_analyzer = pipeline(
-                "sentiment-analysis", 
-                model="cardiffnlp/twitter-roberta-base-sentiment-latest",
-                device=-1  # Use CPU to avoid GPU issues
-            )
-            logger.info("Sentiment analyzer loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load sentiment analyzer: {e}")
+    @property
+    def sentiment_analyzer(self):
+        """Shared RoBERTa pipeline, loaded on first use (None if unavailable)"""
+        return model_registry.get("sentiment")
 
-        try:
-            logger.info("Loading summarization model...")
-            self.summarizer = pipeline(
-                "summarization", 
-                model="facebook/bart-large-cnn",
-                device=-1
-            )
-            logger.info("Summarizer loaded successfully")
-        except Exception as e:
-            logger.warning(f"Failed to load summarizer: {e}")
+    @property
+    def summarizer(self):
+        """Shared BART summarization pipeline, loaded on first use (None if unavailable)"""
+        return model_registry.get("summarizer")
 
-    def call_hf_api(self, model: str, payload: Dict, retries: int = 3) -> Optional[Any]:
-        """Enhanced HuggingFace API call with better error handling"""
+    def call_hf_api(self, model: str, payload: Dict) -> Optional[Any]:
+        """HuggingFace API call over the shared pooled client (retries without blocking, see hf_api.py)"""
         if not HF_API_KEY:
             logger.error("HuggingFace API key not found")
             return None
-            
-        headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-        
-        for attempt in range(retries):
+
+        return hf_api.call_huggingface_api(model, payload)
+
+    def _run_sentiment_batch(self, texts: List[str]) -> List[Dict]:
+        """Run one padded batch through the RoBERTa pipeline"""
+        analyzer = self.sentiment_analyzer
+        if analyzer is None:
+            raise RuntimeError("Sentiment model is unavailable")
+        return run_blocking(analyzer, texts, batch_size=len(texts), truncation=True)
+
+    def _format_local_sentiment(self, result: Dict) -> Dict[str, Any]:
+        raw_label = result["label"]
+        return {
+            "sentiment": self.sentiment_labels.get(raw_label, raw_label.lower()),
+            "confidence": round(result["score"], 3),
+            "raw_label": raw_label,
+            "method": "local"
+        }
+
+    def analyze_sentiment_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """Sentiment for many texts, sharing model batches with concurrent callers"""
+        if not model_registry.available("sentiment"):
+            return [self.analyze_sentiment(text) for text in texts]
+
+        futures = {
+            i: self.sentiment_batcher.submit(text.strip())
+            for i, text in enumerate(texts) if text and text.strip()
+        }
+        results = []
+        for i, text in enumerate(texts):
+            if i not in futures:
+                results.append({"sentiment": "neutral", "confidence": 0.0, "error": "Empty text"})
+                continue
             try:
-                response = requests.post(
-                    HF_API_URL + model, 
-                    headers=headers, 
-                    json=payload,
-                    timeout=30
-                )
-                
-                if response.status_code == 200:
-                    result = response.json()
-                    
-                    # Handle model loading errors
-                    if isinstance(result, dict) and "error" in result:
-                        if "loading" in result["error"].lower():
-                            logger.info(f"Model {model} is loading, waiting...")
-                            time.sleep(20)  # Wait for model to load
-                            continue
-                        else:
-                            logger.error(f"API Error: {result['error']}")
-                            return None
-                    
-                    return result
-                    
-                elif response.status_code == 503:
-                    logger.warning(f"Model {model} unavailable, retrying in {5 * (attempt + 1)} seconds...")
-                    time.sleep(5 * (attempt + 1))
-                    continue
-                else:
-                    logger.error(f"API request failed: {response.status_code} - {response.text}")
-                    return None
-                    
-            except requests.exceptions.RequestException as e:
-                logger.error(f"Request failed (attempt {attempt + 1}): {e}")
-                if attempt < retries - 1:
-                    time.sleep(2)
-                    continue
-                    
-        return None
+                results.append(self._format_local_sentiment(futures[i].result(timeout=SENTIMENT_TIMEOUT)))
+            except Exception as e:
+                logger.error(f"Sentiment analysis failed: {e}")
+                results.append(self.analyze_sentiment(text))
+        return results
 
     def analyze_sentiment(self, text: str) -> Dict[str, Any]:
         """Improved sentiment analysis with proper label mapping"""
@@ -127,20 +117,10 @@ class AIService:
         text = text.strip()
         
         try:
-            # Try local model first
-            if self.sentiment_analyzer:
-                result = self.sentiment_analyzer(text)[0]
-                
-                # Map label to readable sentiment
-                raw_label = result["label"]
-                sentiment = self.sentiment_labels.get(raw_label, raw_label.lower())
-                
-                return {
-                    "sentiment": sentiment,
-                    "confidence": round(result["score"], 3),
-                    "raw_label": raw_label,
-                    "method": "local"
-                }
+            # Try local model first, batched with concurrent requests
+            if model_registry.available("sentiment"):
+                result = self.sentiment_batcher.submit(text).result(timeout=SENTIMENT_TIMEOUT)
+                return self._format_local_sentiment(result)
             
             # Fallback to API
             api_result = self.call_hf_api("cardiffnlp/twitter-roberta-base-sentiment-latest", {
@@ -162,51 +142,39 @@ class AIService:
         except Exception as e:
             logger.error(f"Sentiment analysis failed: {e}")
         
-        # Enhanced fallback based on simple keyword analysis
-        positive_words = ['happy', 'good', 'great', 'excellent', 'love', 'like', 'amazing', 'wonderful', 'fantastic']
-        negative_words = ['sad', 'bad', 'hate', 'terrible', 'awful', 'horrible', 'disgusting']
-        
-        text_lower = text.lower()
-        pos_count = sum(1 for word in positive_words if word in text_lower)
-        neg_count = sum(1 for word in negative_words if word in text_lower)
-        
-        if pos_count > neg_count:
-            return {"sentiment": "positive", "confidence": 0.6, "method": "keyword_fallback"}
-        elif neg_count > pos_count:
-            return {"sentiment": "negative", "confidence": 0.6, "method": "keyword_fallback"}
-        else:
-            return {"sentiment": "neutral", "confidence": 0.5, "method": "keyword_fallback"}
+        # Keyword fallback: both keyword sets in one precompiled pass
+        return text_rules.keyword_sentiment(text)
 
     def detect_language(self, text: str) -> Dict[str, Any]:
-        """Detect language using HuggingFace API"""
+        """Detect language with the local character n-gram model"""
         try:
-            result = self.call_hf_api("papluca/xlm-roberta-base-language-detection", {
-                "inputs": text
-            })
-            
-            if result and len(result) > 0:
-                return {
-                    "language": result[0]["label"],
-                    "confidence": round(result[0]["score"], 3)
-                }
+            language, confidence = langid.detect(text)
+            return {"language": language, "confidence": confidence}
         except Exception as e:
             logger.error(f"Language detection failed: {e}")
         
         return {"language": "en", "confidence": 0.5}
 
     def translate_message(self, text: str, target_language: str = "spanish") -> Dict[str, Any]:
-        """Improved translation with language detection"""
+        """Translate with the local Marian model for the target language"""
         if not text or not text.strip():
             return {"error": "Empty text", "original": text}
-        
-        # Detect source language first
-        lang_info = self.detect_language(text)
-        detected_lang = lang_info.get("language", "en")
-        
+
+        # Language name ("spanish") or code ("es")
+        target_code = self.language_codes.get(target_language.lower(), target_language.lower()).split('_')[0]
+        model_name = TRANSLATION_MODELS.get(target_code)
+        if not model_name:
+            return {
+                "error": f"Unsupported target language: {target_language}",
+                "original_text": text,
+                "translated_text": text
+            }
+
+        # Detection is local; no extra model call before translating
+        detected_lang = detect_language(text)
+
         # Don't translate if already in target language
-        target_code = self.language_codes.get(target_language.lower(), "es_XX")
-        
-        if detected_lang == target_code.split('_')[0]:
+        if detected_lang == target_code:
             return {
                 "original_text": text,
                 "translated_text": text,
@@ -214,26 +182,25 @@ class AIService:
                 "target_language": target_language,
                 "note": "Text already in target language"
             }
-        
+
         try:
-            # Use Google Translate model for better results
-            result = self.call_hf_api("Helsinki-NLP/opus-mt-en-es", {
-                "inputs": text
-            })
-            
-            if result and len(result) > 0:
-                translated = result[0].get("translation_text", text)
+            translated = marian_translate([text], target_code)
+            if translated is None:
+                result = self.call_hf_api(model_name, {"inputs": text})
+                if result and len(result) > 0:
+                    translated = [result[0].get("translation_text")]
+
+            if translated and translated[0]:
                 return {
                     "original_text": text,
-                    "translated_text": translated,
+                    "translated_text": translated[0],
                     "source_language": detected_lang,
-                    "target_language": target_language,
-                    "confidence": lang_info.get("confidence", 0.5)
+                    "target_language": target_language
                 }
-                
+
         except Exception as e:
             logger.error(f"Translation failed: {e}")
-        
+
         return {
             "error": "Translation failed",
             "original_text": text,
@@ -245,72 +212,53 @@ class AIService:
         if not messages or len(messages) < 3:
             return {"error": "Not enough messages to summarize", "summary": ""}
         
-        # Take last 20 messages and format them properly
-        recent_messages = messages[-20:]
-        
-        # Create conversation text
-        conversation = []
-        for msg in recent_messages:
-            sender = msg.get('sender_email', 'User').split('@')[0]  # Get username part
-            message = msg.get('message', '')
-            if message.strip():
-                conversation.append(f"{sender}: {message}")
-        
-        text = "\n".join(conversation)
+        # Every message is covered: long conversations are summarized map-reduce style
+        lines = conversation_lines(messages)
+        text = "\n".join(lines)
         
         # Check if text is long enough to summarize
         if len(text.split()) < 20:
             return {
                 "summary": "Conversation too short to summarize effectively",
-                "message_count": len(recent_messages),
+                "message_count": len(messages),
                 "word_count": len(text.split())
             }
         
         try:
-            # Try local summarizer first
-            if self.summarizer:
-                # Truncate if too long
-                if len(text) > 1000:
-                    text = text[:1000] + "..."
-                
-                summary_result = self.summarizer(
-                    text, 
-                    max_length=100, 
-                    min_length=30, 
-                    do_sample=False
-                )[0]
-                
-                return {
-                    "summary": summary_result['summary_text'],
-                    "message_count": len(recent_messages),
-                    "method": "local"
-                }
-            
-            # Fallback to API
-            result = self.call_hf_api("facebook/bart-large-cnn", {
-                "inputs": text[:1000],  # Limit input length
-                "parameters": {
-                    "max_length": 100,
-                    "min_length": 30
-                }
-            })
-            
-            if result and len(result) > 0:
-                return {
-                    "summary": result[0].get("summary_text", "Summary unavailable"),
-                    "message_count": len(recent_messages),
-                    "method": "api"
-                }
-                
+            result = self.map_reduce.run(lines)
+            return dict(result, message_count=len(messages),
+                        method="local" if self.summarizer else "api")
         except Exception as e:
             logger.error(f"Summarization failed: {e}")
         
         return {
             "error": "Summarization failed",
-            "summary": f"Recent conversation between {len(set(msg.get('sender_email', '') for msg in recent_messages))} participants with {len(recent_messages)} messages",
-            "message_count": len(recent_messages)
+            "summary": f"Recent conversation between {len(set(msg.get('sender_email', '') for msg in messages))} participants with {len(messages)} messages",
+            "message_count": len(messages)
         }
 
+    def _summarize_chunk(self, text: str) -> Optional[str]:
+        """One token-budgeted chunk: local BART, else the Inference API"""
+        summarizer = self.summarizer
+        if summarizer:
+            return run_blocking(summarizer, text, max_length=100, min_length=30, do_sample=False)[0]['summary_text']
+        result = self.call_hf_api("facebook/bart-large-cnn", {
+            "inputs": text,
+            "parameters": {
+                "max_length": 100,
+                "min_length": 30
+            }
+        })
+        if result and isinstance(result, list):
+            return result[0].get("summary_text")
+        return None
+
+    def _count_tokens(self, texts: List[str]) -> Optional[List[int]]:
+        summarizer = self.summarizer
+        if summarizer is None:
+            return None
+        return [len(ids) for ids in summarizer.tokenizer(list(texts))["input_ids"]]
+
     def smart_reply_suggestions(self, message_history: List[Dict]) -> Dict[str, Any]:
         """Generate smart reply suggestions"""
         if not message_history:
@@ -383,41 +331,12 @@ class AIService:
             return {"enhanced": text, "error": str(e)}
 
     def _basic_grammar_fix(self, text: str) -> str:
-        """Basic grammar corrections"""
-        # Capitalize first letter
-        text = text.strip()
-        if text:
-            text = text[0].upper() + text[1:]
-        
-        # Fix common issues
-        text = re.sub(r'\bi\b', 'I', text)  # Fix lowercase 'i'
-        text = re.sub(r'\s+', ' ', text)    # Fix multiple spaces
-        
-        # Add period if missing
-        if text and not text.endswith(('.', '!', '?')):
-            text += '.'
-        
-        return text
+        """Basic grammar corrections (lowercase 'i', repeated spaces, capital, final period)"""
+        return text_rules.fix_grammar(text)
 
     def _make_professional(self, text: str) -> str:
         """Make text more professional"""
-        text = self._basic_grammar_fix(text)
-        
-        # Replace casual words
-        replacements = {
-            'hey': 'Hello',
-            'yeah': 'Yes',
-            'nope': 'No',
-            'gonna': 'going to',
-            'wanna': 'want to',
-            'u': 'you',
-            'ur': 'your'
-        }
-        
-        for casual, formal in replacements.items():
-            text = re.sub(r'\b' + casual + r'\b', formal, text, flags=re.IGNORECASE)
-        
-        return text
+        return text_rules.PROFESSIONAL.apply(self._basic_grammar_fix(text))
 
     def _make_casual(self, text: str) -> str:
         """Make text more casual"""
@@ -0,0 +1,116 @@
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+DROP_OLDEST = "drop_oldest"   # evict the oldest queued job to make room
+DROP_NEWEST = "drop_newest"   # reject the incoming job
+BLOCK = "block"               # wait up to block_timeout for room, then reject
+DROP_POLICIES = (DROP_OLDEST, DROP_NEWEST, BLOCK)
+
+
+class AnnotationPipeline:
+    """Bounded background queue for post-delivery message work.
+
+    ``submit`` never runs the work inline: jobs are handed to ``workers``
+    background threads which call ``process(job)``. When the queue holds
+    ``max_pending`` jobs the ``drop_policy`` decides what gives way, so a
+    slow model can never make the delivery path wait indefinitely. Dropped
+    jobs are only counted; their messages stay unannotated until the
+    analysis backfill picks them up.
+    """
+
+    def __init__(self, process: Callable[[Dict], Any], workers: int = 2, max_pending: int = 500,
+                 drop_policy: str = DROP_OLDEST, block_timeout: float = 0.05, name: str = "annotator"):
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown drop policy: {drop_policy}")
+        self.process = process
+        self.workers = workers
+        self.max_pending = max_pending
+        self.drop_policy = drop_policy
+        self.block_timeout = block_timeout
+        self.name = name
+
+        self._jobs = collections.deque()
+        self._cond = threading.Condition()
+        self._threads = []
+
+        # Metrics
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._dropped = 0
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, job: Dict) -> bool:
+        """Queue a job; returns False if it was dropped by backpressure."""
+        with self._cond:
+            self._ensure_workers()
+            self._submitted += 1
+
+            if len(self._jobs) >= self.max_pending:
+                if self.drop_policy == DROP_OLDEST:
+                    self._jobs.popleft()
+                    self._dropped += 1
+                elif self.drop_policy == BLOCK:
+                    self._cond.wait_for(lambda: len(self._jobs) < self.max_pending, timeout=self.block_timeout)
+
+                if len(self._jobs) >= self.max_pending:
+                    self._dropped += 1
+                    logger.warning(f"{self.name}: queue full, dropping job")
+                    return False
+
+            self._jobs.append((job, time.monotonic()))
+            self._cond.notify_all()
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._jobs)
+                job, enqueued = self._jobs.popleft()
+                self._cond.notify_all()
+
+            try:
+                self.process(job)
+                failed = False
+            except Exception as e:
+                logger.error(f"{self.name}: job failed: {e}")
+                failed = True
+
+            latency = time.monotonic() - enqueued
+            with self._cond:
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+                self._latency_total += latency
+                self._latency_max = max(self._latency_max, latency)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            done = self._completed + self._failed
+            return {
+                'workers': self.workers,
+                'max_pending': self.max_pending,
+                'drop_policy': self.drop_policy,
+                'pending': len(self._jobs),
+                'submitted': self._submitted,
+                'completed': self._completed,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'latency_avg_ms': round(self._latency_total / done * 1000, 3) if done else 0.0,
+                'latency_max_ms': round(self._latency_max * 1000, 3),
+            }
@@ -3,30 +3,37 @@ from flask import Flask, request, jsonify, Blueprint, send_file
 from flask_socketio import SocketIO,emit,join_room
 from mysql.connector import Error
 from flask_cors import CORS
-from Auth import register_user, login_user, connection
+from Auth import register_user, login_user
 from API import All_Users
+import db
+from db import get_db_connection
+import message_analysis
+import chat_summary
+import rolling_summary
+import translation
+import search_index
+import text_rules
+from message_writer import message_writer
+from annotation import AnnotationPipeline
+from smart_replies import SmartReplyPrecomputer
+from summarization import (MapReduceSummarizer, conversation_lines, estimate_tokens,
+                           SUMMARY_CHUNK_TOKENS, SUMMARY_MAX_MESSAGES)
+from models import registry as model_registry, warm_configured_models, SENTIMENT_MODEL, SUMMARIZER_MODEL
+import hf_api
+from inference import LocalBackend, detect_language, detect_languages, TRANSLATION_MODELS
+from result_cache import result_cache
+from session_store import session_store
+from backplane import create_client_manager
+from identity import identity
+import profile_images
+import attachments
+from model_client import RemoteBackend
 import logging  # Import logging for error tracking
 import mysql.connector
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
 import base64
-import requests
-import json
-import re
-from transformers import pipeline
-import torch
-from huggingface_hub import login
-from transformers import AutoModelForCausalLM, AutoTokenizer
-
-# Add to the top of your file
-user_socket_map = {}  # email -> socket.id
-
-# Blueprint (optional, otherwise just use @app.route)
-UPLOAD_FOLDER = 'static/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-# Ensure upload folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -35,81 +42,37 @@ app.config['SECRET_KEY'] = 'secret!'
 
 # Configure CORS for Flask
 CORS(app) 
-# Configure Flask-SocketIO
-socketio = SocketIO(app, cors_allowed_origins="*")
+# Return pooled DB connections at the end of every request / socket event
+db.init_app(app)
+# Configure Flask-SocketIO; SOCKETIO_MESSAGE_QUEUE fans emits out to every worker (see backplane.py)
+socketio = SocketIO(app, cors_allowed_origins="*", client_manager=create_client_manager())
 
 # Hugging Face API configuration
 HF_API_KEY = os.getenv("HF_API_KEY")  # Get this from huggingface.co/settings/tokens
 HF_API_URL = "https://api-inference.huggingface.co/models/"
-login(HF_API_KEY)
-
-# Initialize local models for faster processing (optional)
-try:
-    # Load lightweight models locally for better performance
-    sentiment_analyzer = pipeline("sentiment-analysis", model="cardiffnlp/twitter-roberta-base-sentiment-latest")
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-except Exception as e:
-    print(f"Could not load local models: {e}")
-    sentiment_analyzer = None
-    summarizer = None
-
-tokenizer = AutoTokenizer.from_pretrained("microsoft/DialoGPT-medium")
-model = AutoModelForCausalLM.from_pretrained("microsoft/DialoGPT-medium")
-class AIService:
-    @staticmethod  
-    def call_huggingface_api(model_name, payload):
-        """Enhanced API call with better error handling"""
-        HF_API_URL = "https://api-inference.huggingface.co/models"
-        headers = {"Authorization": f"Bearer {HF_API_KEY}"}
-
-        try:
-            print(f"Making API call to: {HF_API_URL}/{model_name}")
-            response = requests.post(
-                f"{HF_API_URL}/{model_name}", 
-                headers=headers, 
-                json=payload, 
-                timeout=30
-            )
 
-            print(f"API Response Status: {response.status_code}")
-            print(f"API Response Text: {response.text}")
-
-            if response.status_code == 503:
-                # Model is loading, wait and retry
-                print("Model is loading, waiting 10 seconds...")
-                import time
-                time.sleep(10)
-                response = requests.post(
-                    f"{HF_API_URL}/{model_name}", 
-                    headers=headers, 
-                    json=payload, 
-                    timeout=30
-                )
+# AI operations run in a shared model server when MODEL_SERVER_URL is set,
+# otherwise on this process's lazily loaded models
+MODEL_SERVER_URL = os.getenv("MODEL_SERVER_URL")
+ai_backend = RemoteBackend(MODEL_SERVER_URL) if MODEL_SERVER_URL else LocalBackend()
 
-            if response.status_code != 200:
-                logging.error(f"Hugging Face API returned {response.status_code}: {response.text}")
-                return None
+if not MODEL_SERVER_URL:
+    # Cached results for a model are invalidated when a different revision loads
+    model_registry.on_load(
+        lambda name, version: result_cache.set_model_version(model_registry.model_id(name), version)
+    )
+    # Local models are loaded on first use (see models.py); optionally warm some now
+    warm_configured_models()
 
-            result = response.json()
-            print(f"API Response JSON: {result}")
-            return result
-            
-        except requests.exceptions.Timeout:
-            logging.error("Hugging Face API request timed out")
-            return None
-        except requests.exceptions.RequestException as e:
-            logging.error(f"Request error: {e}")
-            return None
-        except json.JSONDecodeError as e:
-            logging.error(f"JSON decode error: {e}")
-            return None
-        except Exception as e:
-            logging.error(f"Failed to call Hugging Face API: {e}")
-            return None
+class AIService:
+    @staticmethod  
+    def call_huggingface_api(model_name, payload):
+        """Call the Hugging Face Inference API (see hf_api.py)"""
+        return hf_api.call_huggingface_api(model_name, payload)
 
     
     @staticmethod
-    def smart_reply_suggestions(message_history, num_replies=3):
+    def smart_reply_suggestions(message_history, num_replies=3, should_stop=None):
         try:
             if not message_history:
                 return ["Hello!", "How are you?", "That's great!"]
@@ -120,27 +83,12 @@ class AIService:
             if not context:
                 return ["Okay!", "Sure!", "Alright!"]
 
-            # Encode context
-            input_ids = tokenizer.encode(context + tokenizer.eos_token, return_tensors="pt")
-
-            # Generate multiple reply candidates
-            outputs = model.generate(
-                input_ids,
-                max_length=100,
-                pad_token_id=tokenizer.eos_token_id,
-                num_return_sequences=num_replies,
-                num_beams=num_replies,
-                do_sample=True,
-                top_k=50,
-                top_p=0.95
-            )
+            candidates = ai_backend.smart_reply(context, num_replies, should_stop)
+            if candidates is None:
+                return ["Got it.", "Understood.", "Okay!"]
 
-            # Decode responses and remove prompt echo or gibberish
-            responses = []
-            for output in outputs:
-                decoded = tokenizer.decode(output, skip_special_tokens=True).strip()
-                if decoded and decoded.lower() != context.lower():
-                    responses.append(decoded)
+            # Remove prompt echo or gibberish
+            responses = [decoded for decoded in candidates if decoded and decoded.lower() != context.lower()]
 
             # Filter out bad replies
             filtered = [r for r in responses if len(r) > 5 and r.isascii() and any(c.isalpha() for c in r)]
@@ -150,67 +98,77 @@ class AIService:
             logging.error(f"Error generating smart replies: {e}")
             return ["Okay.", "Sure.", "Got it."]
 
-
     @staticmethod
-    def translate_message(text, target_language="es"):
-        try:
-            models = {
-                "es": "Helsinki-NLP/opus-mt-en-es",
-                "fr": "Helsinki-NLP/opus-mt-en-fr",
-                "de": "Helsinki-NLP/opus-mt-en-de"
-            }
-
-            model_name = models.get(target_language)
-            if not model_name:
-                logging.warning(f"No model found for target language: {target_language}")
-                return text
-
-            payload = {
-                "inputs": text,
-                "options": {"wait_for_model": True}
-            }
-
-            response = AIService.call_huggingface_api(model_name, payload)
+    def format_sentiment(result):
+        return {
+            "sentiment": result['label'].lower().replace('label_', ''),
+            "confidence": result['score']
+        }
 
-            # ✅ Add None check before accessing response[0]
-            if not response or not isinstance(response, list):
-                logging.warning(f"Invalid or empty response from HF API: {response}")
-                return text
+    @staticmethod
+    def raw_sentiment(text):
+        """Raw {'label', 'score'} from the local model, the model server or the HF API"""
+        # Local RoBERTa (batched with concurrent requests) or the model server
+        result = ai_backend.sentiment(text)
+        if result:
+            return result
 
-            translated = response[0].get("translation_text") or response[0].get("generated_text")
-            return translated.strip() if translated else text
+        # Use Hugging Face API
+        payload = {"inputs": text}
+        response = AIService.call_huggingface_api(SENTIMENT_MODEL, payload)
+        if response and isinstance(response, list) and len(response) > 0:
+            return response[0]
+        return None
 
+    @staticmethod
+    def model_sentiment(text):
+        """Sentiment from the model, or None when no model answered"""
+        try:
+            result = result_cache.get_or_compute("sentiment", SENTIMENT_MODEL, None, text,
+                                                 lambda: AIService.raw_sentiment(text))
+            return AIService.format_sentiment(result) if result else None
         except Exception as e:
-            logging.error(f"Error translating message: {e}")
-            return text
+            logging.error(f"Error analyzing sentiment: {e}")
+            return None
 
-    
     @staticmethod
     def analyze_sentiment(text):
-        """Analyze sentiment of message"""
-        try:
-            if sentiment_analyzer:
-                # Use local model
-                result = sentiment_analyzer(text)[0]
-                return {
-                    "sentiment": result['label'].lower().replace('label_', ''),
-                    "confidence": result['score']
-                }
+        """Analyze sentiment of message (neutral when no model answered)"""
+        return AIService.model_sentiment(text) or {"sentiment": "neutral", "confidence": 0.5}
+
+    @staticmethod
+    def analyze_sentiment_batch(texts, fallback=True):
+        """Analyze many messages at once; results are in input order.
+
+        Without ``fallback``, messages no model could analyse are None
+        instead of neutral.
+        """
+        texts = list(texts)
+        results = [result_cache.get("sentiment", SENTIMENT_MODEL, None, text) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+
+        if missing:
+            try:
+                computed = ai_backend.sentiment_batch([texts[i] for i in missing])
+            except Exception as e:
+                logging.error(f"Error analyzing sentiment batch: {e}")
+                computed = None
+
+            if computed is None:
+                formatted = [AIService.format_sentiment(result) if result else AIService.model_sentiment(text)
+                             for text, result in zip(texts, results)]
             else:
-                # Use Hugging Face API
-                payload = {"inputs": text}
-                response = AIService.call_huggingface_api("cardiffnlp/twitter-roberta-base-sentiment-latest", payload)
-                
-                if response and isinstance(response, list) and len(response) > 0:
-                    return {
-                        "sentiment": response[0]['label'].lower().replace('label_', ''),
-                        "confidence": response[0]['score']
-                    }
-                return {"sentiment": "neutral", "confidence": 0.5}
-                
-        except Exception as e:
-            logging.error(f"Error analyzing sentiment: {e}")
-            return {"sentiment": "neutral", "confidence": 0.5}
+                for i, result in zip(missing, computed):
+                    results[i] = result
+                    if result:
+                        result_cache.put("sentiment", SENTIMENT_MODEL, None, texts[i], result)
+                formatted = [AIService.format_sentiment(result) if result else None for result in results]
+        else:
+            formatted = [AIService.format_sentiment(result) for result in results]
+
+        if fallback:
+            return [result or {"sentiment": "neutral", "confidence": 0.5} for result in formatted]
+        return formatted
     
     @staticmethod
     def summarize_conversation(messages):
@@ -219,76 +177,122 @@ class AIService:
             if not messages or len(messages) < 3:
                 return "Conversation too short to summarize"
             
-            # Combine messages into a single text
-            conversation_text = " ".join([f"{msg.get('sender_email', 'User')}: {msg.get('message', '')}" for msg in messages[-20:]])
+            # Every message is covered: long conversations are summarized map-reduce style
+            lines = conversation_lines(messages)
             
-            if len(conversation_text) < 100:
+            if sum(len(line) for line in lines) < 100:
                 return "Conversation too short to summarize"
             
-            if summarizer and len(conversation_text) < 1024:  # BART has token limits
-                # Use local model
-                summary = summarizer(conversation_text, max_length=100, min_length=30, do_sample=False)
-                return summary[0]['summary_text']
-            else:
-                # Use a simpler approach for summarization
-                payload = {
-                    "inputs": f"Summarize this conversation: {conversation_text[:500]}",
-                    "parameters": {
-                        "max_length": 100,
-                        "min_length": 30
-                    }
-                }
-                
-                response = AIService.call_huggingface_api("facebook/bart-large-cnn", payload)
-                
-                if response and isinstance(response, list) and len(response) > 0:
-                    if 'summary_text' in response[0]:
-                        return response[0]['summary_text']
-                
-                # Fallback: simple extractive summary
-                sentences = conversation_text.split('.')[:3]
-                return '. '.join(sentences) + '.'
+            return summary_map_reduce.run(lines)['summary']
                 
         except Exception as e:
             logging.error(f"Error summarizing conversation: {e}")
             return 'Unable to generate summary'
-    
+
     @staticmethod
-    def translate_message(text, target_language):
-        """Translate message to target language"""
-        print(target_language)
+    def model_summary(conversation_text):
+        """Cached abstractive summary of ``conversation_text``; None when no model answered"""
+        if len(conversation_text) < 100:
+            return conversation_text  # nothing worth condensing
+
         try:
-            # Define model per language
-            translation_models = {
-                "es": "Helsinki-NLP/opus-mt-en-es",
-                "fr": "Helsinki-NLP/opus-mt-en-fr",
-                "de": "Helsinki-NLP/opus-mt-en-de",
-                "it": "Helsinki-NLP/opus-mt-en-it",
-                "pt": "Helsinki-NLP/opus-mt-en-pt"
-            }
+            return result_cache.get_or_compute(
+                "summarize", SUMMARIZER_MODEL, {"max_length": 100, "min_length": 30}, conversation_text,
+                lambda: AIService.abstractive_summary(conversation_text)
+            ) or None
+        except Exception as e:
+            logging.error(f"Error summarizing text: {e}")
+            return None
 
-            model_name = translation_models.get(target_language)
-            if not model_name:
-                return text  # unsupported
+    @staticmethod
+    def summarize_text(conversation_text):
+        """Cached abstractive summary of ``conversation_text``, falling back to its first sentences"""
+        summary = AIService.model_summary(conversation_text)
+        if summary:
+            return summary
+        else:
+            # Fallback: simple extractive summary
+            sentences = conversation_text.split('.')[:3]
+            return '. '.join(sentences) + '.'
+    
+    @staticmethod
+    def count_summary_tokens(texts):
+        """Summarizer token counts, estimated from word counts when no tokenizer is available"""
+        counts = ai_backend.count_tokens(texts)
+        return counts if counts is not None else estimate_tokens(texts)
 
-            payload = {
-                "inputs": text,
-                "options": {"wait_for_model": True}
+    @staticmethod
+    def abstractive_summary(conversation_text):
+        """BART summary from the local model / model server, else the HF API; None if both fail"""
+        summary = None
+        fits = AIService.count_summary_tokens([conversation_text])[0] <= SUMMARY_CHUNK_TOKENS
+        if fits:  # BART has token limits
+            # Use local model or the model server
+            summary = ai_backend.summarize(conversation_text, max_length=100, min_length=30)
+        if summary:
+            return summary
+
+        # Use a simpler approach for summarization
+        payload = {
+            "inputs": f"Summarize this conversation: {conversation_text if fits else conversation_text[:500]}",
+            "parameters": {
+                "max_length": 100,
+                "min_length": 30
             }
+        }
 
-            response = AIService.call_huggingface_api(model_name, payload)
+        response = AIService.call_huggingface_api(SUMMARIZER_MODEL, payload)
 
-            if isinstance(response, list) and 'translation_text' in response[0]:
-                return response[0]['translation_text'].strip()
-            elif 'generated_text' in response[0]:
-                return response[0]['generated_text'].strip()
+        if response and isinstance(response, list) and len(response) > 0:
+            if 'summary_text' in response[0]:
+                return response[0]['summary_text']
+        return None
 
-            return text
+    @staticmethod
+    def translate_message(text, target_language):
+        """Translate message to target language"""
+        try:
+            model_name = TRANSLATION_MODELS.get(target_language)
+            if not model_name:
+                logging.warning(f"No model found for target language: {target_language}")
+                return text
+
+            # Local backend or the model server, cached per (model, language, text)
+            translated = result_cache.get_or_compute(
+                "translate", model_name, {"target_language": target_language}, text,
+                lambda: ai_backend.translate(text, target_language)
+            )
+            return translated if translated else text
 
         except Exception as e:
             logging.error(f"Error translating message: {e}")
             return text
 
+    @staticmethod
+    def translate_batch(texts, target_language):
+        """Translate many texts in one model call; None for each text that could not be translated"""
+        model_name = TRANSLATION_MODELS.get(target_language)
+        if not model_name:
+            logging.warning(f"No model found for target language: {target_language}")
+            return [None] * len(texts)
+
+        params = {"target_language": target_language}
+        results = [result_cache.get("translate", model_name, params, text) for text in texts]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if not missing:
+            return results
+
+        try:
+            translated = ai_backend.translate_batch([texts[i] for i in missing], target_language)
+        except Exception as e:
+            logging.error(f"Error translating messages: {e}")
+            translated = None
+
+        for i, text in zip(missing, translated or []):
+            result_cache.put("translate", model_name, params, texts[i], text)
+            results[i] = text
+        return results
+
     @staticmethod
     def process_enhancement_response(response, original, prompt=""):
         if isinstance(response, list) and 'generated_text' in response[0]:
@@ -299,6 +303,75 @@ class AIService:
             return response['generated_text'].strip()
         return original
  
+    @staticmethod
+    def enhance_with_models(text, enhancement_type):
+        """Rewrite text in a professional/casual tone with the HF models; None if every model fails"""
+        models_to_try = [
+            "pszemraj/flan-t5-large-grammar-synthesis",  # best for grammar+tone
+            "Vamsi/T5_Paraphrase_Paws",
+            "tuner007/pegasus_paraphrase"                        # Fallback basic model
+        ]
+
+        # Construct prompt
+        if enhancement_type == "professional":
+            prompt = f"Make this text more professional and formal: {text}"
+        else:  # casual
+            prompt = f"Make this text more casual and friendly: {text}"
+
+        enhanced_result = None
+
+        for model in models_to_try:
+            print(f"\n🚀 Trying model: {model}")
+            try:
+                if model == "google/flan-t5-base":
+                    payload = {
+                        "inputs": prompt,
+                        "parameters": {
+                            "max_length": 128,
+                            "temperature": 0.3
+                        },
+                        "options": {"wait_for_model": True}
+                    }
+
+                elif model == "facebook/bart-large-cnn":
+                    payload = {
+                        "inputs": f"Rewrite in {enhancement_type} tone: {text}",
+                        "parameters": {
+                            "max_length": len(text) + 30,
+                            "min_length": max(10, len(text) - 10)
+                        },
+                        "options": {"wait_for_model": True}
+                    }
+
+                else:  # gpt2
+                    payload = {
+                        "inputs": f"{prompt}\nOriginal: {text}\nRewritten:",
+                        "parameters": {
+                            "max_length": len(prompt) + len(text) + 50,
+                            "temperature": 0.7,
+                            "do_sample": True,
+                            "pad_token_id": 50256
+                        },
+                        "options": {"wait_for_model": True}
+                    }
+
+                print(f"🧠 Payload for {model}: {payload}")
+                response = AIService.call_huggingface_api(model, payload)
+                print(f"🧾 HF API Response for {model}: {response}")
+
+                if response:
+                    parsed = AIService.process_enhancement_response(response, text, prompt)
+                    if parsed and parsed != text:
+                        enhanced_result = parsed
+                        print(f"✅ Successfully enhanced with {model}: '{enhanced_result}'")
+                        break
+
+            except Exception as e:
+                print(f"❌ Error with model {model}: {e}")
+                continue
+
+        return enhanced_result
+
     @staticmethod
     def enhance_message(text, enhancement_type="grammar"):
         try:
@@ -308,80 +381,16 @@ class AIService:
 
             if enhancement_type == "grammar":
                 # Simple rule-based grammar fix
-                enhanced = text.strip()
-                if enhanced and not enhanced[0].isupper():
-                    enhanced = enhanced[0].upper() + enhanced[1:]
-                if enhanced and enhanced[-1] not in '.!?':
-                    enhanced += '.'
+                enhanced = text_rules.fix_grammar(text)
                 print(f"✅ Grammar enhanced result: '{enhanced}'")
                 return enhanced
 
             # Tone-based enhancement
             elif enhancement_type in ["professional", "casual"]:
-                models_to_try = [
-                    "pszemraj/flan-t5-large-grammar-synthesis",  # best for grammar+tone
-    "Vamsi/T5_Paraphrase_Paws",
-    "tuner007/pegasus_paraphrase"                        # Fallback basic model
-                ]
-
-                # Construct prompt
-                if enhancement_type == "professional":
-                    prompt = f"Make this text more professional and formal: {text}"
-                else:  # casual
-                    prompt = f"Make this text more casual and friendly: {text}"
-
-                enhanced_result = None
-
-                for model in models_to_try:
-                    print(f"\n🚀 Trying model: {model}")
-                    try:
-                        if model == "google/flan-t5-base":
-                            payload = {
-                                "inputs": prompt,
-                                "parameters": {
-                                    "max_length": 128,
-                                    "temperature": 0.3
-                                },
-                                "options": {"wait_for_model": True}
-                            }
-
-                        elif model == "facebook/bart-large-cnn":
-                            payload = {
-                                "inputs": f"Rewrite in {enhancement_type} tone: {text}",
-                                "parameters": {
-                                    "max_length": len(text) + 30,
-                                    "min_length": max(10, len(text) - 10)
-                                },
-                                "options": {"wait_for_model": True}
-                            }
-
-                        else:  # gpt2
-                            payload = {
-                                "inputs": f"{prompt}\nOriginal: {text}\nRewritten:",
-                                "parameters": {
-                                    "max_length": len(prompt) + len(text) + 50,
-                                    "temperature": 0.7,
-                                    "do_sample": True,
-                                    "pad_token_id": 50256
-                                },
-                                "options": {"wait_for_model": True}
-                            }
-
-                        print(f"🧠 Payload for {model}: {payload}")
-                        response = AIService.call_huggingface_api(model, payload)
-                        print(f"🧾 HF API Response for {model}: {response}")
-
-                        if response:
-                            parsed = AIService.process_enhancement_response(response, text, prompt)
-                            if parsed and parsed != text:
-                                enhanced_result = parsed
-                                print(f"✅ Successfully enhanced with {model}: '{enhanced_result}'")
-                                break
-
-                    except Exception as e:
-                        print(f"❌ Error with model {model}: {e}")
-                        continue
-
+                enhanced_result = result_cache.get_or_compute(
+                    "enhance", "tone-models", {"type": enhancement_type}, text,
+                    lambda: AIService.enhance_with_models(text, enhancement_type)
+                )
                 if enhanced_result:
                     return enhanced_result
 
@@ -400,37 +409,20 @@ class AIService:
     @staticmethod
     def rule_based_enhancement(text, enhancement_type):
         # Simplified fallback enhancement
-        enhanced = text.strip()
-        if enhanced and not enhanced[0].isupper():
-            enhanced = enhanced[0].upper() + enhanced[1:]
-        if enhanced and enhanced[-1] not in '.!?':
-            enhanced += '.'
+        enhanced = text_rules.fix_grammar(text)
         if enhancement_type == "professional":
-            enhanced = enhanced.replace("hey", "hello").replace("boss", "manager")
+            enhanced = text_rules.PROFESSIONAL.apply(enhanced)
         elif enhancement_type == "casual":
-            enhanced = enhanced.replace("please", "hey").replace("kindly", "just")
+            enhanced = text_rules.CASUAL.apply(enhanced)
         return enhanced
 
     @staticmethod 
     def fix_basic_grammar(text):
-        """Fix basic grammar issues"""
+        """Fix basic grammar issues (double modals, lowercase 'i', repeated spaces, capital)"""
         try:
-            # Fix double modals like "could be might"
-            text = re.sub(r'\b(could|would|should|might|may|will|can)\s+(be\s+)?(might|may|could|would|should|will|can)\b', 
-                        r'\1 \2', text, flags=re.IGNORECASE)
-            
-            # Fix "could be might" specifically -> "could be" or "might be"
-            text = re.sub(r'\bcould\s+be\s+might\b', 'might be', text, flags=re.IGNORECASE)
-            text = re.sub(r'\bmight\s+be\s+could\b', 'could be', text, flags=re.IGNORECASE)
-            
-            # Fix double spacing
-            text = re.sub(r'\s+', ' ', text)
-            
-            # Fix capitalization at start
-            text = text.strip()
+            text = text_rules.GRAMMAR.apply(text).strip()
             if text and not text[0].isupper():
                 text = text[0].upper() + text[1:]
-                
             return text
             
         except Exception as e:
@@ -577,65 +569,78 @@ class AIService:
     def detect_language(text):
         """Detect language of the message"""
         try:
-            # Simple language detection based on common words
-            spanish_words = ['hola', 'como', 'que', 'es', 'el', 'la', 'de', 'y']
-            french_words = ['bonjour', 'comment', 'que', 'est', 'le', 'la', 'de', 'et']
-            german_words = ['hallo', 'wie', 'was', 'ist', 'der', 'die', 'das', 'und']
-            
-            text_lower = text.lower()
-            
-            spanish_count = sum(1 for word in spanish_words if word in text_lower)
-            french_count = sum(1 for word in french_words if word in text_lower)
-            german_count = sum(1 for word in german_words if word in text_lower)
-            
-            if spanish_count > 1:
-                return 'es'
-            elif french_count > 1:
-                return 'fr'
-            elif german_count > 1:
-                return 'de'
-            else:
-                return 'en'
+            # Character n-gram model (langid.py); cheap, so it always runs in-process
+            return detect_language(text)
             
         except Exception as e:
             logging.error(f"Error detecting language: {e}")
             return 'en'
 
-# Store messages in memory for AI processing (supplement to database)
-chat_message_cache = {}
+    @staticmethod
+    def detect_language_batch(texts):
+        """Detect the language of many messages (e.g. a history page) in one pass"""
+        try:
+            return detect_languages(texts)
+        except Exception as e:
+            logging.error(f"Error detecting languages: {e}")
+            return ['en'] * len(texts)
+
+RECENT_MESSAGES_SQL = """
+    SELECT cm.message_id, cm.sender_id, u.email AS sender_email, cm.receiver_id, cm.message, cm.timestamp,
+           """ + message_analysis.SELECT_COLUMNS + """
+    FROM chatmessage cm
+    JOIN users u ON cm.sender_id = u.user_id
+    LEFT JOIN message_analysis ma ON ma.message_id = cm.message_id
+    WHERE cm.chat_id = %s
+    ORDER BY cm.timestamp DESC, cm.seq DESC
+    LIMIT %s
+"""
 
 
 def get_recent_messages(chat_id, limit=10):
     """
-    Get recent messages for smart reply generation
-    Should return messages in format expected by smart_reply_suggestions
+    The chat's newest ``limit`` messages (oldest first) for the AI features.
+
+    Warm chats are served from the session store's recent-message window;
+    a cold chat is hydrated with one query for a full window, after which
+    send_message keeps it current.
     """
+    messages = session_store.window(chat_id, limit)
+    if messages is not None:
+        return messages
+
     try:
-        # Example implementation - adjust based on your database schema
+        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
-        sql_query = """
-            SELECT * FROM chatmessage
-            WHERE chat_id = %s
-            ORDER BY timestamp DESC
-            LIMIT %s
-        """
-        cursor.execute(sql_query, (chat_id, limit))
-        messages = cursor.fetchall()
-        
-        # Convert to format expected by smart_reply_suggestions
-        message_history = []
-        for msg in reversed(messages):  # Reverse to get chronological order
-            message_history.append({
-                'message': msg.content,  # Adjust field name based on your schema
-                'sender_id': msg.sender_id,
-                'timestamp': msg.timestamp
-            })
-        
-        return message_history
-        
-    except Exception as e:
-        print(f"Error fetching recent messages: {e}")
+        try:
+            cursor.execute(RECENT_MESSAGES_SQL, (chat_id, session_store.buffer_size))
+            messages = cursor.fetchall()
+        finally:
+            cursor.close()
+    except mysql.connector.Error as e:
+        logging.error(f"Error fetching recent messages: {e}")
         return []
+
+    messages.reverse()  # chronological order
+    for message in messages:
+        if isinstance(message['timestamp'], datetime):
+            message['timestamp'] = message['timestamp'].isoformat()
+        message_analysis.pop_analysis(message)
+
+    session_store.set_messages(chat_id, messages)
+    return messages[-limit:] if limit else messages
+
+
+def load_conversation(chat_id, limit=SUMMARY_MAX_MESSAGES):
+    """The chat's newest ``limit`` messages straight from the database, oldest first"""
+    cursor = get_db_connection().cursor(dictionary=True)
+    try:
+        cursor.execute(RECENT_MESSAGES_SQL, (chat_id, limit))
+        messages = cursor.fetchall()
+    finally:
+        cursor.close()
+    messages.reverse()
+    return messages
     
 @app.route('/register', methods=['POST'])
 def register():
@@ -705,32 +710,31 @@ def handle_connect():
     print('Client connected')
     emit('message', {'data': 'Connected to server'})
 
-def get_db_connection():
-    """Function to get a connection to the MySQL database."""
-    return connection
+def user_room(email):
+    """Room holding every socket of one user, on whichever worker they are connected"""
+    return f"user:{email}"
 
 @socketio.on('register_user')
 def handle_register_user(data):
     email = data.get('email')
     if email:
-        user_socket_map[email] = request.sid
+        session_store.add_session(email, request.sid)
+        join_room(user_room(email))
         print(f"{email} registered with socket {request.sid}")
 
 @socketio.on('add_contact_notification')
 def handle_add_contact_notification(data):
     user_email = data.get('userEmail')
     contact_email = data.get('contactEmail')
-    contact_sid = user_socket_map.get(contact_email)
-    if contact_sid:
-        emit('new_contact_added', {'userEmail': user_email, 'contactEmail': contact_email}, to=contact_sid)
+    if contact_email:
+        emit('new_contact_added', {'userEmail': user_email, 'contactEmail': contact_email}, to=user_room(contact_email))
 
 @socketio.on('remove_contact_notification')
 def handle_remove_contact_notification(data):
     user_email = data.get('userEmail')
     contact_email = data.get('contactEmail')
-    contact_sid = user_socket_map.get(contact_email)
-    if contact_sid:
-        emit('contact_removed', {'userEmail': user_email, 'contactEmail': contact_email}, to=contact_sid)
+    if contact_email:
+        emit('contact_removed', {'userEmail': user_email, 'contactEmail': contact_email}, to=user_room(contact_email))
 
 @socketio.on('create_chat_session')
 def handle_create_chat_session(data):
@@ -742,23 +746,15 @@ def handle_create_chat_session(data):
         cursor = conn.cursor()
 
         # Get user IDs corresponding to the email addresses
-        cursor.execute("""
-        SELECT user_id FROM users WHERE email = %s
-        """, (email1,))
-        user1 = cursor.fetchone()
-
-        cursor.execute("""
-        SELECT user_id FROM users WHERE email = %s
-        """, (email2,))
-        user2 = cursor.fetchone()
+        user_ids = identity.resolve_many(conn, [email1, email2])
 
         # Ensure both users exist
-        if not user1 or not user2:
+        if email1 not in user_ids or email2 not in user_ids:
             emit('error', {'message': 'One or both users do not exist.'})
             return
 
-        user1_id = user1[0]
-        user2_id = user2[0]
+        user1_id = user_ids[email1]
+        user2_id = user_ids[email2]
 
         # Check if a chat session already exists between these two users
         cursor.execute("""
@@ -780,10 +776,6 @@ def handle_create_chat_session(data):
         # Join the room corresponding to the chat session
         join_room(chat_id)
 
-        # Initialize message cache for this chat
-        if chat_id not in chat_message_cache:
-            chat_message_cache[chat_id] = []
-
         # Emit the chat session ID to the client
         emit('chat_session_created', {'chat_id': chat_id})
 
@@ -811,61 +803,193 @@ def handle_join_room(data):
     # Join the specified room
     join_room(chat_id)
     
-    # Initialize message cache for this chat if not exists
-    if chat_id not in chat_message_cache:
-        chat_message_cache[chat_id] = []
-    
     emit('room_joined', {'chat_id': chat_id})
     logging.info(f"User has joined room: {chat_id}")
 
+@socketio.on('mark_chat_read')
+def handle_mark_chat_read(data):
+    chat_id = data.get('chat_id')
+    email = data.get('email')
+    if not chat_id or not email:
+        emit('error', {'message': 'Chat ID and email are required.'})
+        return
+
+    conn = get_db_connection()
+    user_id = identity.resolve(conn, email)
+    if not user_id:
+        return
+    cursor = conn.cursor()
+    try:
+        chat_summary.mark_read(cursor, chat_id, user_id)
+        conn.commit()
+    except mysql.connector.Error as e:
+        conn.rollback()
+        logging.error("Database error: %s", e)
+    finally:
+        cursor.close()
+
+# Sentiment/language annotation runs after delivery on background workers
+ANNOTATION_WORKERS = int(os.getenv("ANNOTATION_WORKERS", 2))
+ANNOTATION_MAX_PENDING = int(os.getenv("ANNOTATION_MAX_PENDING", 500))
+ANNOTATION_DROP_POLICY = os.getenv("ANNOTATION_DROP_POLICY", "drop_oldest")
+
+
+def annotate_message(job):
+    """Analyse a delivered message, store the result and notify the room."""
+    sentiment = AIService.model_sentiment(job['message'])
+    if sentiment is None:
+        # Left unanalysed, so the backfill (python message_analysis.py) picks it up later
+        logging.warning(f"No sentiment model answered for message {job['message_id']}; analysis skipped")
+        return
+    language = AIService.detect_language(job['message'])
+
+    with db.db_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            message_analysis.save_analysis(cursor, job['message_id'], sentiment, language)
+            conn.commit()
+        finally:
+            cursor.close()
+
+    ai_analysis = {
+        'sentiment': sentiment,
+        'language': language
+    }
+    session_store.update_message(job['chat_id'], job['message_id'], {'ai_analysis': ai_analysis})
+
+    socketio.emit('message_annotated', {
+        'message_id': job['message_id'],
+        'chat_id': job['chat_id'],
+        'ai_analysis': ai_analysis
+    }, room=job['chat_id'])
+
+
+annotation_pipeline = AnnotationPipeline(
+    annotate_message,
+    workers=ANNOTATION_WORKERS,
+    max_pending=ANNOTATION_MAX_PENDING,
+    drop_policy=ANNOTATION_DROP_POLICY,
+    name="annotator"
+)
+
+# Long conversations: token-budgeted chunks summarized in parallel, then reduced
+summary_map_reduce = MapReduceSummarizer(AIService.model_summary, count_tokens=AIService.count_summary_tokens)
+
+# Smart replies are generated in the background for each chat's newest message
+SMART_REPLY_PRECOMPUTE = os.getenv('SMART_REPLY_PRECOMPUTE', '1') == '1'
+SMART_REPLY_HISTORY = 5
+
+smart_reply_precomputer = SmartReplyPrecomputer(
+    lambda history, should_stop: AIService.smart_reply_suggestions(history, 3, should_stop)
+)
+
+STORED_MESSAGE_SQL = """
+    SELECT cm.message_id, cm.chat_id, cm.sender_id, cm.receiver_id, cm.message, cm.timestamp,
+           s.email AS sender_email, r.email AS receiver_email,
+           """ + message_analysis.SELECT_COLUMNS + """,
+           """ + attachments.SELECT_COLUMNS + """
+    FROM chatmessage cm
+    JOIN users s ON s.user_id = cm.sender_id
+    JOIN users r ON r.user_id = cm.receiver_id
+    LEFT JOIN message_analysis ma ON ma.message_id = cm.message_id
+    LEFT JOIN ChatMessageImages cmi ON cmi.message_id = cm.message_id
+    WHERE cm.message_id = %s
+"""
+
+
+def emit_resent_message(message_id, chat_id, sender_id, message):
+    """
+    Answer a send_message whose message_id is already stored.
+
+    A resend of the same message (its first attempt timed out but was
+    committed) re-emits the stored row without annotating it or scheduling
+    smart replies again; a row the first attempt never annotated is left
+    to the message_analysis backfill. Any other message reusing the id is
+    rejected.
+    """
+    with db.db_connection() as conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            cursor.execute(STORED_MESSAGE_SQL, (message_id,))
+            stored = cursor.fetchone()
+        finally:
+            cursor.close()
+
+    if stored is None or (stored['chat_id'], stored['sender_id'], stored['message']) != (chat_id, sender_id, message):
+        emit('error', {'message': 'Message ID is already in use.'})
+        return
+
+    if isinstance(stored['timestamp'], datetime):
+        stored['timestamp'] = stored['timestamp'].isoformat()
+    emit('new_message', message_analysis.pop_analysis(attachments.pop_image(stored)), room=chat_id)
+
+
 @socketio.on('send_message')
 def handle_send_message(data):
     chat_id = data.get('chat_id')
     sender_email = data.get('sender_email')
     receiver_email = data.get('receiver_email')
     message = data.get('message')
-    image = data.get('image')  # Optional image data
+    image = data.get('image')  # Optional {attachment_id, file_name, file_type} from /api/attachments/uploads
 
     if not chat_id or not sender_email or not receiver_email or not message:
         emit('error', {'message': 'Chat ID, sender ID, and message are required.'})
         return
+    if image and not (
+        isinstance(image, dict)
+        and isinstance(image.get('attachment_id'), str)
+        and all(isinstance(image.get(field), (str, type(None))) for field in ('file_name', 'file_type'))
+    ):
+        emit('error', {'message': 'Invalid image attachment.'})
+        return
+    if image and not attachments.exists(image['attachment_id']):
+        emit('error', {'message': 'Upload the attachment before sending it.'})
+        return
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # Generate a UUID for the message
-        message_id = str(uuid.uuid4())
-        cursor.execute("""
-        SELECT user_id FROM users WHERE email = %s
-        """, (sender_email,))
-        sender_ids = cursor.fetchone()
-        sender_id = sender_ids[0]
-
-        cursor.execute("""
-        SELECT user_id FROM users WHERE email = %s
-        """, (receiver_email,))
-        receiver_ids = cursor.fetchone()
-        receiver_id = receiver_ids[0]
-
-        # AI Analysis
-        sentiment = AIService.analyze_sentiment(message)
-        language = AIService.detect_language(message)
-
-        # Insert the message into the chatmessage table
-        cursor.execute("""
-        INSERT INTO chatmessage (message_id, chat_id, sender_id, receiver_id, message) VALUES (%s, %s, %s, %s, %s)
-        """, (message_id, chat_id, sender_id, receiver_id, message))
-        conn.commit()
+        # A client-supplied id makes a resend (say, after a timeout) idempotent
+        message_id = data.get('message_id')
+        if message_id is None:
+            message_id = str(uuid.uuid4())
+        else:
+            try:
+                message_id = str(uuid.UUID(message_id))
+            except (TypeError, ValueError, AttributeError):
+                emit('error', {'message': 'Invalid message ID.'})
+                return
+        # Borrow a connection only for the lookup so senders waiting on the
+        # group commit below never hold one the writer needs
+        with db.db_connection() as conn:
+            user_ids = identity.resolve_many(conn, [sender_email, receiver_email])
+        if sender_email not in user_ids or receiver_email not in user_ids:
+            emit('error', {'message': 'Sender or receiver does not exist.'})
+            return
+        sender_id = user_ids[sender_email]
+        receiver_id = user_ids[receiver_email]
 
-        # Optionally handle image data
+        # Only a reference to the already uploaded file is stored with the message
+        attachment = None
         if image:
-            cursor.execute("""
-            INSERT INTO ChatMessageImages (message_id, chat_id, sender_id, file_name, file_type, file_url) VALUES (%s, %s, %s, %s, %s, %s)
-            """, (message_id, chat_id, sender_id, image['file_name'], image['file_type'], image['file_data']))
-            conn.commit()
+            attachment = {
+                'attachment_id': image['attachment_id'],
+                'file_name': secure_filename(image.get('file_name') or '') or image['attachment_id'],
+                'file_type': image.get('file_type')
+            }
+
+        # Committed together with other senders' messages; returns once durable
+        inserted = message_writer.write({
+            'message_id': message_id,
+            'chat_id': chat_id,
+            'sender_id': sender_id,
+            'receiver_id': receiver_id,
+            'message': message,
+            'image': attachment
+        })
+        if not inserted:
+            emit_resent_message(message_id, chat_id, sender_id, message)
+            return
 
-        # Create message object with AI analysis
+        # AI analysis arrives later through a 'message_annotated' event
         message_obj = {
             'message_id': message_id,
             'chat_id': chat_id,
@@ -875,26 +999,32 @@ def handle_send_message(data):
             'receiver_email': receiver_email,
             'message': message,
             'timestamp': datetime.now().isoformat(),
-            'ai_analysis': {
-                'sentiment': sentiment,
-                'language': language
-            }
+            'image': attachments.image_reference(**attachment) if attachment else None,
+            'ai_analysis': None
         }
 
-        # Add to message cache for AI processing
-        if chat_id not in chat_message_cache:
-            chat_message_cache[chat_id] = []
-        chat_message_cache[chat_id].append(message_obj)
-
-        # Keep only last 50 messages in cache
-        if len(chat_message_cache[chat_id]) > 50:
-            chat_message_cache[chat_id] = chat_message_cache[chat_id][-50:]
+        # Keep the chat's recent-message window current (cold chats are hydrated on first AI use)
+        session_store.append_message(chat_id, message_obj)
 
         # Example logging
-        logging.info("Emitting new message with AI analysis: %s", message_obj)
+        logging.info("Emitting new message: %s", message_obj)
         
         emit('new_message', message_obj, room=chat_id)
 
+        annotation_pipeline.submit({
+            'message_id': message_id,
+            'chat_id': chat_id,
+            'message': message
+        })
+
+        if SMART_REPLY_PRECOMPUTE:
+            # Built from memory so sending never waits on a hydration query; a
+            # cold chat (or a window a concurrent hydration just replaced)
+            # still ends with the message sent here
+            window = session_store.window(chat_id, SMART_REPLY_HISTORY) or []
+            history = [m for m in window if m.get('message_id') != message_id] + [message_obj]
+            smart_reply_precomputer.schedule(chat_id, message_id, history[-SMART_REPLY_HISTORY:])
+
     except mysql.connector.Error as e:
         logging.error("Database error: %s", e)
         emit('error', {'message': 'An error occurred while sending the message.'})
@@ -902,14 +1032,62 @@ def handle_send_message(data):
         logging.error("Unexpected error: %s", e)
         emit('error', {'message': 'An unexpected error occurred. Please try again.'})
 
+# Keyset pagination for fetch_messages
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+
+def encode_message_cursor(message):
+    """Opaque cursor pointing at a message's (timestamp, seq) position."""
+    timestamp = message['timestamp']
+    if isinstance(timestamp, datetime):
+        timestamp = timestamp.isoformat()
+    raw = f"{timestamp}|{message['seq']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+
+def decode_message_cursor(cursor_value):
+    """Inverse of encode_message_cursor; raises ValueError on malformed input."""
+    raw = base64.urlsafe_b64decode(cursor_value.encode('ascii')).decode('utf-8')
+    timestamp, seq = raw.split('|', 1)
+    return datetime.fromisoformat(timestamp), int(seq)
+
+
 @socketio.on('fetch_messages')
 def handle_fetch_messages(data):
+    """Emit one page of a chat's history.
+
+    Without a cursor the newest page is returned. ``before`` pages backwards
+    through older history (lazy scroll-back) and ``after`` pages forward from
+    a known message. Messages within a page are always oldest first.
+    """
     chat_id = data.get('chat_id')
+    before = data.get('before')
+    after = data.get('after')
 
     if not chat_id:
         emit('error', {'message': 'Chat ID is required.'})
         return
 
+    if before and after:
+        emit('error', {'message': 'Use either a before or an after cursor, not both.'})
+        return
+
+    try:
+        limit = int(data.get('limit') or MESSAGE_PAGE_SIZE)
+    except (TypeError, ValueError):
+        limit = MESSAGE_PAGE_SIZE
+    limit = max(1, min(limit, MAX_MESSAGE_PAGE_SIZE))
+
+    token = before or after
+    try:
+        if token and not isinstance(token, str):
+            raise ValueError("cursor must be a string")
+        cursor_position = decode_message_cursor(token) if token else None
+    except (ValueError, UnicodeDecodeError):
+        emit('error', {'message': 'Invalid pagination cursor.'})
+        return
+
     conn = None
     cursor = None
 
@@ -917,37 +1095,72 @@ def handle_fetch_messages(data):
         conn = get_db_connection()
         cursor = conn.cursor(dictionary=True)
 
-        # Fetch messages for the specified chat_id
-        cursor.execute("""
-        SELECT cm.message_id, cm.sender_id, cm.receiver_id, cm.message, cm.timestamp, u.email as sender_email
+        sql_query = """
+        SELECT cm.message_id, cm.seq, cm.sender_id, cm.receiver_id, cm.message, cm.timestamp, u.email as sender_email,
+               """ + message_analysis.SELECT_COLUMNS + """,
+               """ + attachments.SELECT_COLUMNS + """
         FROM chatmessage cm
         JOIN users u ON cm.sender_id = u.user_id
-        WHERE cm.chat_id = %s ORDER BY cm.timestamp ASC
-        """, (chat_id,))
-
+        LEFT JOIN message_analysis ma ON ma.message_id = cm.message_id
+        LEFT JOIN ChatMessageImages cmi ON cmi.message_id = cm.message_id
+        WHERE cm.chat_id = %s
+        """
+        params = [chat_id]
+
+        if after:
+            # Walk forward from the cursor using idx_chatmessage_chat_ts_seq
+            sql_query += """
+            AND (cm.timestamp > %s OR (cm.timestamp = %s AND cm.seq > %s))
+            ORDER BY cm.timestamp ASC, cm.seq ASC
+            """
+        else:
+            if before:
+                sql_query += """
+                AND (cm.timestamp < %s OR (cm.timestamp = %s AND cm.seq < %s))
+                """
+            sql_query += """
+            ORDER BY cm.timestamp DESC, cm.seq DESC
+            """
+
+        if cursor_position:
+            cursor_timestamp, cursor_seq = cursor_position
+            params += [cursor_timestamp, cursor_timestamp, cursor_seq]
+
+        # Fetch one extra row to know whether another page exists
+        sql_query += " LIMIT %s"
+        params.append(limit + 1)
+
+        cursor.execute(sql_query, tuple(params))
         messages = cursor.fetchall()
 
-        # Add AI analysis to each message and update cache
+        has_more = len(messages) > limit
+        messages = messages[:limit]
+        if not after:
+            messages.reverse()
+
+        # Attach the AI analysis stored at send time and the attachment reference
         processed_messages = []
-        chat_message_cache[chat_id] = []
 
         for message in messages:
             if isinstance(message['timestamp'], datetime):
                 message['timestamp'] = message['timestamp'].isoformat()
             
-            # Add AI analysis
-            sentiment = AIService.analyze_sentiment(message['message'])
-            language = AIService.detect_language(message['message'])
-            
-            message['ai_analysis'] = {
-                'sentiment': sentiment,
-                'language': language
-            }
-            
-            processed_messages.append(message)
-            chat_message_cache[chat_id].append(message)
+            processed_messages.append(message_analysis.pop_analysis(attachments.pop_image(message)))
 
-        emit('messages_fetched', {'messages': processed_messages})
+        # The newest page hydrates the AI features' recent-message window when it covers a full window
+        if not before and not after and (not has_more or len(processed_messages) >= session_store.buffer_size):
+            session_store.set_messages(chat_id, processed_messages)
+
+        emit('messages_fetched', {
+            'chat_id': chat_id,
+            'messages': processed_messages,
+            'has_more': has_more,
+            'direction': 'after' if after else 'before',
+            'page_size': limit,
+            'before_cursor': encode_message_cursor(processed_messages[0]) if processed_messages else before,
+            'after_cursor': encode_message_cursor(processed_messages[-1]) if processed_messages else after,
+            'is_page': bool(before or after)
+        })
 
     except mysql.connector.Error as e:
         logging.error("Database error: %s", e)
@@ -962,15 +1175,20 @@ def handle_get_smart_replies(data):
         chat_id = data.get('chat_id')
         print(chat_id)
         # Get recent message history
-        recent_messages = get_recent_messages(chat_id, limit=5)
-        
-        # Generate smart replies
-        smart_replies = AIService.smart_reply_suggestions(recent_messages,3)
+        recent_messages = get_recent_messages(chat_id, limit=SMART_REPLY_HISTORY)
+        last_message_id = recent_messages[-1].get('message_id') if recent_messages else None
+
+        if last_message_id:
+            # Precomputed when the message arrived, or joins the generation in progress
+            smart_replies = smart_reply_precomputer.get(chat_id, last_message_id, recent_messages) or []
+        else:
+            smart_replies = AIService.smart_reply_suggestions(recent_messages, 3)
         
         # Emit back to the requesting user
         emit('smart_replies_generated', {
             'suggestions': smart_replies,
-            'chat_id': chat_id
+            'chat_id': chat_id,
+            'last_message_id': last_message_id
         })
         
     except Exception as e:
@@ -985,7 +1203,9 @@ def handle_translate_message(data):
 
     text = data.get('text')
     target_language = data.get('target_language', 'es')
-    print(target_language)
+    # With chat_id and message_id the translation is stored for the message
+    chat_id = data.get('chat_id')
+    message_id = data.get('message_id')
     if not text:
         print("❌ No text provided for translation.")
         emit('error', {'message': 'Text is required for translation.'})
@@ -994,13 +1214,21 @@ def handle_translate_message(data):
     print(f"📤 Translating text: '{text}' to language: '{target_language}'")
 
     try:
-        translated = AIService.translate_message(text, target_language)
+        translated = None
+        if chat_id and message_id and target_language in TRANSLATION_MODELS:
+            translated = translation.translate_messages(
+                get_db_connection(), chat_id, [message_id], target_language,
+                lambda texts: AIService.translate_batch(texts, target_language)
+            ).get(message_id)
+        if translated is None:
+            translated = AIService.translate_message(text, target_language)
         print(f"✅ Translated result: '{translated}'")
 
         emit('message_translated', {
             'original': text,
             'translated': translated,
-            'language': target_language
+            'language': target_language,
+            'message_id': message_id
         })
 
     except Exception as e:
@@ -1009,9 +1237,99 @@ def handle_translate_message(data):
         emit('message_translated', {
             'original': text,
             'translated': text,  # Fallback
-            'language': target_language
+            'language': target_language,
+            'message_id': message_id
         })
 
+
+@socketio.on('translate_messages')
+def handle_translate_messages(data):
+    """Translate a page of chat history (the ``message_ids`` on screen) in one batched call.
+
+    Emits ``messages_translated`` with ``{message_id: translated_text}``;
+    messages that could not be translated are listed in ``failed``.
+    """
+    chat_id = data.get('chat_id')
+    message_ids = data.get('message_ids') or []
+    target_language = data.get('target_language', 'es')
+
+    if not chat_id or not isinstance(message_ids, list) or not message_ids:
+        emit('error', {'message': 'Chat ID and message IDs are required for translation.'})
+        return
+    if len(message_ids) > MAX_MESSAGE_PAGE_SIZE:
+        emit('error', {'message': f'At most {MAX_MESSAGE_PAGE_SIZE} messages can be translated at once.'})
+        return
+    if target_language not in TRANSLATION_MODELS:
+        emit('error', {'message': f'Translation to {target_language} is not supported.'})
+        return
+
+    message_ids = [str(message_id) for message_id in message_ids]
+    try:
+        translations = translation.translate_messages(
+            get_db_connection(), chat_id, message_ids, target_language,
+            lambda texts: AIService.translate_batch(texts, target_language)
+        )
+        emit('messages_translated', {
+            'chat_id': chat_id,
+            'language': target_language,
+            'translations': translations,
+            'failed': [message_id for message_id in message_ids if message_id not in translations]
+        })
+
+    except mysql.connector.Error as e:
+        logging.error("Database error: %s", e)
+        emit('error', {'message': 'An error occurred while translating messages.'})
+    except Exception as e:
+        logging.error(f"Error translating messages: {e}")
+        emit('error', {'message': 'An unexpected error occurred.'})
+
+def search_user_messages(connection, email, data):
+    """search_index.search for the user behind ``email``; None if the user does not exist."""
+    user_id = identity.resolve(connection, email)
+    if not user_id:
+        return None
+
+    page, limit = data.get('page'), data.get('limit')
+    try:
+        page = int(page or 1)
+        limit = int(limit or search_index.SEARCH_PAGE_SIZE)
+    except (TypeError, ValueError):
+        page, limit = 1, search_index.SEARCH_PAGE_SIZE
+
+    found = search_index.search(connection, user_id, data.get('query') or '', page, limit,
+                                chat_id=data.get('chat_id') or None)
+    for message in found['results']:
+        if isinstance(message['timestamp'], datetime):
+            message['timestamp'] = message['timestamp'].isoformat()
+    return found
+
+
+@socketio.on('search_messages')
+def handle_search_messages(data):
+    """Full-text search over the user's chats (optionally one ``chat_id``), best matches first.
+
+    Emits ``messages_found`` with one page of ``results`` and the ``total``
+    number of matches; ``page`` and ``limit`` select the page.
+    """
+    email = data.get('email')
+    if not email or not (data.get('query') or '').strip():
+        emit('error', {'message': 'Email and a search query are required.'})
+        return
+
+    try:
+        found = search_user_messages(get_db_connection(), email, data)
+        if found is None:
+            emit('error', {'message': 'User not found.'})
+            return
+        emit('messages_found', found)
+
+    except mysql.connector.Error as e:
+        logging.error("Database error: %s", e)
+        emit('error', {'message': 'An error occurred while searching messages.'})
+    except Exception as e:
+        logging.error(f"Error searching messages: {e}")
+        emit('error', {'message': 'An unexpected error occurred.'})
+
 @socketio.on('enhance_message')
 def handle_enhance_message(data):
     print("=== BACKEND: enhance_message RECEIVED ===")
@@ -1056,8 +1374,18 @@ def handle_summarize_conversation(data):
         return
     
     try:
-        messages = chat_message_cache.get(chat_id, [])
-        summary = AIService.summarize_conversation(messages)
+        if data.get('mode') == 'full':
+            # Whole history in one pass, within the latency budget
+            lines = conversation_lines(load_conversation(chat_id))
+            result = summary_map_reduce.run(lines) if lines else {'summary': 'Conversation too short to summarize'}
+            emit('conversation_summarized', dict(result, mode='full'))
+            return
+
+        # Only messages since the stored checkpoint are summarized
+        summary = rolling_summary.update(get_db_connection(), chat_id, AIService.model_summary)
+        if summary is None:
+            # Chat not in chat_summary yet: summarize the recent window only
+            summary = AIService.summarize_conversation(get_recent_messages(chat_id, limit=None))
         emit('conversation_summarized', {'summary': summary})
     except Exception as e:
         logging.error(f"Error summarizing conversation: {e}")
@@ -1066,15 +1394,132 @@ def handle_summarize_conversation(data):
 @socketio.on('disconnect')
 def handle_disconnect():
     disconnected_sid = request.sid
-    email_to_remove = None
-    for email, sid in user_socket_map.items():
-        if sid == disconnected_sid:
-            email_to_remove = email
-            break
+    email_to_remove = session_store.remove_session(disconnected_sid)
     if email_to_remove:
-        del user_socket_map[email_to_remove]
         print(f"{email_to_remove} disconnected from socket {disconnected_sid}")
 
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    """Runtime metrics for the server's shared resources."""
+    return jsonify({
+        'status': 'success',
+        'db_pool': db.pool.stats(),
+        'ai_backend': ai_backend.stats(),
+        'annotation_pipeline': annotation_pipeline.stats(),
+        'result_cache': result_cache.stats(),
+        'hf_api': hf_api.client.stats(),
+        'session_store': session_store.stats(),
+        'identity_cache': identity.stats(),
+        'message_writer': message_writer.stats(),
+        'smart_replies': smart_reply_precomputer.stats(),
+        'summarization': summary_map_reduce.stats()
+    }), 200
+
+@app.route('/api/profile-images/<image_hash>', methods=['GET'])
+def get_profile_image(image_hash):
+    """Profile image by content hash: strong ETag, immutable, sent from a file"""
+    if not profile_images.HASH_RE.match(image_hash):
+        return jsonify({'status': 'error', 'message': 'Invalid image hash'}), 400
+
+    cache_headers = {
+        'ETag': f'"{image_hash}"',
+        'Cache-Control': f'public, max-age={profile_images.PROFILE_IMAGE_MAX_AGE}, immutable'
+    }
+    # The hash names the bytes, so a matching ETag never needs a lookup
+    if image_hash in request.if_none_match:
+        return '', 304, cache_headers
+
+    path = profile_images.cached_image_path(get_db_connection(), image_hash)
+    if path is None:
+        return jsonify({'status': 'error', 'message': 'Image not found'}), 404
+
+    with open(path, 'rb') as f:
+        mimetype = profile_images.guess_mimetype(f.read(16))
+    response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True, etag=False)
+    response.headers.update(cache_headers)
+    return response
+
+def upload_error_response(e):
+    body = {'status': 'error', 'message': str(e)}
+    headers = {}
+    if e.offset is not None:
+        body['offset'] = e.offset
+        headers['Upload-Offset'] = str(e.offset)
+    return jsonify(body), e.status, headers
+
+
+def upload_status_response(status, code=200):
+    return jsonify(dict(status, status='success')), code, {
+        'Upload-Offset': str(status['offset']),
+        'Upload-Length': str(status['size'])
+    }
+
+
+@app.route('/api/attachments/uploads', methods=['POST'])
+def create_attachment_upload():
+    """Start a resumable upload (see attachments.py for the protocol)"""
+    data = request.get_json(silent=True) or {}
+    try:
+        status = attachments.create_upload(
+            data.get('file_name'), data.get('file_type'), data.get('size'), data.get('sha256')
+        )
+    except attachments.UploadError as e:
+        return upload_error_response(e)
+    return upload_status_response(status, 201)
+
+
+@app.route('/api/attachments/uploads/<upload_id>', methods=['GET', 'HEAD'])
+def get_attachment_upload(upload_id):
+    """Bytes received so far, to resume an interrupted upload"""
+    try:
+        status = attachments.upload_status(upload_id)
+    except attachments.UploadError as e:
+        return upload_error_response(e)
+    return upload_status_response(status)
+
+
+@app.route('/api/attachments/uploads/<upload_id>', methods=['PATCH'])
+def upload_attachment_chunk(upload_id):
+    """Append the raw request body at the Upload-Offset header"""
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None or offset < 0:
+        return jsonify({'status': 'error', 'message': 'Upload-Offset header is required'}), 400
+    if request.content_length is None:
+        return jsonify({'status': 'error', 'message': 'Content-Length header is required'}), 411
+
+    try:
+        # request.stream is read incrementally; the chunk is never held in memory
+        status = attachments.append_chunk(upload_id, offset, request.stream, request.content_length)
+    except attachments.UploadError as e:
+        return upload_error_response(e)
+    return upload_status_response(status)
+
+
+@app.route('/api/attachments/<attachment_id>', methods=['GET'])
+def get_attachment(attachment_id):
+    """Attachment by content hash: Range requests, strong ETag, immutable"""
+    if not attachments.HASH_RE.match(attachment_id):
+        return jsonify({'status': 'error', 'message': 'Invalid attachment id'}), 400
+
+    cache_headers = {
+        'ETag': f'"{attachment_id}"',
+        'Cache-Control': f'public, max-age={attachments.ATTACHMENT_MAX_AGE}, immutable'
+    }
+    if attachment_id in request.if_none_match:
+        return '', 304, cache_headers
+
+    path = attachments.attachment_path(attachment_id)
+    if not os.path.exists(path):
+        return jsonify({'status': 'error', 'message': 'Attachment not found'}), 404
+
+    with open(path, 'rb') as f:
+        mimetype = profile_images.guess_mimetype(f.read(16))
+    # conditional=True answers Range / If-Range; the file goes out through wsgi.file_wrapper (sendfile)
+    response = send_file(os.path.abspath(path), mimetype=mimetype, conditional=True, etag=attachment_id)
+    response.headers.update(cache_headers)
+    return response
+
+
 @app.route('/user/profile', methods=['GET'])
 def get_profile():
     email = request.args.get('email')
@@ -1082,35 +1527,24 @@ def get_profile():
     if not email:
         return jsonify({'status': 'error', 'message': 'Email is required'}), 400
 
+    connection = get_db_connection()
     cursor = connection.cursor()
     # Add timestamp to query to prevent caching
     current_time = datetime.now().timestamp()
     
-    cursor.execute("SELECT username, email, profile_image FROM users WHERE email = %s", (email,))
+    cursor.execute("SELECT username, email, profile_image_hash FROM users WHERE email = %s", (email,))
     result = cursor.fetchone()
 
     if not result:
         return jsonify({'status': 'error', 'message': 'User not found'}), 404
 
-    username, email, profile_image = result
-
-    # If the image is stored as binary, encode it to base64
-    image_url = None
-    if profile_image:
-        try:
-            # Create a proper data URL format
-            base64_image = base64.b64encode(profile_image).decode('utf-8')
-            image_url = f"data:image/jpeg;base64,{base64_image}"
-            # Don't append cache-busting parameters to data URLs
-        except Exception as e:
-            logging.error(f"Error encoding profile image: {e}")
-            # If encoding fails, return null instead of crashing
-            image_url = None
+    username, email, image_hash = result
 
     return jsonify({
         'name': username,
         'email': email,
-        'image': image_url,
+        'image': profile_images.image_url(image_hash),
+        'image_hash': image_hash,
         'timestamp': current_time  # Include timestamp in response
     })
 
@@ -1123,8 +1557,9 @@ def update_profile():
     if not email:
         return jsonify({"error": "Email is required"}), 400
 
-    # Using mysql.connector connection and cursor
-    cursor = connection.cursor()
+    # Using mysql.connector connection and cursor (buffered: the identity lookup below opens its own)
+    connection = get_db_connection()
+    cursor = connection.cursor(buffered=True)
 
     # Build update query dynamically
     update_fields = []
@@ -1150,18 +1585,18 @@ def update_profile():
         image_data = image.read()
         update_fields.append("profile_image = %s")
         update_values.append(image_data)
+        update_fields.append("profile_image_hash = %s")
+        update_values.append(profile_images.image_hash(image_data))
 
     if not update_fields:
         return jsonify({"message": "No data provided for update"}), 400
 
     # Get the user_id from email
-    cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-    user_result = cursor.fetchone()
+    user_id = identity.resolve(connection, email)
     
-    if not user_result:
+    if not user_id:
         return jsonify({"error": "User not found"}), 404
         
-    user_id = user_result[0]
     update_values.append(user_id)  # For WHERE clause
 
     sql_update = f"UPDATE users SET {', '.join(update_fields)} WHERE user_id = %s"
@@ -1169,6 +1604,7 @@ def update_profile():
     try:
         cursor.execute(sql_update, update_values)
         connection.commit()
+        identity.invalidate(email, data.get('email'))
         
         # Update the email in localStorage if it was changed
         return jsonify({"message": "Profile updated successfully"})
@@ -1181,44 +1617,21 @@ def update_profile():
 @app.route('/api/last-messages/<email>', methods=['GET'])
 def get_last_messages(email):
     try:
+        connection = get_db_connection()
         cursor = connection.cursor(dictionary=True)
 
         # Get current user ID
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-        user = cursor.fetchone()
-        if not user:
+        user_id = identity.resolve(connection, email)
+        if not user_id:
             return jsonify({'status': 'error', 'message': 'User not found'}), 404
-        user_id = user['user_id']
 
-        # Get latest message with each contact
-        cursor.execute("""
-            SELECT 
-                cm.chat_id,
-                cm.message,
-                cm.timestamp,
-                u.username,
-                u.email,
-                u.profile_image,
-                cm.sender_id,
-                cm.receiver_id
-            FROM chatmessage cm
-            JOIN (
-                SELECT chat_id, MAX(timestamp) as max_time
-                FROM chatmessage
-                GROUP BY chat_id
-            ) latest ON cm.chat_id = latest.chat_id AND cm.timestamp = latest.max_time
-            JOIN chatsession cs ON cs.chat_id = cm.chat_id
-            JOIN users u ON (u.user_id = cs.user1_id OR u.user_id = cs.user2_id)
-            WHERE (cs.user1_id = %s OR cs.user2_id = %s)
-              AND u.user_id != %s
-        """, (user_id, user_id, user_id))
-
-        messages = cursor.fetchall()
+        # Latest message with each contact, from the per-chat summaries
+        messages = chat_summary.last_messages(cursor, user_id)
+        cursor.close()
 
         for msg in messages:
-            if msg['profile_image']:
-                msg['profile_image'] = base64.b64encode(msg['profile_image']).decode('utf-8')
-            msg['timestamp'] = msg['timestamp'].isoformat()
+            msg['profile_image_url'] = profile_images.image_url(msg['profile_image_hash'])
+            msg['timestamp'] = msg['timestamp'].isoformat() if msg['timestamp'] else None
 
         return jsonify({'status': 'success', 'messages': messages})
 
@@ -1226,27 +1639,50 @@ def get_last_messages(email):
         logging.error(f"Error in get_last_messages: {e}")
         return jsonify({'status': 'error', 'message': 'Internal error'}), 500
 
+# Search a user's messages: /api/search/<email>?q=...&page=1&limit=20[&chat_id=...]
+@app.route('/api/search/<email>', methods=['GET'])
+def search_messages(email):
+    query = request.args.get('q', '')
+    if not query.strip():
+        return jsonify({'status': 'error', 'message': 'Search query is required'}), 400
+
+    try:
+        found = search_user_messages(get_db_connection(), email, {
+            'query': query,
+            'page': request.args.get('page'),
+            'limit': request.args.get('limit'),
+            'chat_id': request.args.get('chat_id'),
+        })
+        if found is None:
+            return jsonify({'status': 'error', 'message': 'User not found'}), 404
+        return jsonify(dict(found, status='success'))
+
+    except mysql.connector.Error as e:
+        logging.error(f"Database error: {e}")
+        return jsonify({'status': 'error', 'message': 'Database error occurred'}), 500
+    except Exception as e:
+        logging.error(f"Error in search_messages: {e}")
+        return jsonify({'status': 'error', 'message': 'Internal error'}), 500
+
 # Get a user's contacts
 @app.route('/api/contacts/<email>', methods=['GET'])
 def get_contacts(email):
     if not email:
         return jsonify({'status': 'error', 'message': 'Email is required'}), 400
 
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user ID from email
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (email,))
-        user_result = cursor.fetchone()
+        user_id = identity.resolve(connection, email)
         
-        if not user_result:
+        if not user_id:
             return jsonify({'status': 'error', 'message': 'User not found'}), 404
-            
-        user_id = user_result['user_id']
         
         # Get all contacts for this user
         cursor.execute("""
-            SELECT u.user_id, u.username, u.email, u.profile_image 
+            SELECT u.user_id, u.username, u.email, u.profile_image_hash
             FROM contact c
             JOIN users u ON c.contact_user_id = u.user_id
             WHERE c.user_id = %s
@@ -1257,17 +1693,13 @@ def get_contacts(email):
         # Process the results
         processed_contacts = []
         for contact in contacts:
-            # Convert binary profile image to base64 string if it exists
-            profile_image = None
-            if contact['profile_image']:
-                import base64
-                profile_image = base64.b64encode(contact['profile_image']).decode('utf-8')
-                
+            # Images are fetched separately from their content-hash URL
             processed_contacts.append({
                 'user_id': contact['user_id'],
                 'username': contact['username'],
                 'email': contact['email'],
-                'profile_image': profile_image
+                'profile_image_hash': contact['profile_image_hash'],
+                'profile_image_url': profile_images.image_url(contact['profile_image_hash'])
             })
             
         return jsonify({'status': 'success', 'contacts': processed_contacts}), 200
@@ -1292,21 +1724,18 @@ def add_contact():
     if not user_email or not contact_email:
         return jsonify({'status': 'error', 'message': 'Both user and contact emails are required'}), 400
         
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user IDs from emails
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (user_email,))
-        user_result = cursor.fetchone()
+        user_ids = identity.resolve_many(connection, [user_email, contact_email])
         
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (contact_email,))
-        contact_result = cursor.fetchone()
-        
-        if not user_result or not contact_result:
+        if user_email not in user_ids or contact_email not in user_ids:
             return jsonify({'status': 'error', 'message': 'One or both users not found'}), 404
             
-        user_id = user_result['user_id']
-        contact_user_id = contact_result['user_id']
+        user_id = user_ids[user_email]
+        contact_user_id = user_ids[contact_email]
         
         # Check if the contact already exists
         cursor.execute("""
@@ -1362,21 +1791,18 @@ def remove_contact():
     if not user_email or not contact_email:
         return jsonify({'status': 'error', 'message': 'Both user and contact emails are required'}), 400
         
+    connection = get_db_connection()
     try:
         cursor = connection.cursor(dictionary=True)
         
         # Get user IDs from emails
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (user_email,))
-        user_result = cursor.fetchone()
-        
-        cursor.execute("SELECT user_id FROM users WHERE email = %s", (contact_email,))
-        contact_result = cursor.fetchone()
+        user_ids = identity.resolve_many(connection, [user_email, contact_email])
         
-        if not user_result or not contact_result:
+        if user_email not in user_ids or contact_email not in user_ids:
             return jsonify({'status': 'error', 'message': 'One or both users not found'}), 404
             
-        user_id = user_result['user_id']
-        contact_user_id = contact_result['user_id']
+        user_id = user_ids[user_email]
+        contact_user_id = user_ids[contact_email]
         
         # Remove contact in both directions
         cursor.execute("""
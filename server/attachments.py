@@ -0,0 +1,287 @@
+"""Chat attachments: resumable chunked uploads into content-addressed files.
+
+Attachment bytes never travel through Socket.IO events or database rows.
+A client first creates an upload, then sends the file in chunks:
+
+    POST  /api/attachments/uploads          {file_name, file_type, size, sha256?}
+    PATCH /api/attachments/uploads/<id>     raw bytes, header Upload-Offset
+    HEAD  /api/attachments/uploads/<id>     Upload-Offset header: where to resume
+
+Each chunk is streamed straight to ``ATTACHMENT_DIR/.partial/<id>.part``.
+When the last byte arrives the file is hashed and moved to
+``ATTACHMENT_DIR/<hh>/<sha256>``; a file with the same content is stored
+only once, and a client that announces the ``sha256`` of a file the server
+already has skips the upload entirely. ``send_message`` then carries only
+the attachment id (the hash), which ``ChatMessageImages`` stores as a
+reference. ``/api/attachments/<sha256>`` serves the file with Range support,
+sent with ``sendfile`` where the server supports it.
+
+Run ``python attachments.py`` periodically to delete abandoned uploads.
+"""
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from flask import url_for
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+ATTACHMENT_DIR = os.getenv("ATTACHMENT_DIR", os.path.join("static", "uploads"))
+ATTACHMENT_MAX_SIZE = int(os.getenv("ATTACHMENT_MAX_SIZE", 25 * 1024 * 1024))
+ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", 1024 * 1024))
+ATTACHMENT_UPLOAD_TTL = int(os.getenv("ATTACHMENT_UPLOAD_TTL", 24 * 3600))
+ATTACHMENT_MAX_AGE = int(os.getenv("ATTACHMENT_MAX_AGE", 365 * 24 * 3600))
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+
+COPY_BUFFER_SIZE = 64 * 1024
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+UPLOAD_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+SELECT_COLUMNS = "cmi.attachment_hash AS attachment_id, cmi.file_name, cmi.file_type"
+
+
+class UploadError(Exception):
+    """An upload request that cannot be applied; ``status`` is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+def allowed_file(file_name: str) -> bool:
+    return '.' in file_name and file_name.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def attachment_path(attachment_id: str) -> str:
+    return os.path.join(ATTACHMENT_DIR, attachment_id[:2], attachment_id)
+
+
+def exists(attachment_id: Optional[str]) -> bool:
+    return bool(attachment_id and HASH_RE.match(attachment_id) and os.path.exists(attachment_path(attachment_id)))
+
+
+def attachment_url(attachment_id: str) -> str:
+    """Absolute download URL (needs a request or app context)"""
+    return url_for('get_attachment', attachment_id=attachment_id, _external=True)
+
+
+def image_reference(attachment_id: str, file_name: str, file_type: str) -> Dict[str, Any]:
+    """The ``image`` field of a message as sent to clients"""
+    return {
+        'attachment_id': attachment_id,
+        'file_name': file_name,
+        'file_type': file_type,
+        'url': attachment_url(attachment_id),
+    }
+
+
+def pop_image(message):
+    """Move the joined attachment columns of a fetched row into its ``image`` field."""
+    attachment_id = message.pop('attachment_id', None)
+    file_name = message.pop('file_name', None)
+    file_type = message.pop('file_type', None)
+    message['image'] = image_reference(attachment_id, file_name, file_type) if attachment_id else None
+    return message
+
+
+def _partial_dir() -> str:
+    return os.path.join(ATTACHMENT_DIR, ".partial")
+
+
+def _meta_path(upload_id: str) -> str:
+    return os.path.join(_partial_dir(), f"{upload_id}.json")
+
+
+def _part_path(upload_id: str) -> str:
+    return os.path.join(_partial_dir(), f"{upload_id}.part")
+
+
+def _write_meta(upload_id: str, meta: Dict[str, Any]):
+    fd, tmp_path = tempfile.mkstemp(dir=_partial_dir())
+    with os.fdopen(fd, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(upload_id))
+
+
+def _read_meta(upload_id: str) -> Dict[str, Any]:
+    if not UPLOAD_ID_RE.match(upload_id):
+        raise UploadError("Invalid upload id")
+    try:
+        with open(_meta_path(upload_id)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        raise UploadError("Upload not found", status=404)
+
+
+def _status(upload_id: str, meta: Dict[str, Any], offset: int) -> Dict[str, Any]:
+    return {
+        'upload_id': upload_id,
+        'offset': offset,
+        'size': meta['size'],
+        'chunk_size': ATTACHMENT_CHUNK_SIZE,
+        'complete': meta.get('attachment_id') is not None,
+        'attachment_id': meta.get('attachment_id'),
+    }
+
+
+def create_upload(file_name: str, file_type: str, size: int, sha256: Optional[str] = None) -> Dict[str, Any]:
+    """Start an upload; completes immediately if the announced content is already stored"""
+    if not file_name or not allowed_file(file_name):
+        raise UploadError(f"File type not allowed (allowed: {', '.join(sorted(ALLOWED_EXTENSIONS))})")
+    if not isinstance(size, int) or size <= 0:
+        raise UploadError("A positive file size is required")
+    if size > ATTACHMENT_MAX_SIZE:
+        raise UploadError(f"Attachments are limited to {ATTACHMENT_MAX_SIZE} bytes", status=413)
+    if sha256 is not None:
+        sha256 = sha256.lower()
+        if not HASH_RE.match(sha256):
+            raise UploadError("sha256 must be 64 hex characters")
+
+    upload_id = uuid.uuid4().hex
+    meta = {
+        'file_name': file_name,
+        'file_type': file_type,
+        'size': size,
+        'sha256': sha256,
+        'created_at': time.time(),
+        'attachment_id': None,
+    }
+    os.makedirs(_partial_dir(), exist_ok=True)
+
+    if sha256 and exists(sha256):
+        meta['attachment_id'] = sha256
+        _write_meta(upload_id, meta)
+        return _status(upload_id, meta, size)
+
+    open(_part_path(upload_id), "wb").close()
+    _write_meta(upload_id, meta)
+    return _status(upload_id, meta, 0)
+
+
+def upload_status(upload_id: str) -> Dict[str, Any]:
+    meta = _read_meta(upload_id)
+    if meta['attachment_id']:
+        return _status(upload_id, meta, meta['size'])
+    try:
+        offset = os.path.getsize(_part_path(upload_id))
+    except FileNotFoundError:
+        raise UploadError("Upload not found", status=404)
+    return _status(upload_id, meta, offset)
+
+
+def append_chunk(upload_id: str, offset: int, stream, length: int) -> Dict[str, Any]:
+    """Append ``length`` bytes read from ``stream`` at ``offset``.
+
+    ``offset`` must equal the bytes received so far; otherwise nothing is
+    written and the error carries the offset to resume from. A chunk that
+    breaks off midway keeps what arrived, so the client resumes after it.
+    """
+    meta = _read_meta(upload_id)
+    if meta['attachment_id']:
+        return _status(upload_id, meta, meta['size'])
+    if length > ATTACHMENT_CHUNK_SIZE:
+        raise UploadError(f"Chunks are limited to {ATTACHMENT_CHUNK_SIZE} bytes", status=413)
+
+    try:
+        f = open(_part_path(upload_id), "r+b")
+    except FileNotFoundError:
+        # Finished by a concurrent request since the metadata was read
+        return upload_status(upload_id)
+
+    with f:
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError("Another chunk of this upload is being written", status=409)
+
+        current = f.seek(0, os.SEEK_END)
+        if offset != current:
+            raise UploadError("Offset does not match the bytes received", status=409, offset=current)
+        if current + length > meta['size']:
+            raise UploadError("Chunk goes past the announced file size", status=413, offset=current)
+
+        remaining = length
+        while remaining > 0:
+            data = stream.read(min(COPY_BUFFER_SIZE, remaining))
+            if not data:
+                break
+            f.write(data)
+            remaining -= len(data)
+        f.flush()
+        received = f.tell()
+
+        if received < meta['size']:
+            return _status(upload_id, meta, received)
+        # Still holding the lock, so only one request finishes the upload
+        return _finish(upload_id, meta)
+
+
+def _finish(upload_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+    """Hash the completed file and move it to its content address (once per content)"""
+    part = _part_path(upload_id)
+    digest = hashlib.sha256()
+    with open(part, "rb") as f:
+        for block in iter(lambda: f.read(COPY_BUFFER_SIZE), b""):
+            digest.update(block)
+    attachment_id = digest.hexdigest()
+
+    if meta['sha256'] and meta['sha256'] != attachment_id:
+        os.remove(part)
+        os.remove(_meta_path(upload_id))
+        raise UploadError("Uploaded content does not match the announced sha256", status=422)
+
+    path = attachment_path(attachment_id)
+    if os.path.exists(path):
+        os.remove(part)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(part, path)
+
+    # Kept until purged so a client that missed the final response can ask again
+    meta['attachment_id'] = attachment_id
+    _write_meta(upload_id, meta)
+    return _status(upload_id, meta, meta['size'])
+
+
+def purge_stale_uploads(max_age=ATTACHMENT_UPLOAD_TTL) -> int:
+    """Delete uploads (finished or not) untouched for more than ``max_age`` seconds"""
+    directory = _partial_dir()
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+
+    # Group the metadata, partial data and leftover temp files of each upload
+    files = {}
+    for name in os.listdir(directory):
+        files.setdefault(name.split(".", 1)[0], []).append(os.path.join(directory, name))
+
+    purged = 0
+    for paths in files.values():
+        try:
+            if max(os.path.getmtime(path) for path in paths) >= cutoff:
+                continue
+            for path in paths:
+                os.remove(path)
+            purged += 1
+        except FileNotFoundError:
+            pass
+    return purged
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Delete abandoned attachment uploads")
+    parser.add_argument('--max-age', type=int, default=ATTACHMENT_UPLOAD_TTL, help="Seconds since the upload started")
+    args = parser.parse_args()
+
+    count = purge_stale_uploads(args.max_age)
+    logger.info(f"Purged {count} stale uploads")
@@ -0,0 +1,118 @@
+"""Pub/sub backplane for Socket.IO across worker processes.
+
+Without a message queue, ``emit(..., room=chat_id)`` only reaches clients
+connected to the emitting process. These client managers plug into
+python-socketio's ``PubSubManager``: every emit is delivered locally and
+published, and every other worker delivers it to its own clients.
+
+    SOCKETIO_MESSAGE_QUEUE unset        single process (python-socketio default)
+    SOCKETIO_MESSAGE_QUEUE=local        in-process bus, for several servers in one process
+    SOCKETIO_MESSAGE_QUEUE=redis://...  any Redis-protocol server (see resp_server.py)
+"""
+import logging
+import os
+import queue
+import threading
+import time
+
+from socketio import PubSubManager
+
+from resp_client import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+SOCKETIO_MESSAGE_QUEUE = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+SOCKETIO_CHANNEL = os.getenv("SOCKETIO_CHANNEL", "chatapp-socketio")
+
+
+class LocalBus:
+    """In-process pub/sub: each subscriber reads from its own queue."""
+
+    def __init__(self):
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> queue.Queue:
+        subscriber = queue.Queue()
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscriber)
+        return subscriber
+
+    def unsubscribe(self, channel: str, subscriber: queue.Queue):
+        with self._lock:
+            subscribers = self._subscribers.get(channel, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+
+    def publish(self, channel: str, message) -> int:
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.put(message)
+        return len(subscribers)
+
+
+local_bus = LocalBus()
+
+
+class LocalPubSubManager(PubSubManager):
+    name = "local"
+
+    def __init__(self, bus: LocalBus = None, channel=SOCKETIO_CHANNEL, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.bus = bus or local_bus
+        self._subscription = None if write_only else self.bus.subscribe(channel)
+
+    def _publish(self, data):
+        # Serialized like the network backends, so receivers never share dicts
+        self.bus.publish(self.channel, self.json.dumps(data))
+
+    def _listen(self):
+        while True:
+            yield self._subscription.get()
+
+
+class RespPubSubManager(PubSubManager):
+    """Backplane on a Redis-protocol server using PUBLISH / SUBSCRIBE."""
+    name = "resp"
+
+    def __init__(self, url, channel=SOCKETIO_CHANNEL, write_only=False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self.url = url
+        self.client = RespClient(url)
+
+    def _publish(self, data):
+        try:
+            self.client.execute("PUBLISH", self.channel, self.json.dumps(data))
+        except (RespError, OSError) as e:
+            logger.error(f"Socket.IO backplane publish failed: {e}")
+
+    def _listen(self):
+        retry_delay = 1
+        connection = None
+        while True:
+            try:
+                connection = self.client.connect(timeout=None)
+                connection.execute("SUBSCRIBE", self.channel)
+                retry_delay = 1
+                while True:
+                    reply = connection.read_reply()
+                    if isinstance(reply, list) and reply and reply[0] == b"message":
+                        yield reply[2]
+            except (RespError, OSError) as e:
+                if connection is not None:
+                    connection.close()
+                logger.error(f"Socket.IO backplane subscription lost, reconnecting in {retry_delay}s: {e}")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+
+def create_client_manager(url=SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL, write_only=False):
+    """Client manager for ``url``, or ``None`` for python-socketio's single-process default."""
+    if not url:
+        return None
+    if url == "local":
+        return LocalPubSubManager(channel=channel, write_only=write_only)
+    if url.startswith("redis://"):
+        return RespPubSubManager(url, channel=channel, write_only=write_only)
+    raise ValueError(f"Unsupported SOCKETIO_MESSAGE_QUEUE: {url}")
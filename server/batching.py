@@ -0,0 +1,148 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the batch-size histogram buckets reported by stats()
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+
+
+def run_blocking(fn: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound work (model inference) without stalling the eventlet hub.
+
+    Under an eventlet-patched server the call is executed on eventlet's
+    native thread pool; everywhere else it simply runs inline.
+    """
+    try:
+        from eventlet import patcher, tpool
+    except ImportError:
+        return fn(*args, **kwargs)
+    if patcher.is_monkey_patched('thread'):
+        return tpool.execute(fn, *args, **kwargs)
+    return fn(*args, **kwargs)
+
+
+class MicroBatcher:
+    """Collect concurrent single-item requests and run them as one batch.
+
+    Callers ``submit`` an item and get a ``concurrent.futures.Future`` back.
+    A background worker drains the queue, waiting at most ``max_wait_ms``
+    after the oldest queued item before running ``process_batch`` on up to
+    ``max_batch_size`` items. ``process_batch`` takes a list of items and
+    must return a list of results in the same order.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]],
+                 max_batch_size: int = 32, max_wait_ms: float = 10, name: str = "batcher"):
+        self.process_batch = process_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Metrics
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._max_batch = 0
+        self._histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self._histogram['more'] = 0
+        self._queue_latency_total = 0.0
+        self._queue_latency_max = 0.0
+        self._inference_total = 0.0
+
+    def _ensure_worker(self):
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._worker.start()
+
+    def submit(self, item: Any) -> Future:
+        """Queue one item; the returned future resolves to its result."""
+        future = Future()
+        self._queue.put((item, future, time.monotonic()))
+        self._ensure_worker()
+        return future
+
+    def submit_many(self, items: List[Any]) -> List[Future]:
+        """Queue several items at once (bulk callers such as backfills)."""
+        return [self.submit(item) for item in items]
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            batch = [first]
+            deadline = first[2] + self.max_wait
+
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                try:
+                    batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.monotonic()
+        items = [item for item, _, _ in batch]
+
+        try:
+            results = self.process_batch(items)
+            if len(results) != len(items):
+                raise RuntimeError(f"{self.name}: expected {len(items)} results, got {len(results)}")
+        except Exception as e:
+            logger.error(f"{self.name}: batch of {len(items)} failed: {e}")
+            with self._lock:
+                self._errors += 1
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._record(batch, started)
+
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def _record(self, batch, started):
+        finished = time.monotonic()
+        size = len(batch)
+        bucket = next((b for b in BATCH_SIZE_BUCKETS if size <= b), 'more')
+        latencies = [started - enqueued for _, _, enqueued in batch]
+
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._max_batch = max(self._max_batch, size)
+            self._histogram[bucket] += 1
+            self._queue_latency_total += sum(latencies)
+            self._queue_latency_max = max(self._queue_latency_max, max(latencies))
+            self._inference_total += finished - started
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch-size and queue-latency metrics."""
+        with self._lock:
+            batches, items = self._batches, self._items
+            return {
+                'max_batch_size': self.max_batch_size,
+                'max_wait_ms': self.max_wait * 1000,
+                'pending': self._queue.qsize(),
+                'batches': batches,
+                'items': items,
+                'errors': self._errors,
+                'avg_batch_size': round(items / batches, 2) if batches else 0.0,
+                'largest_batch': self._max_batch,
+                'batch_size_histogram': {str(k): v for k, v in self._histogram.items()},
+                'queue_latency_avg_ms': round(self._queue_latency_total / items * 1000, 3) if items else 0.0,
+                'queue_latency_max_ms': round(self._queue_latency_max * 1000, 3),
+                'inference_avg_ms': round(self._inference_total / batches * 1000, 3) if batches else 0.0,
+            }
@@ -0,0 +1,115 @@
+"""Benchmark Socket.IO fan-out through the backplane as the worker count grows.
+
+Each simulated worker is a python-socketio server with its own client
+manager and ``--clients`` fake connections joined to one chat room. Worker
+0 emits ``--messages`` events to the room; the run ends when every client
+on every worker has received every event. Sending is replaced by a counter,
+so the numbers cover the backplane, room lookup and packet encoding, not
+the network to browsers.
+
+    python bench_fanout.py                                 # local bus + built-in RESP stand-in
+    python bench_fanout.py --redis-url redis://127.0.0.1:6379 --workers 1 2 4 8
+    python bench_fanout.py --json fanout.json              # also write machine-readable results
+"""
+import argparse
+import json
+import threading
+import time
+
+import socketio
+
+import resp_server
+from backplane import LocalBus, LocalPubSubManager, RespPubSubManager
+
+ROOM = "bench-chat"
+
+
+class CountingServer:
+    """One simulated worker: a Socket.IO server whose sends are only counted."""
+
+    def __init__(self, manager, clients):
+        self.server = socketio.Server(client_manager=manager, async_mode="threading")
+        self.delivered = 0
+        self._lock = threading.Lock()
+        self.server.eio.send = self._count
+        self.server.eio.send_packet = self._count
+
+        self.server.manager_initialized = True
+        manager.initialize()
+        for n in range(clients):
+            sid = manager.connect(f"eio-{id(self)}-{n}", "/")
+            manager.enter_room(sid, "/", ROOM)
+
+    def _count(self, eio_sid, packet):
+        with self._lock:
+            self.delivered += 1
+
+
+def run(make_manager, workers, clients, messages, timeout=60.0):
+    servers = [CountingServer(make_manager(), clients) for _ in range(workers)]
+    time.sleep(0.2)  # let subscribers attach
+    expected = workers * clients * messages
+    payload = {"message": "x" * 100, "chat_id": ROOM}
+
+    started = time.perf_counter()
+    for n in range(messages):
+        servers[0].server.emit("new_message", dict(payload, seq=n), room=ROOM)
+    published = time.perf_counter() - started
+
+    deadline = time.monotonic() + timeout
+    while sum(server.delivered for server in servers) < expected and time.monotonic() < deadline:
+        time.sleep(0.001)
+    elapsed = time.perf_counter() - started
+    delivered = sum(server.delivered for server in servers)
+
+    return {
+        "workers": workers,
+        "clients_per_worker": clients,
+        "messages": messages,
+        "delivered": delivered,
+        "expected": expected,
+        "publish_seconds": round(published, 4),
+        "elapsed_seconds": round(elapsed, 4),
+        "messages_per_second": round(messages / elapsed, 1),
+        "deliveries_per_second": round(delivered / elapsed, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Socket.IO backplane fan-out benchmark")
+    parser.add_argument("--backends", nargs="+", default=["local", "resp"], choices=["local", "resp"])
+    parser.add_argument("--redis-url", help="Redis-protocol server (default: start the in-process stand-in)")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4, 8])
+    parser.add_argument("--clients", type=int, default=50, help="Clients in the room on each worker")
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    redis_url = args.redis_url
+    if "resp" in args.backends and not redis_url:
+        stand_in = resp_server.start_background()
+        redis_url = f"redis://127.0.0.1:{stand_in.server_address[1]}"
+
+    results = []
+    for backend in args.backends:
+        for workers in args.workers:
+            channel = f"bench-{backend}-{workers}-{time.monotonic_ns()}"
+            if backend == "local":
+                bus = LocalBus()
+                make_manager = lambda: LocalPubSubManager(bus=bus, channel=channel)
+            else:
+                make_manager = lambda: RespPubSubManager(redis_url, channel=channel)
+
+            result = dict(run(make_manager, workers, args.clients, args.messages), backend=backend)
+            results.append(result)
+            print(f"{backend:>5}  workers={workers:<3} msgs/s={result['messages_per_second']:>10}  "
+                  f"deliveries/s={result['deliveries_per_second']:>12}  "
+                  f"delivered={result['delivered']}/{result['expected']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "socketio_fanout", "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Benchmark language identification accuracy and throughput.
+
+Labelled chat messages (none of them in the training corpus) are run
+through each detector:
+
+    keyword       the previous rule: substring checks against short word lists
+    ngram         langid.detect, one message at a time
+    ngram_batch   langid.detect_batch on pages of ``--page-size`` messages
+    xlmr          papluca/xlm-roberta-base-language-detection on the Inference
+                  API (only with ``--remote``; one network call per message)
+
+Throughput is measured over ``--repeat`` passes of the evaluation set.
+
+    python bench_langid.py
+    python bench_langid.py --remote --json langid.json   # also write machine-readable results
+"""
+import argparse
+import json
+import time
+
+import langid
+
+SAMPLES = {
+    "en": [
+        "ok sounds good",
+        "I'll call you back in five minutes",
+        "can we move the meeting to next week?",
+        "the build is failing again after the last merge",
+        "did you get my email about the invoice",
+        "love this photo, where was it taken?",
+        "no idea, ask Sarah she knows the details",
+        "good night, talk tomorrow",
+        "my phone battery is almost dead",
+        "the package arrived this morning, thanks!",
+        "are you coming to the office on Wednesday",
+        "I really enjoyed the concert, the band was fantastic",
+    ],
+    "es": [
+        "vale, me parece bien",
+        "te llamo en cinco minutos",
+        "¿podemos cambiar la reunión a la semana que viene?",
+        "la compilación vuelve a fallar después del último cambio",
+        "¿recibiste mi correo sobre la factura?",
+        "me encanta esta foto, ¿dónde la sacaste?",
+        "ni idea, pregúntale a Sara que sabe los detalles",
+        "buenas noches, hablamos mañana",
+        "a mi móvil casi no le queda batería",
+        "el paquete llegó esta mañana, ¡gracias!",
+        "¿vienes a la oficina el miércoles?",
+        "me gustó mucho el concierto, el grupo estuvo genial",
+    ],
+    "fr": [
+        "ok ça marche",
+        "je te rappelle dans cinq minutes",
+        "on peut décaler la réunion à la semaine prochaine ?",
+        "la compilation échoue encore depuis la dernière fusion",
+        "tu as reçu mon mail au sujet de la facture ?",
+        "j'adore cette photo, elle a été prise où ?",
+        "aucune idée, demande à Sarah elle connaît les détails",
+        "bonne nuit, on se parle demain",
+        "mon téléphone n'a presque plus de batterie",
+        "le colis est arrivé ce matin, merci !",
+        "tu viens au bureau mercredi ?",
+        "j'ai vraiment aimé le concert, le groupe était génial",
+    ],
+    "de": [
+        "ok klingt gut",
+        "ich rufe dich in fünf Minuten zurück",
+        "können wir das Treffen auf nächste Woche verschieben?",
+        "der Build schlägt nach dem letzten Merge wieder fehl",
+        "hast du meine Mail wegen der Rechnung bekommen",
+        "ich liebe dieses Foto, wo wurde es aufgenommen?",
+        "keine Ahnung, frag Sarah, sie kennt die Details",
+        "gute Nacht, wir sprechen morgen",
+        "mein Handy hat fast keinen Akku mehr",
+        "das Paket ist heute Morgen angekommen, danke!",
+        "kommst du am Mittwoch ins Büro",
+        "das Konzert hat mir sehr gefallen, die Band war fantastisch",
+    ],
+    "it": [
+        "ok mi sembra perfetto",
+        "ti richiamo tra cinque minuti",
+        "possiamo spostare la riunione alla prossima settimana?",
+        "la compilazione fallisce di nuovo dopo l'ultima modifica",
+        "hai ricevuto la mia mail sulla fattura?",
+        "adoro questa foto, dove l'hai scattata?",
+        "non ne ho idea, chiedi a Sara che conosce i dettagli",
+        "buonanotte, ci sentiamo domani",
+        "il mio telefono è quasi scarico",
+        "il pacco è arrivato stamattina, grazie!",
+        "vieni in ufficio mercoledì?",
+        "il concerto mi è piaciuto tantissimo, il gruppo era fantastico",
+    ],
+    "pt": [
+        "ok, combinado",
+        "te ligo de volta em cinco minutos",
+        "podemos mudar a reunião para a semana que vem?",
+        "a compilação está falhando de novo depois da última alteração",
+        "você recebeu o meu e-mail sobre a fatura?",
+        "adorei esta foto, onde ela foi tirada?",
+        "não faço ideia, pergunta para a Sara que ela sabe os detalhes",
+        "boa noite, a gente se fala amanhã",
+        "o meu celular está quase sem bateria",
+        "a encomenda chegou hoje de manhã, obrigado!",
+        "você vem ao escritório na quarta-feira?",
+        "gostei muito do show, a banda estava fantástica",
+    ],
+}
+
+
+def keyword_detect(text):
+    """The previous detector, kept here for comparison"""
+    spanish_words = ['hola', 'como', 'que', 'es', 'el', 'la', 'de', 'y']
+    french_words = ['bonjour', 'comment', 'que', 'est', 'le', 'la', 'de', 'et']
+    german_words = ['hallo', 'wie', 'was', 'ist', 'der', 'die', 'das', 'und']
+
+    text_lower = text.lower()
+
+    spanish_count = sum(1 for word in spanish_words if word in text_lower)
+    french_count = sum(1 for word in french_words if word in text_lower)
+    german_count = sum(1 for word in german_words if word in text_lower)
+
+    if spanish_count > 1:
+        return 'es'
+    elif french_count > 1:
+        return 'fr'
+    elif german_count > 1:
+        return 'de'
+    else:
+        return 'en'
+
+
+def xlmr_detect(text):
+    import hf_api
+    result = hf_api.call_huggingface_api("papluca/xlm-roberta-base-language-detection", {"inputs": text})
+    if result and isinstance(result[0], list):
+        result = result[0]
+    return result[0]["label"] if result else None
+
+
+def evaluate(name, predict_all, texts, labels, repeat):
+    predictions = predict_all(texts)
+    started = time.perf_counter()
+    for _ in range(repeat - 1):
+        predict_all(texts)
+    elapsed = (time.perf_counter() - started) if repeat > 1 else None
+
+    per_language = {}
+    for label, predicted in zip(labels, predictions):
+        correct, total = per_language.get(label, (0, 0))
+        per_language[label] = (correct + (predicted == label), total + 1)
+    accuracy = sum(correct for correct, _ in per_language.values()) / len(labels)
+
+    result = {
+        'detector': name,
+        'accuracy': round(accuracy, 3),
+        'per_language': {label: round(correct / total, 3) for label, (correct, total) in per_language.items()},
+        'messages_per_second': round(len(texts) * (repeat - 1) / elapsed) if elapsed else None,
+    }
+    breakdown = " ".join(f"{label}={score:.2f}" for label, score in result['per_language'].items())
+    print(f"{name:>12}  accuracy={result['accuracy']:<6} {result['messages_per_second'] or '-':>9} msgs/s  {breakdown}")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Language identification benchmark")
+    parser.add_argument("--repeat", type=int, default=200, help="Passes over the evaluation set for throughput")
+    parser.add_argument("--page-size", type=int, default=50, help="Messages per detect_batch call")
+    parser.add_argument("--remote", action="store_true", help="Also evaluate XLM-R on the Inference API")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    labels = [label for label, texts in SAMPLES.items() for _ in texts]
+    texts = [text for samples in SAMPLES.values() for text in samples]
+    langid.get_identifier()  # load the table outside the timings
+
+    def paged(batch):
+        results = []
+        for start in range(0, len(batch), args.page_size):
+            results.extend(language for language, _ in langid.detect_batch(batch[start:start + args.page_size]))
+        return results
+
+    results = [
+        evaluate("keyword", lambda batch: [keyword_detect(text) for text in batch], texts, labels, args.repeat),
+        evaluate("ngram", lambda batch: [langid.detect(text)[0] for text in batch], texts, labels, args.repeat),
+        evaluate("ngram_batch", paged, texts, labels, args.repeat),
+    ]
+    if args.remote:
+        results.append(evaluate("xlmr", lambda batch: [xlmr_detect(text) for text in batch], texts, labels, 1))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "langid", "messages": len(texts), "page_size": args.page_size,
+                       "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
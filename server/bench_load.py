@@ -0,0 +1,511 @@
+"""End-to-end load test of the Socket.IO and REST surface.
+
+Starts ``app.py`` in a subprocess, against a throwaway database and the
+stub model server (stub_models.py), and drives ``--clients`` simulated
+users through it. Every user has a Socket.IO connection and an HTTP
+session. Users are paired into chats. At most ``--concurrency`` users
+are active at once, each running its operations one after another. The
+scenarios run in order, each one starting from the state the previous
+ones left:
+
+    register              POST /register, connect, emit register_user
+    create_chat_session   one user of each pair opens the chat (chat_session_created)
+    join_room             every user joins their chat (room_joined)
+    send_message          ``--messages`` per user; until the sender gets its own new_message
+    fetch_messages        newest page of the chat (messages_fetched)
+    get_smart_replies     (smart_replies_generated)
+    search_messages       (messages_found)
+    login                 POST /login
+    add_contact           POST /api/contacts, one user of each pair
+    api_contacts          GET /api/contacts/<email>
+    api_last_messages     GET /api/last-messages/<email>
+    api_search            GET /api/search/<email>?q=
+    api_users             GET /api/users
+    user_profile          GET /user/profile?email=
+    api_metrics           GET /api/metrics
+
+The read scenarios repeat ``--requests`` times per user. Each scenario
+reports its throughput, its p50/p95/p99 latency and the server's resident
+memory (before, peak and after, read from /proc).
+
+The database is created on the MySQL server of ``.env`` (HOST_NAME,
+USER_NAME, PASSWORD; the user needs CREATE/DROP DATABASE). It gets the
+base tables and every migration of schema.py, and is dropped afterwards.
+Any local server will do as the stand-in, for instance
+``docker run --rm -p 3306:3306 -e MYSQL_ROOT_PASSWORD=load mysql:8``.
+Other server settings (DB_POOL_SIZE, MESSAGE_WRITE_BATCH_SIZE, ...) are
+passed through from the environment.
+
+Store a run as the baseline, and check later versions against it. The
+run exits with status 1 when a scenario's latency, throughput, errors or
+peak memory are worse than the baseline by more than ``--tolerance``:
+
+    python bench_load.py --clients 1000 --save-baseline baselines/load.json
+    python bench_load.py --clients 1000 --baseline baselines/load.json --json load.json
+"""
+import eventlet
+
+eventlet.monkey_patch()
+
+import argparse
+import importlib.util
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import mysql.connector
+import requests
+import socketio
+
+import db
+import schema
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Tables the application expects to exist already; schema.py adds everything newer
+BASE_TABLES = [
+    """
+    CREATE TABLE users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        username VARCHAR(255) NOT NULL,
+        password_hash VARCHAR(255) NOT NULL,
+        email VARCHAR(255) NOT NULL UNIQUE,
+        profile_image LONGBLOB NULL
+    )
+    """,
+    """
+    CREATE TABLE chatsession (
+        chat_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        user1_id INT NOT NULL,
+        user2_id INT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE chatmessage (
+        message_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        chat_id VARCHAR(36) NOT NULL,
+        sender_id INT NOT NULL,
+        receiver_id INT NOT NULL,
+        message TEXT,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE ChatMessageImages (
+        image_id INT AUTO_INCREMENT PRIMARY KEY,
+        message_id VARCHAR(36) NOT NULL,
+        chat_id VARCHAR(36) NOT NULL,
+        sender_id INT NOT NULL,
+        file_name VARCHAR(255),
+        file_type VARCHAR(100),
+        file_url VARCHAR(512)
+    )
+    """,
+    """
+    CREATE TABLE contact (
+        contact_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        user_id INT NOT NULL,
+        contact_user_id INT NOT NULL,
+        INDEX idx_contact_user (user_id)
+    )
+    """,
+]
+
+WORDS = ("meeting report deploy invoice lunch weekend photo project review budget release server "
+         "client office train ticket dinner birthday design draft contract holiday schedule update").split()
+PASSWORD = "load-test-password"
+# Latency increases smaller than this never count as a regression
+MIN_LATENCY_DELTA_MS = 1.0
+
+# The Socket.IO client only speaks websocket when websocket-client is installed
+TRANSPORTS = ["websocket"] if importlib.util.find_spec("websocket") else ["polling"]
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def create_database(name):
+    conn = mysql.connector.connect(host=db.HOST_NAME, user=db.USER_NAME, password=db.PASSWORD)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"CREATE DATABASE `{name}`")
+        cursor.execute(f"USE `{name}`")
+        for ddl in BASE_TABLES:
+            cursor.execute(ddl)
+        cursor.close()
+        schema.apply_migrations(conn)
+    finally:
+        conn.close()
+
+
+def drop_database(name):
+    conn = mysql.connector.connect(host=db.HOST_NAME, user=db.USER_NAME, password=db.PASSWORD)
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"DROP DATABASE IF EXISTS `{name}`")
+        cursor.close()
+    finally:
+        conn.close()
+
+
+def start_process(args, log_path, env=None):
+    log = open(log_path, "w")
+    return subprocess.Popen([sys.executable, *args], cwd=HERE, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+
+def wait_until_up(process, url, log_path, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with status {process.returncode}; see {log_path}")
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up within {timeout}s; see {log_path}")
+
+
+def stop_process(process):
+    if process and process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+class MemorySampler:
+    """Resident memory of a process, sampled in the background (Linux /proc)."""
+
+    def __init__(self, pid, interval=0.1):
+        self.path = f"/proc/{pid}/status"
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def rss_mb(self):
+        try:
+            with open(self.path) as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return round(int(line.split()[1]) / 1024, 1)
+        except OSError:
+            pass
+        return None
+
+    def reset(self):
+        self.peak = self.rss_mb()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            rss = self.rss_mb()
+            if rss is not None and (self.peak is None or rss > self.peak):
+                self.peak = rss
+
+    def stop(self):
+        self._stop.set()
+
+
+class SimulatedUser:
+    """One user: a Socket.IO connection and an HTTP session.
+
+    ``request`` emits an event and waits for the reply event the server
+    answers with. A user has at most one request in flight, so an
+    ``error`` event fails the request that is waiting.
+    """
+
+    REPLIES = ("chat_session_created", "room_joined", "new_message", "messages_fetched",
+               "smart_replies_generated", "messages_found")
+
+    def __init__(self, base_url, email):
+        self.base_url = base_url
+        self.email = email
+        self.partner = None
+        self.chat_id = None
+        self.http = requests.Session()
+        self.sio = socketio.Client(reconnection=False)
+        self._waiting = None   # (event, predicate, done, box)
+        for event in self.REPLIES:
+            self.sio.on(event, handler=lambda data=None, event=event: self._receive(event, data))
+        self.sio.on("error", handler=lambda data=None: self._receive("error", data))
+
+    def _receive(self, event, data):
+        waiting = self._waiting
+        if waiting is None:
+            return
+        expected, predicate, done, box = waiting
+        if event == "error":
+            box["error"] = (data or {}).get("message", "error event")
+        elif event != expected or (predicate and not predicate(data)):
+            return
+        box["data"] = data
+        self._waiting = None
+        done.set()
+
+    def connect(self, timeout):
+        self.sio.connect(self.base_url, transports=TRANSPORTS, wait_timeout=timeout)
+
+    def request(self, event, payload, reply, timeout, predicate=None):
+        done, box = threading.Event(), {}
+        self._waiting = (reply, predicate, done, box)
+        self.sio.emit(event, payload)
+        if not done.wait(timeout):
+            self._waiting = None
+            raise TimeoutError(f"no {reply} within {timeout}s")
+        if "error" in box:
+            raise RuntimeError(box["error"])
+        return box["data"]
+
+    def get(self, path, timeout, **params):
+        response = self.http.get(self.base_url + path, params=params, timeout=timeout)
+        response.raise_for_status()
+        return response
+
+    def post(self, path, timeout, **kwargs):
+        response = self.http.post(self.base_url + path, timeout=timeout, **kwargs)
+        response.raise_for_status()
+        return response
+
+    def close(self):
+        try:
+            self.sio.disconnect()
+        except Exception:
+            pass
+        self.http.close()
+
+
+def register(user, args, n):
+    user.post("/register", args.timeout, data={"username": f"load-{n}", "email": user.email, "password": PASSWORD})
+    user.connect(args.timeout)
+    user.sio.emit("register_user", {"email": user.email})
+
+
+def create_chat_session(user, args, n):
+    data = user.request("create_chat_session", {"user1": user.email, "user2": user.partner.email},
+                        "chat_session_created", args.timeout)
+    user.chat_id = user.partner.chat_id = data["chat_id"]
+
+
+def send_message(user, args, n):
+    text = f"{' '.join(random.sample(WORDS, 4))} {uuid.uuid4().hex[:8]}"
+    user.request("send_message", {
+        "chat_id": user.chat_id,
+        "sender_email": user.email,
+        "receiver_email": user.partner.email,
+        "message": text,
+    }, "new_message", args.timeout,
+        predicate=lambda data: data.get("message") == text and data.get("sender_email") == user.email)
+
+
+# (name, operation(user, args, n), which users run it, repetitions per user or None for --requests)
+SCENARIOS = [
+    ("register", register, "all", 1),
+    ("create_chat_session", create_chat_session, "first_of_pair", 1),
+    ("join_room", lambda user, args, n: user.request(
+        "join_room", {"chat_id": user.chat_id}, "room_joined", args.timeout), "all", 1),
+    ("send_message", send_message, "all", "messages"),
+    ("fetch_messages", lambda user, args, n: user.request(
+        "fetch_messages", {"chat_id": user.chat_id}, "messages_fetched", args.timeout), "all", None),
+    ("get_smart_replies", lambda user, args, n: user.request(
+        "get_smart_replies", {"chat_id": user.chat_id}, "smart_replies_generated", args.timeout), "all", None),
+    ("search_messages", lambda user, args, n: user.request(
+        "search_messages", {"email": user.email, "query": random.choice(WORDS)}, "messages_found",
+        args.timeout), "all", None),
+    ("login", lambda user, args, n: user.post(
+        "/login", args.timeout, json={"email": user.email, "password": PASSWORD}), "all", None),
+    ("add_contact", lambda user, args, n: user.post(
+        "/api/contacts", args.timeout, json={"userEmail": user.email, "contactEmail": user.partner.email}),
+     "first_of_pair", 1),
+    ("api_contacts", lambda user, args, n: user.get(f"/api/contacts/{user.email}", args.timeout), "all", None),
+    ("api_last_messages", lambda user, args, n: user.get(
+        f"/api/last-messages/{user.email}", args.timeout), "all", None),
+    ("api_search", lambda user, args, n: user.get(
+        f"/api/search/{user.email}", args.timeout, q=random.choice(WORDS)), "all", None),
+    ("api_users", lambda user, args, n: user.get("/api/users", args.timeout), "all", None),
+    ("user_profile", lambda user, args, n: user.get("/user/profile", args.timeout, email=user.email), "all", None),
+    ("api_metrics", lambda user, args, n: user.get("/api/metrics", args.timeout), "all", None),
+]
+
+
+def run_scenario(name, operation, users, repetitions, args, memory):
+    latencies = []
+    errors = []
+
+    def run(user):
+        # A user's operations run one after another, so it never has two requests in flight
+        for n in range(repetitions):
+            started = time.perf_counter()
+            try:
+                operation(user, args, n)
+            except Exception as e:
+                errors.append(f"{type(e).__name__}: {e}")
+                continue
+            latencies.append(time.perf_counter() - started)
+
+    memory.reset()
+    rss_before = memory.peak
+    pool = eventlet.GreenPool(args.concurrency)
+    started = time.perf_counter()
+    for user in users:
+        pool.spawn_n(run, user)
+    pool.waitall()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    if len(latencies) > 1:
+        quantiles = statistics.quantiles(latencies, n=100)
+    else:
+        quantiles = (latencies or [0.0]) * 99
+    result = {
+        "scenario": name,
+        "operations": len(latencies) + len(errors),
+        "errors": len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "ops_per_second": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "latency_p50_ms": round(quantiles[49] * 1000, 3),
+        "latency_p95_ms": round(quantiles[94] * 1000, 3),
+        "latency_p99_ms": round(quantiles[98] * 1000, 3),
+        "latency_max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": memory.peak,
+        "rss_after_mb": memory.rss_mb(),
+    }
+    print(f"{name:>20}  ops={result['operations']:<7} err={result['errors']:<5} "
+          f"ops/s={result['ops_per_second']:>9}  p50={result['latency_p50_ms']:>9}ms  "
+          f"p95={result['latency_p95_ms']:>9}ms  p99={result['latency_p99_ms']:>9}ms  "
+          f"rss={result['rss_before_mb']}->{result['rss_peak_mb']}MB")
+    if errors:
+        print(f"{'':>20}  first error: {errors[0]}")
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of ``results`` against a stored run, as readable lines."""
+    previous = {result["scenario"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        base = previous.get(result["scenario"])
+        if base is None:
+            continue
+        name = result["scenario"]
+        for key in ("latency_p50_ms", "latency_p95_ms", "latency_p99_ms"):
+            if result[key] > base[key] * (1 + tolerance) and result[key] - base[key] > MIN_LATENCY_DELTA_MS:
+                regressions.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result["ops_per_second"] < base["ops_per_second"] * (1 - tolerance):
+            regressions.append(f"{name}: ops_per_second {base['ops_per_second']} -> {result['ops_per_second']}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+        if result["rss_peak_mb"] and base.get("rss_peak_mb") and \
+                result["rss_peak_mb"] > base["rss_peak_mb"] * (1 + tolerance):
+            regressions.append(f"{name}: rss_peak_mb {base['rss_peak_mb']} -> {result['rss_peak_mb']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test of the Socket.IO and REST surface")
+    parser.add_argument("--clients", type=int, default=1000, help="Simulated users (paired into chats)")
+    parser.add_argument("--concurrency", type=int, default=200, help="Users sending requests at once")
+    parser.add_argument("--messages", type=int, default=5, help="Messages sent per user")
+    parser.add_argument("--requests", type=int, default=3, help="Repetitions per user of each read scenario")
+    parser.add_argument("--model-latency-ms", type=float, default=20, help="Delay of every stub model call")
+    parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for one reply")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep-database", action="store_true", help="Do not drop the database afterwards")
+    parser.add_argument("--json", help="Write results to this file")
+    parser.add_argument("--save-baseline", help="Write results to this baseline file")
+    parser.add_argument("--baseline", help="Compare against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative change against the baseline")
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    clients = args.clients + args.clients % 2
+    tag = uuid.uuid4().hex[:8]
+    database = f"chatapp_load_{tag}"
+    app_port, model_port = free_port(), free_port()
+    base_url = f"http://127.0.0.1:{app_port}"
+    app_log = os.path.join(tempfile.gettempdir(), f"bench_load_app_{tag}.log")
+    model_log = os.path.join(tempfile.gettempdir(), f"bench_load_models_{tag}.log")
+
+    config = {
+        "clients": clients,
+        "concurrency": args.concurrency,
+        "messages": args.messages,
+        "requests": args.requests,
+        "model_latency_ms": args.model_latency_ms,
+        "transport": TRANSPORTS[0],
+    }
+    print("load test: " + " ".join(f"{key}={value}" for key, value in config.items()))
+    print(f"server logs: {app_log} {model_log}")
+
+    create_database(database)
+    model_server = app_server = memory = None
+    users = []
+    results = []
+    try:
+        model_server = start_process(["stub_models.py", "--port", str(model_port),
+                                      "--latency-ms", str(args.model_latency_ms)], model_log)
+        wait_until_up(model_server, f"http://127.0.0.1:{model_port}/health", model_log)
+        app_server = start_process(["app.py"], app_log, env=dict(
+            os.environ, DATABASE=database, PORT=str(app_port),
+            MODEL_SERVER_URL=f"http://127.0.0.1:{model_port}"))
+        wait_until_up(app_server, f"{base_url}/api/metrics", app_log)
+        memory = MemorySampler(app_server.pid)
+
+        users = [SimulatedUser(base_url, f"load-{tag}-{n}@example.invalid") for n in range(clients)]
+        for first, second in zip(users[::2], users[1::2]):
+            first.partner, second.partner = second, first
+
+        for name, operation, who, repetitions in SCENARIOS:
+            if repetitions is None:
+                repetitions = args.requests
+            elif repetitions == "messages":
+                repetitions = args.messages
+            selected = users[::2] if who == "first_of_pair" else users
+            results.append(run_scenario(name, operation, selected, repetitions, args, memory))
+    finally:
+        for user in users:
+            user.close()
+        if memory:
+            memory.stop()
+        stop_process(app_server)
+        stop_process(model_server)
+        if not args.keep_database:
+            drop_database(database)
+
+    document = dict({"benchmark": "load"}, **config, results=results)
+    for path in (args.json, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(document, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        changed = [key for key in config if baseline.get(key) != config[key]]
+        if changed:
+            print(f"warning: baseline was recorded with different {', '.join(changed)}")
+        regressions = compare(results, baseline, args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
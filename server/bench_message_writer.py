@@ -0,0 +1,140 @@
+"""Benchmark group-commit message writes against one commit per message.
+
+``--senders`` threads each write ``--messages / senders`` messages into one
+chat, first with a commit per message (what ``send_message`` used to do),
+then through ``MessageWriter``. Latency is measured per message from the
+call until its row is committed. The benchmark creates two throwaway users
+and a chat, and deletes them and their messages afterwards, so point it at
+a development database (``.env`` as for the server).
+
+    python bench_message_writer.py
+    python bench_message_writer.py --senders 1 8 32 --batch-size 64 --max-delay-ms 5
+    python bench_message_writer.py --json message_writer.json   # also write machine-readable results
+"""
+import argparse
+import json
+import statistics
+import threading
+import time
+import uuid
+
+from db import db_connection
+from message_writer import MessageWriter, commit_messages
+
+
+def create_chat():
+    tag = uuid.uuid4().hex[:8]
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        user_ids = []
+        for name in ("a", "b"):
+            cursor.execute(
+                "INSERT INTO users (username, password_hash, email) VALUES (%s, %s, %s)",
+                (f"bench-{name}-{tag}", "-", f"bench-{name}-{tag}@example.invalid")
+            )
+            user_ids.append(cursor.lastrowid)
+        chat_id = str(uuid.uuid4())
+        cursor.execute("INSERT INTO chatsession (chat_id, user1_id, user2_id) VALUES (%s, %s, %s)",
+                       (chat_id, user_ids[0], user_ids[1]))
+        conn.commit()
+        cursor.close()
+    return chat_id, user_ids
+
+
+def drop_chat(chat_id, user_ids):
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM chatmessage WHERE chat_id = %s", (chat_id,))
+        cursor.execute("DELETE FROM chat_member_summary WHERE chat_id = %s", (chat_id,))
+        cursor.execute("DELETE FROM chat_summary WHERE chat_id = %s", (chat_id,))
+        cursor.execute("DELETE FROM chatsession WHERE chat_id = %s", (chat_id,))
+        cursor.execute("DELETE FROM users WHERE user_id IN (%s, %s)", tuple(user_ids))
+        conn.commit()
+        cursor.close()
+
+
+def per_message_commit(record):
+    with db_connection() as conn:
+        commit_messages(conn, [record])
+
+
+def run(write, chat_id, user_ids, senders, messages):
+    per_sender = max(1, messages // senders)
+    latencies = []
+    lock = threading.Lock()
+
+    def sender(n):
+        own = []
+        for i in range(per_sender):
+            record = {
+                'message_id': str(uuid.uuid4()),
+                'chat_id': chat_id,
+                'sender_id': user_ids[i % 2],
+                'receiver_id': user_ids[(i + 1) % 2],
+                'message': f"benchmark message {n}-{i}",
+            }
+            started = time.perf_counter()
+            write(record)
+            own.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(own)
+
+    threads = [threading.Thread(target=sender, args=(n,)) for n in range(senders)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "senders": senders,
+        "messages": len(latencies),
+        "elapsed_seconds": round(elapsed, 4),
+        "messages_per_second": round(len(latencies) / elapsed, 1),
+        "latency_p50_ms": round(quantiles[49] * 1000, 3),
+        "latency_p95_ms": round(quantiles[94] * 1000, 3),
+        "latency_p99_ms": round(quantiles[98] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Group-commit vs per-message commit benchmark")
+    parser.add_argument("--senders", nargs="+", type=int, default=[1, 8, 32])
+    parser.add_argument("--messages", type=int, default=2000, help="Messages per run, split across senders")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--max-delay-ms", type=float, default=5)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    writer = MessageWriter(max_batch_size=args.batch_size, max_delay_ms=args.max_delay_ms)
+    modes = [("per_message", per_message_commit), ("group_commit", writer.write)]
+
+    chat_id, user_ids = create_chat()
+    results = []
+    try:
+        for senders in args.senders:
+            for mode, write in modes:
+                result = dict(run(write, chat_id, user_ids, senders, args.messages), mode=mode)
+                results.append(result)
+                print(f"{mode:>12}  senders={senders:<3} msgs/s={result['messages_per_second']:>9}  "
+                      f"p50={result['latency_p50_ms']:>8}ms  p95={result['latency_p95_ms']:>8}ms  "
+                      f"p99={result['latency_p99_ms']:>8}ms")
+    finally:
+        drop_chat(chat_id, user_ids)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({
+                "benchmark": "message_writer",
+                "batch_size": args.batch_size,
+                "max_delay_ms": args.max_delay_ms,
+                "results": results,
+                "writer_stats": writer.stats(),
+            }, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
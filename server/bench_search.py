@@ -0,0 +1,166 @@
+"""Benchmark message search latency as the total message volume grows.
+
+One user has a chat of ``--own`` messages. Messages in other users' chats
+are then added in steps up to each of ``--volumes``, and after every step
+``--queries`` searches for that user are timed:
+
+    index   search_index.search: BM25 over the user's postings
+    like    the user's chats scanned with ``message LIKE '%word%'``, for comparison
+
+Messages are synthetic chat sentences written through ``commit_messages``,
+so they are indexed as ``send_message`` would index them. The throwaway
+users, chats, messages and their index rows are deleted afterwards, so
+point it at a development database (``.env`` as for the server).
+
+    python bench_search.py
+    python bench_search.py --own 2000 --volumes 10000 50000 200000 --json search.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+import uuid
+
+import search_index
+from db import db_connection
+from message_writer import commit_messages
+
+WORDS = ("meeting report deploy invoice lunch weekend photo project review budget release server "
+         "client office train ticket dinner birthday design draft contract holiday schedule update "
+         "bug test build coffee call tomorrow morning evening quarter plan launch demo slides").split()
+FILLER = "the a to and we can is at on for this please let me know soon".split()
+BACKGROUND_CHATS = 100
+
+
+def sentence(rng):
+    words = [rng.choice(WORDS if rng.random() < 0.5 else FILLER) for _ in range(rng.randint(4, 16))]
+    return " ".join(words)
+
+
+def create_users(cursor, tag, count):
+    user_ids = []
+    for n in range(count):
+        cursor.execute(
+            "INSERT INTO users (username, password_hash, email) VALUES (%s, %s, %s)",
+            (f"bench-{n}-{tag}", "-", f"bench-{n}-{tag}@example.invalid")
+        )
+        user_ids.append(cursor.lastrowid)
+    return user_ids
+
+
+def create_chat(cursor, user1_id, user2_id):
+    chat_id = str(uuid.uuid4())
+    cursor.execute("INSERT INTO chatsession (chat_id, user1_id, user2_id) VALUES (%s, %s, %s)",
+                   (chat_id, user1_id, user2_id))
+    return chat_id
+
+
+def add_messages(conn, rng, chats, count, batch_size=500):
+    """``count`` messages spread over ``chats`` ((chat_id, user1_id, user2_id) tuples)"""
+    for start in range(0, count, batch_size):
+        records = []
+        for _ in range(min(batch_size, count - start)):
+            chat_id, sender_id, receiver_id = rng.choice(chats)
+            if rng.random() < 0.5:
+                sender_id, receiver_id = receiver_id, sender_id
+            records.append({
+                'message_id': str(uuid.uuid4()),
+                'chat_id': chat_id,
+                'sender_id': sender_id,
+                'receiver_id': receiver_id,
+                'message': sentence(rng),
+            })
+        commit_messages(conn, records)
+
+
+def drop(conn, chat_ids, user_ids):
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(chat_ids))
+    for table in ("message_search_terms", "message_search_docs", "chat_search_stats",
+                  "chat_member_summary", "chat_summary", "chatmessage", "chatsession"):
+        cursor.execute(f"DELETE FROM {table} WHERE chat_id IN ({placeholders})", tuple(chat_ids))
+    cursor.execute(f"DELETE FROM users WHERE user_id IN ({', '.join(['%s'] * len(user_ids))})", tuple(user_ids))
+    conn.commit()
+    cursor.close()
+
+
+def like_search(conn, chat_ids, query, limit):
+    cursor = conn.cursor()
+    cursor.execute(f"""
+        SELECT message_id FROM chatmessage
+        WHERE chat_id IN ({', '.join(['%s'] * len(chat_ids))}) AND message LIKE %s
+        ORDER BY timestamp DESC LIMIT %s
+    """, (*chat_ids, f"%{query}%", limit))
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+
+def measure(run, queries):
+    latencies = []
+    for query in queries:
+        started = time.perf_counter()
+        run(query)
+        latencies.append(time.perf_counter() - started)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    return {
+        "latency_p50_ms": round(quantiles[49] * 1000, 3),
+        "latency_p95_ms": round(quantiles[94] * 1000, 3),
+        "latency_p99_ms": round(quantiles[98] * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Search latency against total message volume")
+    parser.add_argument("--own", type=int, default=2000, help="Messages in the searching user's chat")
+    parser.add_argument("--volumes", nargs="+", type=int, default=[10000, 50000, 200000],
+                        help="Messages in other users' chats at each step")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--limit", type=int, default=search_index.SEARCH_PAGE_SIZE)
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    queries = [" ".join(rng.sample(WORDS, rng.randint(1, 3))) for _ in range(args.queries)]
+    tag = uuid.uuid4().hex[:8]
+    results = []
+
+    with db_connection() as conn:
+        cursor = conn.cursor()
+        user_ids = create_users(cursor, tag, 2 + 2 * BACKGROUND_CHATS)
+        own_chat = create_chat(cursor, user_ids[0], user_ids[1])
+        background = [
+            (create_chat(cursor, user_ids[2 + 2 * n], user_ids[3 + 2 * n]), user_ids[2 + 2 * n], user_ids[3 + 2 * n])
+            for n in range(BACKGROUND_CHATS)
+        ]
+        conn.commit()
+        cursor.close()
+        chat_ids = [own_chat] + [chat_id for chat_id, _, _ in background]
+
+        try:
+            add_messages(conn, rng, [(own_chat, user_ids[0], user_ids[1])], args.own)
+            volume = 0
+            for target in sorted(args.volumes):
+                add_messages(conn, rng, background, target - volume)
+                volume = target
+                modes = {
+                    "index": lambda query: search_index.search(conn, user_ids[0], query, 1, args.limit),
+                    "like": lambda query: like_search(conn, [own_chat], query.split()[0], args.limit),
+                }
+                for mode, run in modes.items():
+                    result = dict(measure(run, queries), mode=mode, own_messages=args.own,
+                                  total_messages=args.own + volume)
+                    results.append(result)
+                    print(f"{mode:>6}  total={result['total_messages']:<8} p50={result['latency_p50_ms']:>8}ms  "
+                          f"p95={result['latency_p95_ms']:>8}ms  p99={result['latency_p99_ms']:>8}ms")
+        finally:
+            drop(conn, chat_ids, user_ids)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "search", "queries": len(queries), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
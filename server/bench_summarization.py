@@ -0,0 +1,127 @@
+"""Benchmark map-reduce summarization wall-clock time against chat length.
+
+For each chat length, a synthetic conversation is summarized three ways:
+
+    truncate      the old behaviour: one model call on the first 1000 characters
+    map_reduce    MapReduceSummarizer with each ``--workers`` setting
+
+``coverage`` is the fraction of messages that reached the model.
+
+With ``--backend local`` the real BART model and tokenizer are used
+(transformers must be installed). ``--backend simulated`` replaces each
+model call with a sleep of ``--call-ms`` plus ``--ms-per-token`` per input
+token. Simulated calls do not compete for CPU, which matches a model server
+or the Inference API rather than one process's cores.
+
+    python bench_summarization.py
+    python bench_summarization.py --backend local --lengths 20 100 500 --workers 1 2 4
+    python bench_summarization.py --json summarization.json   # also write machine-readable results
+"""
+import argparse
+import json
+import random
+import time
+
+from summarization import MapReduceSummarizer, conversation_lines, estimate_tokens, lead
+
+WORDS = ("meeting project deadline review design budget client launch update team feature "
+         "release bug test deploy plan question answer idea schedule coffee lunch today tomorrow").split()
+
+
+def synthetic_chat(length, seed=0):
+    rng = random.Random(seed)
+    return [
+        {'sender_email': f"user{i % 2}@example.com",
+         'message': " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 30))) + "."}
+        for i in range(length)
+    ]
+
+
+def simulated_backend(call_ms, ms_per_token):
+    def summarize(text):
+        tokens = estimate_tokens([text])[0]
+        time.sleep((call_ms + ms_per_token * tokens) / 1000.0)
+        return lead(text)
+    return summarize, estimate_tokens
+
+
+def local_backend():
+    from inference import LocalBackend
+    backend = LocalBackend()
+    if backend.count_tokens(["warm up"]) is None:
+        raise SystemExit("The local summarization model is not available; use --backend simulated")
+    return (lambda text: backend.summarize(text, max_length=100, min_length=30)), backend.count_tokens
+
+
+def run_truncate(summarize, lines):
+    text = "\n".join(lines)
+    started = time.perf_counter()
+    summarize(text[:1000])
+    covered = 0
+    for line in lines:
+        covered += len(line) + 1
+        if covered > 1000:
+            break
+    else:
+        line = None
+    reached = lines.index(line) if line is not None else len(lines)
+    return {
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        'coverage': round(reached / len(lines), 3),
+        'chunks': 1,
+        'levels': 1,
+        'complete': True,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Map-reduce summarization benchmark")
+    parser.add_argument("--backend", choices=["simulated", "local"], default="simulated")
+    parser.add_argument("--lengths", nargs="+", type=int, default=[20, 100, 500, 2000], help="Messages per chat")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 4, 8])
+    parser.add_argument("--chunk-tokens", type=int, default=900)
+    parser.add_argument("--budget", type=float, default=60, help="Latency budget per run, in seconds")
+    parser.add_argument("--call-ms", type=float, default=150, help="Simulated fixed cost per model call")
+    parser.add_argument("--ms-per-token", type=float, default=1.0, help="Simulated cost per input token")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    if args.backend == "local":
+        summarize, count_tokens = local_backend()
+    else:
+        summarize, count_tokens = simulated_backend(args.call_ms, args.ms_per_token)
+
+    results = []
+    for length in args.lengths:
+        lines = conversation_lines(synthetic_chat(length))
+        result = dict(run_truncate(summarize, lines), mode="truncate", messages=length, workers=1)
+        results.append(result)
+        print(f"{length:>6} msgs  {'truncate':>10}  workers=1   {result['elapsed_ms']:>9}ms  "
+              f"coverage={result['coverage']:<6} chunks=1")
+
+        for workers in args.workers:
+            summarizer = MapReduceSummarizer(summarize, count_tokens=count_tokens, chunk_tokens=args.chunk_tokens,
+                                             workers=workers, latency_budget=args.budget)
+            run = summarizer.run(lines)
+            result = {
+                'mode': "map_reduce",
+                'messages': length,
+                'workers': workers,
+                'elapsed_ms': run['elapsed_ms'],
+                'coverage': 1.0 if run['complete'] else None,
+                'chunks': run['chunks'],
+                'levels': run['levels'],
+                'complete': run['complete'],
+            }
+            results.append(result)
+            print(f"{length:>6} msgs  {'map_reduce':>10}  workers={workers:<3} {result['elapsed_ms']:>9}ms  "
+                  f"coverage={result['coverage']!s:<6} chunks={run['chunks']} levels={run['levels']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "summarization", "backend": args.backend,
+                       "chunk_tokens": args.chunk_tokens, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
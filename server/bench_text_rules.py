@@ -0,0 +1,174 @@
+"""Micro-benchmarks of the rule engine against the rules it replaced.
+
+Each case runs over ``--messages`` synthetic chat messages:
+
+    grammar       capitalization, lowercase "i", double modals, spacing
+    professional  grammar plus casual -> formal word replacements
+    sentiment     keyword fallback (positive / negative counts), once per
+                  ``--keywords`` size: the real lists padded with made-up
+                  words, to show how the cost grows with the lists
+
+``legacy`` is the previous code: one ``re.sub`` (or substring scan) per
+rule or keyword, with patterns built per call. ``engine`` is text_rules
+applied per message, and ``engine_batch`` the ``*_batch`` functions over the
+whole list. Per-message cost is the best of ``--repeat`` runs.
+``same_as_legacy`` is the share of identical outputs; the engine differs
+where the legacy rules misfire (e.g. "bad" inside "badge").
+
+    python bench_text_rules.py
+    python bench_text_rules.py --messages 50000 --keywords 16 200 2000 --json text_rules.json
+"""
+import argparse
+import json
+import random
+import re
+import time
+
+import text_rules
+
+# Words the rules act on, mixed into ordinary chat vocabulary
+RULE_WORDS = ("hey u gonna wanna yeah nope ur i could might be would can good bad great terrible "
+              "love hate happy sad please kindly boss").split()
+PLAIN_WORDS = ("the meeting is at ten see you tomorrow project report send me when chance thanks deploy "
+               "broke something checking logs now lunch next week sounds fine badge unlikely glad "
+               "team review later today call back minutes office photo weekend").split()
+POSITIVE_WORDS = ['happy', 'good', 'great', 'excellent', 'love', 'like', 'amazing', 'wonderful', 'fantastic']
+NEGATIVE_WORDS = ['sad', 'bad', 'hate', 'terrible', 'awful', 'horrible', 'disgusting']
+
+
+def synthetic_messages(count, seed=0):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        words = [rng.choice(RULE_WORDS if rng.random() < 0.2 else PLAIN_WORDS) for _ in range(rng.randint(3, 15))]
+        # Some messages have doubled spaces for the spacing rule
+        messages.append(rng.choice([" ", " ", "  "]).join(words) + rng.choice(["", ".", "!", "?"]))
+    return messages
+
+
+def legacy_grammar(text):
+    text = re.sub(r'\b(could|would|should|might|may|will|can)\s+(be\s+)?(might|may|could|would|should|will|can)\b',
+                  r'\1 \2', text, flags=re.IGNORECASE)
+    text = re.sub(r'\bcould\s+be\s+might\b', 'might be', text, flags=re.IGNORECASE)
+    text = re.sub(r'\bmight\s+be\s+could\b', 'could be', text, flags=re.IGNORECASE)
+    text = text.strip()
+    if text:
+        text = text[0].upper() + text[1:]
+    text = re.sub(r'\bi\b', 'I', text)
+    text = re.sub(r'\s+', ' ', text)
+    if text and not text.endswith(('.', '!', '?')):
+        text += '.'
+    return text
+
+
+def legacy_professional(text):
+    text = legacy_grammar(text)
+    replacements = {
+        'hey': 'Hello',
+        'yeah': 'Yes',
+        'nope': 'No',
+        'gonna': 'going to',
+        'wanna': 'want to',
+        'u': 'you',
+        'ur': 'your',
+        'boss': 'manager',
+    }
+    for casual, formal in replacements.items():
+        text = re.sub(r'\b' + casual + r'\b', formal, text, flags=re.IGNORECASE)
+    return text
+
+
+def legacy_sentiment(text, positive_words=POSITIVE_WORDS, negative_words=NEGATIVE_WORDS):
+    text_lower = text.lower()
+    pos_count = sum(1 for word in positive_words if word in text_lower)
+    neg_count = sum(1 for word in negative_words if word in text_lower)
+    if pos_count > neg_count:
+        return "positive"
+    elif neg_count > pos_count:
+        return "negative"
+    return "neutral"
+
+
+def engine_professional(text):
+    return text_rules.PROFESSIONAL.apply(text_rules.fix_grammar(text))
+
+
+def engine_professional_batch(texts):
+    return text_rules.PROFESSIONAL.apply_batch(text_rules.fix_grammar_batch(texts))
+
+
+def sentiment_label(counts):
+    if counts['positive'] > counts['negative']:
+        return "positive"
+    if counts['negative'] > counts['positive']:
+        return "negative"
+    return "neutral"
+
+
+def sentiment_case(keywords):
+    """(legacy, engine, engine_batch) for keyword lists padded to ``keywords`` words in total"""
+    padding = max(0, keywords - len(POSITIVE_WORDS) - len(NEGATIVE_WORDS))
+    filler = [f"zq{i:05d}" for i in range(padding)]
+    positive = POSITIVE_WORDS + filler[:padding // 2]
+    negative = NEGATIVE_WORDS + filler[padding // 2:]
+    matcher = text_rules.KeywordMatcher({'positive': positive, 'negative': negative})
+    return (lambda text: legacy_sentiment(text, positive, negative),
+            lambda text: sentiment_label(matcher.count(text)),
+            lambda texts: [sentiment_label(counts) for counts in matcher.count_batch(texts)])
+
+
+def best_time(run, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        output = run()
+        best = min(best, time.perf_counter() - started)
+    return best, output
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rule engine micro-benchmarks")
+    parser.add_argument("--messages", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keywords", nargs="+", type=int, default=[16, 200, 2000],
+                        help="Sentiment keyword list sizes")
+    parser.add_argument("--json", help="Write results to this file")
+    args = parser.parse_args()
+
+    messages = synthetic_messages(args.messages)
+    cases = {
+        'grammar': (legacy_grammar, text_rules.fix_grammar, text_rules.fix_grammar_batch),
+        'professional': (legacy_professional, engine_professional, engine_professional_batch),
+    }
+    for keywords in args.keywords:
+        cases[f"sentiment/{keywords}"] = sentiment_case(keywords)
+
+    results = []
+    for case, (legacy, engine, engine_batch) in cases.items():
+        runs = {
+            'legacy': lambda: [legacy(text) for text in messages],
+            'engine': lambda: [engine(text) for text in messages],
+            'engine_batch': lambda: engine_batch(messages),
+        }
+        baseline = None
+        for mode, run in runs.items():
+            elapsed, output = best_time(run, args.repeat)
+            if baseline is None:
+                baseline = output
+            result = {
+                'case': case,
+                'mode': mode,
+                'us_per_message': round(elapsed / len(messages) * 1e6, 3),
+                'same_as_legacy': round(sum(a == b for a, b in zip(output, baseline)) / len(messages), 3),
+            }
+            results.append(result)
+            print(f"{case:>16}  {mode:>12}  {result['us_per_message']:>8} us/msg  "
+                  f"same_as_legacy={result['same_as_legacy']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"benchmark": "text_rules", "messages": len(messages), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
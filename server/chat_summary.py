@@ -0,0 +1,132 @@
+"""Per-chat summary rows behind ``/api/last-messages``.
+
+``chat_summary`` holds each chat's last message and last activity, and
+``chat_member_summary`` holds each participant's unread count, keyed by
+(user_id, chat_id) so one user's chats are a primary-key range scan.
+``send_message`` updates both in the same transaction as the message
+insert, so the endpoint no longer aggregates the whole message table.
+
+Rebuild the summaries from existing messages with ``python chat_summary.py``.
+"""
+import logging
+
+from db import db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+RECORD_MESSAGE_SQL = """
+    INSERT INTO chat_summary
+        (chat_id, last_message_id, last_message, last_sender_id, last_receiver_id, last_activity, message_count)
+    VALUES (%s, %s, %s, %s, %s, CURRENT_TIMESTAMP, 1)
+    ON DUPLICATE KEY UPDATE
+        last_message_id = VALUES(last_message_id),
+        last_message = VALUES(last_message),
+        last_sender_id = VALUES(last_sender_id),
+        last_receiver_id = VALUES(last_receiver_id),
+        last_activity = VALUES(last_activity),
+        message_count = message_count + 1
+"""
+
+# One row per participant: the sender's row is created if missing (0), the
+# receiver's unread count goes up by one (1)
+RECORD_UNREAD_SQL = """
+    INSERT INTO chat_member_summary (user_id, chat_id, unread_count)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE unread_count = unread_count + VALUES(unread_count)
+"""
+
+LAST_MESSAGES_SQL = """
+    SELECT
+        s.chat_id,
+        s.last_message AS message,
+        s.last_activity AS timestamp,
+        u.username,
+        u.email,
+        u.profile_image_hash,
+        s.last_sender_id AS sender_id,
+        s.last_receiver_id AS receiver_id,
+        m.unread_count AS unread
+    FROM chat_member_summary m
+    JOIN chat_summary s ON s.chat_id = m.chat_id
+    JOIN chatsession cs ON cs.chat_id = m.chat_id
+    JOIN users u ON u.user_id = IF(cs.user1_id = m.user_id, cs.user2_id, cs.user1_id)
+    WHERE m.user_id = %s
+    ORDER BY s.last_activity DESC
+"""
+
+
+def record_message(cursor, chat_id, message_id, message, sender_id, receiver_id):
+    """Update the chat's summary for a new message (caller commits)."""
+    record_messages(cursor, [(chat_id, message_id, message, sender_id, receiver_id)])
+
+
+def record_messages(cursor, messages):
+    """Update summaries for several new messages at once (caller commits).
+
+    ``messages`` are (chat_id, message_id, message, sender_id, receiver_id)
+    tuples in send order, so the last one per chat becomes its last message.
+    """
+    cursor.executemany(RECORD_MESSAGE_SQL, messages)
+    unread = []
+    for chat_id, _, _, sender_id, receiver_id in messages:
+        unread.append((sender_id, chat_id, 0))
+        unread.append((receiver_id, chat_id, 1))
+    cursor.executemany(RECORD_UNREAD_SQL, unread)
+
+
+def mark_read(cursor, chat_id, user_id):
+    """Reset ``user_id``'s unread count for the chat (caller commits)."""
+    cursor.execute(
+        "UPDATE chat_member_summary SET unread_count = 0 WHERE user_id = %s AND chat_id = %s",
+        (user_id, chat_id)
+    )
+
+
+def last_messages(cursor, user_id):
+    """Latest message, other participant and unread count for each of the user's chats."""
+    cursor.execute(LAST_MESSAGES_SQL, (user_id,))
+    return cursor.fetchall()
+
+
+def rebuild(conn):
+    """Recompute every chat summary from chatmessage.
+
+    Existing unread counts are kept; participants without a row get one
+    with nothing unread.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM chat_summary")
+        cursor.execute("""
+            INSERT INTO chat_summary
+                (chat_id, last_message_id, last_message, last_sender_id, last_receiver_id, last_activity, message_count)
+            SELECT cm.chat_id, cm.message_id, cm.message, cm.sender_id, cm.receiver_id, cm.timestamp, latest.message_count
+            FROM (
+                SELECT chat_id, MAX(timestamp) AS max_time, COUNT(*) AS message_count
+                FROM chatmessage
+                GROUP BY chat_id
+            ) latest
+            JOIN chatmessage cm ON cm.chat_id = latest.chat_id AND cm.timestamp = latest.max_time
+            ON DUPLICATE KEY UPDATE chat_id = chat_summary.chat_id
+        """)
+        chats = cursor.rowcount
+        cursor.execute("""
+            INSERT IGNORE INTO chat_member_summary (user_id, chat_id, unread_count)
+            SELECT user1_id, chat_id, 0 FROM chatsession
+            UNION ALL
+            SELECT user2_id, chat_id, 0 FROM chatsession
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return chats
+
+
+if __name__ == "__main__":
+    with db_connection() as conn:
+        count = rebuild(conn)
+    logger.info(f"Chat summaries rebuilt ({count} rows written)")
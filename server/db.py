@@ -0,0 +1,204 @@
+import os
+import queue
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+import mysql.connector
+from mysql.connector import Error
+from dotenv import load_dotenv
+from flask import g, has_app_context
+
+load_dotenv()
+
+HOST_NAME = os.getenv('HOST_NAME')
+USER_NAME = os.getenv('USER_NAME')
+PASSWORD = os.getenv('PASSWORD')
+DATABASE = os.getenv('DATABASE')
+
+# Pool configuration (override through the environment)
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 10))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))            # seconds to wait for a free connection
+DB_POOL_PING_INTERVAL = float(os.getenv('DB_POOL_PING_INTERVAL', 30))  # idle seconds before a health check
+
+
+class PoolTimeout(Error):
+    """Raised when no connection becomes available within the pool timeout."""
+
+
+class ConnectionPool:
+    """Bounded pool of MySQL connections, safe to share between threads and greenlets.
+
+    Connections are opened lazily up to ``size``. On checkout a connection that
+    has been idle longer than ``ping_interval`` is pinged and transparently
+    reconnected if the link dropped. On release any open transaction is rolled
+    back so the next borrower never sees a stale snapshot.
+    """
+
+    def __init__(self, size=DB_POOL_SIZE, timeout=DB_POOL_TIMEOUT,
+                 ping_interval=DB_POOL_PING_INTERVAL, **connect_args):
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.connect_args = connect_args
+
+        self._idle = queue.LifoQueue()  # LIFO keeps the hottest connections in use
+        self._lock = threading.Lock()
+        self._created = 0
+        self._last_used = {}
+
+        # Metrics
+        self._in_use = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def _connect(self):
+        return mysql.connector.connect(**self.connect_args)
+
+    def _healthy(self, conn):
+        """Ping connections that sat idle too long, reconnecting if needed."""
+        # is_connected() itself pings the server, so recently used
+        # connections are handed out without any round trip
+        idle_for = time.monotonic() - self._last_used.get(id(conn), 0)
+        if idle_for < self.ping_interval:
+            return conn
+        try:
+            conn.ping(reconnect=True, attempts=2, delay=0)
+            return conn
+        except Error as e:
+            logging.warning(f"Pooled connection failed health check, reconnecting: {e}")
+            with self._lock:
+                self._reconnects += 1
+            self._last_used.pop(id(conn), None)
+            try:
+                conn.close()
+            except Error:
+                pass
+            return self._connect()
+
+    def acquire(self, timeout=None):
+        """Check out a healthy connection, waiting up to ``timeout`` seconds."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        conn = None
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                    self._last_used[id(conn)] = time.monotonic()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                try:
+                    conn = self._idle.get(timeout=timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeout(msg=f"No database connection available after {timeout}s")
+
+        try:
+            conn = self._healthy(conn)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+        waited = time.monotonic() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+        return conn
+
+    def release(self, conn):
+        """Return a connection to the pool, discarding it if it is broken."""
+        with self._lock:
+            self._in_use -= 1
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except Error as e:
+            logging.warning(f"Dropping broken pooled connection: {e}")
+            self._last_used.pop(id(conn), None)
+            with self._lock:
+                self._created -= 1
+            return
+        self._last_used[id(conn)] = time.monotonic()
+        self._idle.put(conn)
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def stats(self):
+        """Snapshot of pool utilization and checkout wait times."""
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'utilization': round(self._in_use / self.size, 3) if self.size else 0.0,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'wait_avg_ms': round(self._wait_total / checkouts * 1000, 3) if checkouts else 0.0,
+                'wait_max_ms': round(self._wait_max * 1000, 3),
+            }
+
+
+pool = ConnectionPool(
+    host=HOST_NAME,
+    user=USER_NAME,
+    passwd=PASSWORD,
+    database=DATABASE
+)
+
+
+def get_db_connection():
+    """Return the pooled connection bound to the current request or socket event.
+
+    The connection is checked out on first use and returned to the pool by
+    ``close_db_connection`` when the app context is torn down.
+    """
+    if not has_app_context():
+        raise RuntimeError("get_db_connection() needs an app context; use db_connection() instead")
+    if 'db_conn' not in g:
+        g.db_conn = pool.acquire()
+    return g.db_conn
+
+
+def close_db_connection(exception=None):
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        pool.release(conn)
+
+
+@contextmanager
+def db_connection():
+    """Borrow a connection outside of a request (scripts, background jobs)."""
+    with pool.connection() as conn:
+        yield conn
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db_connection)
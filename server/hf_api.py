@@ -0,0 +1,352 @@
+"""Client for the Hugging Face Inference API.
+
+Every call goes through one process-wide ``HFClient``:
+
+* a keep-alive ``requests.Session`` with a bounded connection pool, so
+  repeated calls reuse TCP/TLS connections;
+* a retry scheduler: 503 / "model is loading" / 429 / 5xx / network errors
+  are retried with jittered exponential backoff (or the server's own
+  ``estimated_time`` / ``Retry-After``), but the wait happens on a timer
+  thread instead of sleeping inside the worker that handles socket events;
+* a per-model circuit breaker that fails fast after repeated failures;
+* request coalescing: identical (model, payload) calls that are already in
+  flight share one upstream request and its response.
+
+Failures return ``None`` like before, so callers keep their fallbacks.
+``HF_API_URL`` can point at a local stub server for testing.
+"""
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from typing import Any, Dict, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from dotenv import load_dotenv
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+# Hugging Face API configuration
+HF_API_KEY = os.getenv("HF_API_KEY")  # Get this from huggingface.co/settings/tokens
+HF_API_URL = os.getenv("HF_API_URL", "https://api-inference.huggingface.co/models").rstrip("/")
+HF_API_TIMEOUT = float(os.getenv("HF_API_TIMEOUT", 30))
+HF_API_POOL_SIZE = int(os.getenv("HF_API_POOL_SIZE", 10))
+HF_API_WORKERS = int(os.getenv("HF_API_WORKERS", 8))
+HF_API_MAX_ATTEMPTS = int(os.getenv("HF_API_MAX_ATTEMPTS", 4))
+HF_API_BACKOFF_BASE = float(os.getenv("HF_API_BACKOFF_BASE", 1))
+HF_API_BACKOFF_MAX = float(os.getenv("HF_API_BACKOFF_MAX", 20))
+HF_API_DEADLINE = float(os.getenv("HF_API_DEADLINE", 60))
+HF_API_BREAKER_THRESHOLD = int(os.getenv("HF_API_BREAKER_THRESHOLD", 5))
+HF_API_BREAKER_RESET = float(os.getenv("HF_API_BREAKER_RESET", 30))
+
+# Outcomes of a single attempt
+OK, RETRY, FAIL = "ok", "retry", "fail"
+
+
+class RetryScheduler:
+    """Run callbacks after a delay from a single timer thread.
+
+    A call waiting for its next attempt holds no worker thread or greenlet;
+    it is just an entry in this heap.
+    """
+
+    def __init__(self, name: str = "retry-scheduler"):
+        self.name = name
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def schedule(self, delay: float, fn):
+        with self._cond:
+            heapq.heappush(self._heap, (time.monotonic() + delay, next(self._seq), fn))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def pending(self) -> int:
+        with self._cond:
+            return len(self._heap)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._heap:
+                    self._cond.wait()
+                due, _, fn = self._heap[0]
+                now = time.monotonic()
+                if due > now:
+                    self._cond.wait(due - now)
+                    continue
+                heapq.heappop(self._heap)
+            try:
+                fn()
+            except Exception as e:
+                logger.error(f"{self.name}: scheduled callback failed: {e}")
+
+
+class CircuitBreaker:
+    """Closed -> open after ``threshold`` consecutive failures -> half-open after ``reset_timeout``.
+
+    While open every call is rejected immediately; in half-open one trial
+    call is let through and its outcome closes or re-opens the breaker.
+    """
+
+    def __init__(self, threshold: int = HF_API_BREAKER_THRESHOLD, reset_timeout: float = HF_API_BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def release(self):
+        """End a trial call without a verdict, so the next call can be the trial."""
+        with self._lock:
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_in_flight = False
+            if self.opened_at is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+
+
+class _Call:
+    __slots__ = ("model", "payload", "key", "future", "attempt", "deadline", "started")
+
+    def __init__(self, model, payload, key, future, deadline):
+        self.model = model
+        self.payload = payload
+        self.key = key
+        self.future = future
+        self.attempt = 0
+        self.started = time.monotonic()
+        self.deadline = self.started + deadline
+
+
+class HFClient:
+    def __init__(self, base_url: str = HF_API_URL, api_key: Optional[str] = HF_API_KEY,
+                 timeout: float = HF_API_TIMEOUT, pool_size: int = HF_API_POOL_SIZE,
+                 workers: int = HF_API_WORKERS, max_attempts: int = HF_API_MAX_ATTEMPTS,
+                 backoff_base: float = HF_API_BACKOFF_BASE, backoff_max: float = HF_API_BACKOFF_MAX,
+                 deadline: float = HF_API_DEADLINE, breaker_threshold: int = HF_API_BREAKER_THRESHOLD,
+                 breaker_reset: float = HF_API_BREAKER_RESET):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.deadline = deadline
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+
+        # One keep-alive session per process
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hf-api")
+        self._scheduler = RetryScheduler("hf-api-retry")
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._requests = 0
+        self._coalesced = 0
+        self._short_circuited = 0
+        self._attempts = 0
+        self._retries = 0
+        self._successes = 0
+        self._failures = 0
+        self._latency_total = 0.0
+
+    def _breaker(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            breaker = self._breakers[model] = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+        return breaker
+
+    def submit(self, model: str, payload: Dict) -> Future:
+        """Start (or join) a call; the Future resolves to the JSON response or ``None``."""
+        key = model + "\0" + json.dumps(payload, sort_keys=True, default=str)
+        with self._lock:
+            self._requests += 1
+            future = self._inflight.get(key)
+            if future is not None:
+                self._coalesced += 1
+                return future
+
+            future = Future()
+            if not self._breaker(model).allow():
+                self._short_circuited += 1
+                future.set_result(None)
+                return future
+            self._inflight[key] = future
+
+        call = _Call(model, payload, key, future, self.deadline)
+        self._executor.submit(self._attempt, call)
+        return future
+
+    def call(self, model: str, payload: Dict) -> Optional[Any]:
+        """Blocking convenience wrapper around ``submit``; waits at most ``deadline`` seconds."""
+        try:
+            return self.submit(model, payload).result(timeout=self.deadline)
+        except FutureTimeout:
+            logger.error(f"Hugging Face API call to {model} exceeded its deadline")
+            return None
+
+    def _post(self, model: str, payload: Dict, timeout: float):
+        """One HTTP attempt -> (outcome, result, server wait hint in seconds)."""
+        try:
+            response = self.session.post(f"{self.base_url}/{model}", json=payload, timeout=timeout)
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Hugging Face API request to {model} failed: {e}")
+            return RETRY, None, None
+
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
+
+        if response.status_code == 200:
+            if isinstance(body, dict) and "error" in body:
+                if "loading" in str(body["error"]).lower():
+                    return RETRY, None, body.get("estimated_time")
+                logger.error(f"Hugging Face API error for {model}: {body['error']}")
+                return FAIL, None, None
+            if body is None:
+                logger.error(f"Hugging Face API returned invalid JSON for {model}")
+                return FAIL, None, None
+            return OK, body, None
+
+        if response.status_code == 503:
+            hint = body.get("estimated_time") if isinstance(body, dict) else None
+            logger.info(f"Model {model} is loading or unavailable")
+            return RETRY, None, hint
+        if response.status_code == 429:
+            retry_after = response.headers.get("Retry-After")
+            return RETRY, None, float(retry_after) if retry_after and retry_after.isdigit() else None
+        if response.status_code >= 500:
+            logger.warning(f"Hugging Face API returned {response.status_code} for {model}")
+            return RETRY, None, None
+
+        logger.error(f"Hugging Face API returned {response.status_code}: {response.text}")
+        return FAIL, None, None
+
+    def _backoff(self, attempt: int, hint: Optional[float]) -> float:
+        if hint:
+            # Trust the server's estimate, with a little jitter so waiters don't stampede
+            return min(self.backoff_max, float(hint)) * random.uniform(1.0, 1.2)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (attempt - 1)))
+
+    def _attempt(self, call: _Call):
+        call.attempt += 1
+        with self._lock:
+            self._attempts += 1
+        breaker = self._breaker(call.model)
+
+        # No attempt may outlast the call's deadline, which is all call() waits for
+        remaining = call.deadline - time.monotonic()
+        if remaining <= 0:
+            breaker.release()
+            self._finish(call, None)
+            return
+
+        try:
+            outcome, result, hint = self._post(call.model, call.payload, min(self.timeout, remaining))
+        except Exception as e:
+            logger.error(f"Failed to call Hugging Face API: {e}")
+            breaker.release()
+            self._finish(call, None)
+            return
+
+        if outcome in (OK, FAIL):
+            # A non-retryable failure still means the endpoint answered
+            breaker.record_success()
+            self._finish(call, result)
+            return
+
+        breaker.record_failure()
+        delay = self._backoff(call.attempt, hint)
+        if (call.attempt < self.max_attempts and time.monotonic() + delay < call.deadline
+                and breaker.state != "open"):
+            with self._lock:
+                self._retries += 1
+            logger.info(f"Retrying {call.model} in {delay:.1f}s (attempt {call.attempt + 1}/{self.max_attempts})")
+            self._scheduler.schedule(delay, lambda: self._executor.submit(self._attempt, call))
+            return
+        self._finish(call, None)
+
+    def _finish(self, call: _Call, result):
+        with self._lock:
+            self._inflight.pop(call.key, None)
+            if result is None:
+                self._failures += 1
+            else:
+                self._successes += 1
+            self._latency_total += time.monotonic() - call.started
+        call.future.set_result(result)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._successes + self._failures
+            return {
+                'requests': self._requests,
+                'coalesced': self._coalesced,
+                'short_circuited': self._short_circuited,
+                'attempts': self._attempts,
+                'retries': self._retries,
+                'successes': self._successes,
+                'failures': self._failures,
+                'in_flight': len(self._inflight),
+                'waiting_to_retry': self._scheduler.pending(),
+                'latency_avg_ms': round(self._latency_total / completed * 1000, 3) if completed else 0.0,
+                'breakers': {model: breaker.state for model, breaker in self._breakers.items()},
+            }
+
+
+client = HFClient()
+
+
+def call_huggingface_api(model_name, payload):
+    """Call a hosted model; returns the decoded JSON response or None"""
+    return client.call(model_name, payload)
@@ -0,0 +1,124 @@
+"""Process-wide email -> user_id resolver.
+
+Socket handlers and REST endpoints identify users by email, but every
+query needs the user_id. Identities almost never change, so resolved ids
+are kept in a bounded LRU; several emails can be resolved with one
+``IN (...)`` query. ``update_profile`` invalidates the old and new email
+when a user changes it; the TTL bounds how long another worker process can
+keep serving a stale entry. Unknown emails are not cached, so a newly
+registered user resolves immediately.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", 300))
+
+
+class IdentityResolver:
+    def __init__(self, max_entries=IDENTITY_CACHE_SIZE, ttl=IDENTITY_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # email -> (user_id, expires_at), least recently used first
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._queries = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def _lookup(self, email: str):
+        """Cached user_id or None; caller holds the lock."""
+        entry = self._entries.get(email)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            del self._entries[email]
+            return None
+        self._entries.move_to_end(email)
+        return entry[0]
+
+    def _store(self, email: str, user_id):
+        self._entries[email] = (user_id, time.monotonic() + self.ttl)
+        self._entries.move_to_end(email)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._evictions += 1
+
+    def resolve(self, connection, email: str) -> Optional[str]:
+        """user_id for ``email``, or None if no such user"""
+        if not email:
+            return None
+        return self.resolve_many(connection, [email]).get(email)
+
+    def resolve_many(self, connection, emails: Iterable[str]) -> Dict[str, str]:
+        """Map each known email to its user_id with at most one query; unknown emails are left out"""
+        resolved = {}
+        missing = []
+        with self._lock:
+            for email in dict.fromkeys(email for email in emails if email):
+                user_id = self._lookup(email)
+                if user_id is None:
+                    missing.append(email)
+                else:
+                    resolved[email] = user_id
+            self._hits += len(resolved)
+            self._misses += len(missing)
+
+        if not missing:
+            return resolved
+
+        cursor = connection.cursor(buffered=True)
+        try:
+            placeholders = ", ".join(["%s"] * len(missing))
+            cursor.execute(f"SELECT email, user_id FROM users WHERE email IN ({placeholders})", tuple(missing))
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+
+        # Emails compare case-insensitively in MySQL's default collation
+        found = {email.lower(): user_id for email, user_id in rows}
+        with self._lock:
+            self._queries += 1
+            for email in missing:
+                user_id = found.get(email.lower())
+                if user_id is not None:
+                    resolved[email] = user_id
+                    self._store(email, user_id)
+        return resolved
+
+    def invalidate(self, *emails: str):
+        with self._lock:
+            for email in emails:
+                if email and self._entries.pop(email, None) is not None:
+                    self._invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self._hits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'queries': self._queries,
+                'evictions': self._evictions,
+                'invalidations': self._invalidations,
+            }
+
+
+identity = IdentityResolver()
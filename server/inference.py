@@ -0,0 +1,208 @@
+"""AI operations backed by the models of the current process.
+
+``LocalBackend`` is what the model server (model_server.py) runs, and what
+app.py uses directly when no MODEL_SERVER_URL is configured. Every method
+returns ``None`` when it cannot produce a result, so callers can fall back
+to their rule-based paths.
+"""
+import logging
+import os
+from typing import Any, Callable, Dict, List, Optional
+
+import hf_api
+import langid
+from batching import MicroBatcher, run_blocking
+from models import registry as model_registry, translation_model, TRANSLATION_MODELS
+
+logger = logging.getLogger(__name__)
+
+# Micro-batch concurrent sentiment requests into padded RoBERTa batches
+SENTIMENT_MAX_BATCH_SIZE = int(os.getenv("SENTIMENT_MAX_BATCH_SIZE", 32))
+SENTIMENT_MAX_WAIT_MS = float(os.getenv("SENTIMENT_MAX_WAIT_MS", 10))
+SENTIMENT_TIMEOUT = float(os.getenv("SENTIMENT_TIMEOUT", 30))
+
+# Texts per Marian ``generate`` call; a longer list is split into several batches
+TRANSLATION_BATCH_SIZE = int(os.getenv("TRANSLATION_BATCH_SIZE", 16))
+# Marian's positional limit; longer messages are truncated
+TRANSLATION_MAX_TOKENS = 512
+
+
+def detect_language(text: str) -> str:
+    """Detect language of the message (character n-gram model, see langid.py)"""
+    return langid.detect(text)[0]
+
+
+def detect_languages(texts: List[str]) -> List[str]:
+    """Language of each text, scored together in one pass"""
+    return [language for language, _ in langid.detect_batch(texts)]
+
+
+def _marian_generate(tokenizer, model, texts: List[str]) -> List[str]:
+    """Translate ``texts`` as one padded batch in a single forward pass."""
+    import torch
+
+    batch = tokenizer(texts, return_tensors="pt", padding=True, truncation=True, max_length=TRANSLATION_MAX_TOKENS)
+    with torch.no_grad():
+        outputs = model.generate(**batch, max_new_tokens=TRANSLATION_MAX_TOKENS)
+    return [tokenizer.decode(output, skip_special_tokens=True).strip() for output in outputs]
+
+
+def marian_translate(texts: List[str], target_language: str,
+                     batch_size: int = TRANSLATION_BATCH_SIZE) -> Optional[List[str]]:
+    """Translate ``texts`` with the local Marian model for ``target_language``.
+
+    Texts are sorted by length before batching so each batch pads to
+    similar lengths; results come back in input order. Returns None when
+    the model is unsupported, disabled or failed to load.
+    """
+    if target_language not in TRANSLATION_MODELS:
+        return None
+    marian = model_registry.get(translation_model(target_language))
+    if marian is None:
+        return None
+    tokenizer, model = marian
+
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    results = [None] * len(texts)
+    for start in range(0, len(order), batch_size):
+        indexes = order[start:start + batch_size]
+        translated = run_blocking(_marian_generate, tokenizer, model, [texts[i] for i in indexes])
+        for i, text in zip(indexes, translated):
+            results[i] = text
+    return results
+
+
+def _translation_text(item) -> Optional[str]:
+    if not isinstance(item, dict):
+        return None
+    translated = item.get('translation_text') or item.get('generated_text')
+    return translated.strip() if translated else None
+
+
+def _stopping_criteria(should_stop: Callable[[], bool]):
+    """``generate`` stopping criteria that end every sequence once ``should_stop()`` is true."""
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class Cancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kwargs):
+            return torch.full((input_ids.shape[0],), bool(should_stop()), dtype=torch.bool, device=input_ids.device)
+
+    return StoppingCriteriaList([Cancelled()])
+
+
+class LocalBackend:
+    """Runs sentiment, summarization, smart replies and translation in-process."""
+
+    name = "local"
+
+    def __init__(self):
+        self.sentiment_batcher = MicroBatcher(
+            self._run_sentiment_batch,
+            max_batch_size=SENTIMENT_MAX_BATCH_SIZE,
+            max_wait_ms=SENTIMENT_MAX_WAIT_MS,
+            name="sentiment-batcher"
+        )
+
+    def _run_sentiment_batch(self, texts: List[str]) -> List[Dict]:
+        analyzer = model_registry.get("sentiment")
+        if analyzer is None:
+            raise RuntimeError("Sentiment model is unavailable")
+        return run_blocking(analyzer, texts, batch_size=len(texts), truncation=True)
+
+    def sentiment(self, text: str) -> Optional[Dict]:
+        """Raw pipeline result ``{"label", "score"}`` for one text."""
+        if not model_registry.available("sentiment"):
+            return None
+        return self.sentiment_batcher.submit(text).result(timeout=SENTIMENT_TIMEOUT)
+
+    def sentiment_batch(self, texts: List[str]) -> Optional[List[Dict]]:
+        """Raw pipeline results for many texts, in input order."""
+        if not model_registry.available("sentiment"):
+            return None
+        futures = self.sentiment_batcher.submit_many(list(texts))
+        return [future.result(timeout=SENTIMENT_TIMEOUT) for future in futures]
+
+    def summarize(self, text: str, max_length: int = 100, min_length: int = 30) -> Optional[str]:
+        summarizer = model_registry.get("summarizer")
+        if summarizer is None:
+            return None
+        summary = run_blocking(summarizer, text, max_length=max_length, min_length=min_length, do_sample=False)
+        return summary[0]['summary_text']
+
+    def count_tokens(self, texts: List[str]) -> Optional[List[int]]:
+        """Summarizer tokens per text (special tokens included), for chunking long inputs."""
+        summarizer = model_registry.get("summarizer")
+        if summarizer is None:
+            return None
+        return [len(ids) for ids in summarizer.tokenizer(list(texts))["input_ids"]]
+
+    def smart_reply(self, context: str, num_replies: int = 3,
+                    should_stop: Optional[Callable[[], bool]] = None) -> Optional[List[str]]:
+        """Decoded DialoGPT candidates for ``context`` (unfiltered).
+
+        ``should_stop`` is polled after every decoding step; once it returns
+        True generation ends early and the partial candidates are returned.
+        """
+        dialogpt = model_registry.get("dialogpt")
+        if dialogpt is None:
+            return None
+        tokenizer, model = dialogpt
+        extra = {'stopping_criteria': _stopping_criteria(should_stop)} if should_stop else {}
+
+        # Encode context
+        input_ids = tokenizer.encode(context + tokenizer.eos_token, return_tensors="pt")
+
+        # Generate multiple reply candidates
+        outputs = run_blocking(
+            model.generate,
+            input_ids,
+            max_length=100,
+            pad_token_id=tokenizer.eos_token_id,
+            num_return_sequences=num_replies,
+            num_beams=num_replies,
+            do_sample=True,
+            top_k=50,
+            top_p=0.95,
+            **extra
+        )
+        return [tokenizer.decode(output, skip_special_tokens=True).strip() for output in outputs]
+
+    def detect_language(self, text: str) -> str:
+        return detect_language(text)
+
+    def detect_language_batch(self, texts: List[str]) -> List[str]:
+        return detect_languages(texts)
+
+    def translate(self, text: str, target_language: str) -> Optional[str]:
+        translated = self.translate_batch([text], target_language)
+        return translated[0] if translated else None
+
+    def translate_batch(self, texts: List[str], target_language: str) -> Optional[List[Optional[str]]]:
+        """Translations of ``texts`` in input order (None for a text that failed).
+
+        Runs the local Marian model; when it is unavailable the whole list
+        goes to the Inference API in one request.
+        """
+        model_name = TRANSLATION_MODELS.get(target_language)
+        if not model_name:
+            return None  # unsupported
+
+        texts = list(texts)
+        if not texts:
+            return []
+        translated = marian_translate(texts, target_language)
+        if translated is not None:
+            return translated
+
+        response = hf_api.call_huggingface_api(model_name, {"inputs": texts})
+        if not response or not isinstance(response, list) or len(response) != len(texts):
+            return None
+        return [_translation_text(item) for item in response]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'models': model_registry.stats(),
+            'sentiment_batcher': self.sentiment_batcher.stats()
+        }
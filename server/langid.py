@@ -0,0 +1,210 @@
+"""Offline language identification with character n-gram profiles.
+
+Each language has a profile: the smoothed log-probability of every hashed
+character 1-, 2- and 3-gram, learned from the sample texts in
+``langid_corpus/``. The profiles form one ``(NUM_BUCKETS, languages)``
+table, precomputed into ``langid_profiles.npz``. A text is scored by
+summing the table rows of its n-grams (multinomial naive Bayes). N-gram
+extraction, hashing and scoring are NumPy array operations, and
+``detect_batch`` scores a whole page of messages in one pass.
+
+Rebuild the table after editing the corpus, and try it out:
+
+    python langid.py build
+    python langid.py "¿Dónde nos vemos mañana?"
+
+Compare accuracy and throughput with ``python bench_langid.py``.
+"""
+import argparse
+import logging
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+LANGID_PROFILES = os.getenv("LANGID_PROFILES", os.path.join(HERE, "langid_profiles.npz"))
+LANGID_CORPUS_DIR = os.path.join(HERE, "langid_corpus")
+# Below this posterior probability the text is reported as DEFAULT_LANGUAGE
+LANGID_MIN_CONFIDENCE = float(os.getenv("LANGID_MIN_CONFIDENCE", 0.5))
+
+DEFAULT_LANGUAGE = "en"
+NGRAM_ORDERS = (1, 2, 3)
+NUM_BUCKETS = 1 << 14
+SMOOTHING = 0.5
+
+_WORD_RE = re.compile(r"[^\W\d_]+")
+# Per-position multipliers of the polynomial n-gram hash (fits in uint64 for code points < 2**21)
+_HASH_BASE = np.uint64(1000003)
+# Fibonacci hashing spreads the polynomial hash over the buckets
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_HASH_SHIFT = np.uint64(64 - NUM_BUCKETS.bit_length() + 1)
+
+
+def normalize(text: str) -> str:
+    """Lowercased words separated (and surrounded) by single spaces; digits and punctuation dropped."""
+    words = _WORD_RE.findall((text or "").lower())
+    return f" {' '.join(words)} " if words else ""
+
+
+def featurize(texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashed n-grams of many texts: ``(rows, buckets)``, one entry per n-gram.
+
+    ``rows`` gives the index of the text each n-gram came from and is
+    sorted, so the n-grams of one text are contiguous.
+    """
+    normalized = [normalize(text) for text in texts]
+    lengths = np.fromiter((len(text) for text in normalized), dtype=np.int64, count=len(normalized))
+    joined = "".join(normalized)
+    if not joined:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+    owner = np.repeat(np.arange(len(normalized)), lengths)
+
+    rows, buckets = [], []
+    for n in NGRAM_ORDERS:
+        count = len(codes) - n + 1
+        if count <= 0:
+            continue
+        # Only n-grams that do not cross from one text into the next
+        valid = owner[:count] == owner[n - 1:]
+        hashed = np.full(count, np.uint64(n))
+        for k in range(n):
+            hashed = hashed * _HASH_BASE + codes[k:k + count]
+        rows.append(owner[:count][valid])
+        buckets.append(((hashed[valid] * _HASH_MIX) >> _HASH_SHIFT).astype(np.int64))
+
+    rows = np.concatenate(rows)
+    order = np.argsort(rows, kind="stable")
+    return rows[order], np.concatenate(buckets)[order]
+
+
+class NgramLanguageIdentifier:
+    """Multinomial naive Bayes over hashed character n-grams."""
+
+    def __init__(self, languages: Sequence[str], table: np.ndarray,
+                 min_confidence: float = LANGID_MIN_CONFIDENCE, default: str = DEFAULT_LANGUAGE):
+        self.languages = list(languages)
+        self.table = np.ascontiguousarray(table, dtype=np.float32)   # (NUM_BUCKETS, languages)
+        self.min_confidence = min_confidence
+        self.default = default
+
+    @classmethod
+    def train(cls, corpora: Dict[str, str], **kwargs) -> "NgramLanguageIdentifier":
+        """Build the profile table from one sample text per language."""
+        languages = sorted(corpora)
+        table = np.empty((NUM_BUCKETS, len(languages)), dtype=np.float32)
+        for column, language in enumerate(languages):
+            _, buckets = featurize([corpora[language]])
+            counts = np.bincount(buckets, minlength=NUM_BUCKETS).astype(np.float64) + SMOOTHING
+            table[:, column] = np.log(counts / counts.sum())
+        return cls(languages, table, **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs) -> "NgramLanguageIdentifier":
+        with np.load(path) as data:
+            return cls([str(language) for language in data["languages"]], data["table"], **kwargs)
+
+    def save(self, path: str):
+        np.savez_compressed(path, languages=np.array(self.languages), table=self.table)
+
+    def probabilities(self, texts: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """Posterior per language for each text ``(len(texts), languages)``, and n-grams per text."""
+        rows, buckets = featurize(texts)
+        ngrams = np.bincount(rows, minlength=len(texts))
+        scores = np.zeros((len(texts), len(self.languages)), dtype=np.float64)
+        if len(rows):
+            # Sum each text's contiguous block of table rows
+            present = np.flatnonzero(ngrams)
+            starts = np.concatenate(([0], np.cumsum(ngrams[present])[:-1]))
+            scores[present] = np.add.reduceat(self.table[buckets], starts, axis=0)
+
+        scores -= scores.max(axis=1, keepdims=True)
+        posterior = np.exp(scores)
+        posterior /= posterior.sum(axis=1, keepdims=True)
+        return posterior, ngrams
+
+    def detect_batch(self, texts: Sequence[str]) -> List[Tuple[str, float]]:
+        """``(language, confidence)`` for each text.
+
+        Texts without letters, or whose best language is less likely than
+        ``min_confidence``, are reported as the default language.
+        """
+        if not texts:
+            return []
+        posterior, ngrams = self.probabilities(texts)
+        best = posterior.argmax(axis=1)
+        confidence = posterior[np.arange(len(texts)), best]
+
+        results = []
+        for column, score, count in zip(best.tolist(), confidence.tolist(), ngrams.tolist()):
+            if not count:
+                results.append((self.default, 0.0))
+            elif score < self.min_confidence:
+                results.append((self.default, round(score, 3)))
+            else:
+                results.append((self.languages[column], round(score, 3)))
+        return results
+
+    def detect(self, text: str) -> Tuple[str, float]:
+        return self.detect_batch([text])[0]
+
+
+def read_corpus(directory: str = LANGID_CORPUS_DIR) -> Dict[str, str]:
+    """``{language: sample text}`` from the ``<language>.txt`` files of ``directory``."""
+    corpora = {}
+    for name in sorted(os.listdir(directory)):
+        language, extension = os.path.splitext(name)
+        if extension == ".txt":
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                corpora[language] = f.read()
+    return corpora
+
+
+_identifier: Optional[NgramLanguageIdentifier] = None
+_lock = threading.Lock()
+
+
+def get_identifier() -> NgramLanguageIdentifier:
+    """Process-wide identifier, loaded from the precomputed table on first use.
+
+    Falls back to training from the corpus when the table file is missing.
+    """
+    global _identifier
+    if _identifier is None:
+        with _lock:
+            if _identifier is None:
+                if os.path.exists(LANGID_PROFILES):
+                    _identifier = NgramLanguageIdentifier.load(LANGID_PROFILES)
+                else:
+                    logger.warning(f"{LANGID_PROFILES} not found; building language profiles from the corpus")
+                    _identifier = NgramLanguageIdentifier.train(read_corpus())
+    return _identifier
+
+
+def detect(text: str) -> Tuple[str, float]:
+    return get_identifier().detect(text)
+
+
+def detect_batch(texts: Sequence[str]) -> List[Tuple[str, float]]:
+    return get_identifier().detect_batch(texts)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the language profile table or identify texts")
+    parser.add_argument("texts", nargs="+", help='"build" to rebuild the table, otherwise texts to identify')
+    args = parser.parse_args()
+
+    if args.texts == ["build"]:
+        corpora = read_corpus()
+        NgramLanguageIdentifier.train(corpora).save(LANGID_PROFILES)
+        logger.info(f"Wrote {LANGID_PROFILES}: {', '.join(corpora)}")
+    else:
+        for text, (language, confidence) in zip(args.texts, detect_batch(args.texts)):
+            print(f"{language}  {confidence:.3f}  {text}")
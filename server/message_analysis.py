@@ -0,0 +1,129 @@
+"""Stored AI analysis (sentiment + language) for chat messages.
+
+Analysis is computed once when a message is sent and kept in the
+``message_analysis`` side table (created by schema.py), so history fetches
+only read it back. Messages stored before the table existed are filled in
+by the backfill job at the bottom of this module:
+
+    python message_analysis.py --batch-size 200
+"""
+import argparse
+import logging
+
+from db import db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = 200
+
+UPSERT_SQL = """
+    INSERT INTO message_analysis (message_id, sentiment, sentiment_confidence, language)
+    VALUES (%s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        sentiment = VALUES(sentiment),
+        sentiment_confidence = VALUES(sentiment_confidence),
+        language = VALUES(language)
+"""
+
+# Columns to add to a chatmessage SELECT that LEFT JOINs message_analysis as ``ma``
+SELECT_COLUMNS = "ma.sentiment AS ai_sentiment, ma.sentiment_confidence AS ai_confidence, ma.language AS ai_language"
+
+
+def _row(message_id, sentiment, language):
+    return (
+        message_id,
+        sentiment.get('sentiment'),
+        sentiment.get('confidence'),
+        language
+    )
+
+
+def save_analysis(cursor, message_id, sentiment, language):
+    """Store the analysis for one message (caller commits)."""
+    cursor.execute(UPSERT_SQL, _row(message_id, sentiment, language))
+
+
+def save_analyses(cursor, rows):
+    """Store several ``(message_id, sentiment, language)`` results at once (caller commits)."""
+    cursor.executemany(UPSERT_SQL, [_row(*row) for row in rows])
+
+
+def pop_analysis(message):
+    """Move the joined ``ai_*`` columns of a fetched row into its ``ai_analysis`` dict.
+
+    Rows that have not been analysed yet get ``ai_analysis = None``.
+    """
+    sentiment = message.pop('ai_sentiment', None)
+    confidence = message.pop('ai_confidence', None)
+    language = message.pop('ai_language', None)
+
+    if sentiment is None and language is None:
+        message['ai_analysis'] = None
+    else:
+        message['ai_analysis'] = {
+            'sentiment': {'sentiment': sentiment, 'confidence': confidence},
+            'language': language
+        }
+    return message
+
+
+def backfill(conn, analyze_batch, batch_size=BACKFILL_BATCH_SIZE):
+    """Analyse every message that has no stored analysis yet.
+
+    ``analyze_batch(texts)`` must return one ``(sentiment, language)`` pair per
+    text, with sentiment None where no model answered; those messages are
+    not stored and stay pending for the next run. Rows are walked in
+    message_id order and committed per batch, so the job can be interrupted
+    and restarted at any time.
+    """
+    cursor = conn.cursor(dictionary=True)
+    last_id = ''
+    total = 0
+    try:
+        while True:
+            cursor.execute("""
+                SELECT cm.message_id, cm.message
+                FROM chatmessage cm
+                LEFT JOIN message_analysis ma ON ma.message_id = cm.message_id
+                WHERE ma.message_id IS NULL AND cm.message_id > %s
+                ORDER BY cm.message_id
+                LIMIT %s
+            """, (last_id, batch_size))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            results = analyze_batch([row['message'] or '' for row in rows])
+            analysed = [
+                (row['message_id'], sentiment, language)
+                for row, (sentiment, language) in zip(rows, results) if sentiment is not None
+            ]
+            if analysed:
+                save_analyses(cursor, analysed)
+                conn.commit()
+            if len(analysed) < len(rows):
+                logger.warning(f"{len(rows) - len(analysed)} messages left pending: no sentiment model answered")
+
+            last_id = rows[-1]['message_id']
+            total += len(analysed)
+            logger.info(f"Backfilled analysis for {total} messages")
+    finally:
+        cursor.close()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill stored AI analysis for legacy messages")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    from app import AIService
+
+    def analyze_batch(texts):
+        sentiments = AIService.analyze_sentiment_batch(texts, fallback=False)
+        return list(zip(sentiments, AIService.detect_language_batch(texts)))
+
+    with db_connection() as conn:
+        count = backfill(conn, analyze_batch, args.batch_size)
+    logger.info(f"Backfill complete: {count} messages analysed")
@@ -0,0 +1,176 @@
+"""Group commit for chat messages.
+
+Committing every message on its own makes each ``send_message`` pay a full
+transaction flush. ``MessageWriter`` instead collects the rows queued by
+concurrent senders for at most ``MESSAGE_WRITE_MAX_DELAY_MS`` (or until
+``MESSAGE_WRITE_BATCH_SIZE`` rows are waiting), inserts them with
+``executemany`` together with their images, chat summaries and search
+postings, and commits once. ``write`` returns only after the commit that contains its row, so a
+message is never emitted before it is durable.
+
+Rows of one batch share their second-precision ``timestamp``; they are
+inserted in queue order, so their AUTO_INCREMENT ``seq`` (see schema.py)
+keeps the order they were sent in, and readers sort by (timestamp, seq).
+
+If a batch fails, its rows are retried one transaction each so a single bad
+row (say, a chat that was deleted meanwhile) only fails its own sender.
+
+Writes are idempotent on ``message_id``: a message that is already stored
+is skipped, together with its image, summary and search updates, and
+``write`` returns False for it. A sender whose ``write`` timed out can
+therefore resend with the same id without duplicating a row that was
+committed after it gave up.
+
+Compare against per-message commits with ``python bench_message_writer.py``.
+"""
+import logging
+import os
+from typing import Any, Dict, List, Set
+
+import chat_summary
+import search_index
+from batching import MicroBatcher
+from db import db_connection
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_WRITE_BATCH_SIZE = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", 64))
+MESSAGE_WRITE_MAX_DELAY_MS = float(os.getenv("MESSAGE_WRITE_MAX_DELAY_MS", 5))
+MESSAGE_WRITE_TIMEOUT = float(os.getenv("MESSAGE_WRITE_TIMEOUT", 10))
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO chatmessage (message_id, chat_id, sender_id, receiver_id, message)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+INSERT_IMAGE_SQL = """
+    INSERT INTO ChatMessageImages (message_id, chat_id, sender_id, file_name, file_type, file_url, attachment_hash)
+    VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+
+def _stored_ids(cursor, message_ids: List[str]) -> Set[str]:
+    cursor.execute(
+        f"SELECT message_id FROM chatmessage WHERE message_id IN ({', '.join(['%s'] * len(message_ids))})",
+        tuple(message_ids)
+    )
+    return {row[0] for row in cursor.fetchall()}
+
+
+def write_messages(cursor, records: List[Dict[str, Any]]) -> List[bool]:
+    """Insert messages, their images, summary updates and search postings (caller commits).
+
+    Each record has message_id, chat_id, sender_id, receiver_id, message
+    and an optional ``image`` dict with attachment_id, file_name, file_type
+    (the file itself is already stored by attachments.py). Records whose
+    message_id is already stored, or repeated in ``records``, are skipped.
+    Returns whether each record was inserted.
+    """
+    if not records:
+        return []
+    seen = _stored_ids(cursor, [r['message_id'] for r in records])
+    inserted = []
+    for r in records:
+        inserted.append(r['message_id'] not in seen)
+        seen.add(r['message_id'])
+    records = [r for r, new in zip(records, inserted) if new]
+    if not records:
+        return inserted
+
+    rows = [
+        (r['message_id'], r['chat_id'], r['sender_id'], r['receiver_id'], r['message'])
+        for r in records
+    ]
+    cursor.executemany(INSERT_MESSAGE_SQL, rows)
+
+    images = [
+        (r['message_id'], r['chat_id'], r['sender_id'],
+         r['image']['file_name'], r['image']['file_type'],
+         f"/api/attachments/{r['image']['attachment_id']}", r['image']['attachment_id'])
+        for r in records if r.get('image')
+    ]
+    if images:
+        cursor.executemany(INSERT_IMAGE_SQL, images)
+
+    chat_summary.record_messages(cursor, [
+        (chat_id, message_id, message, sender_id, receiver_id)
+        for message_id, chat_id, sender_id, receiver_id, message in rows
+    ])
+    search_index.index_messages(cursor, [
+        (message_id, chat_id, message)
+        for message_id, chat_id, _, _, message in rows
+    ])
+    return inserted
+
+
+def commit_messages(conn, records: List[Dict[str, Any]]) -> List[bool]:
+    """Write ``records`` in one transaction, rolling back on failure; see write_messages."""
+    cursor = conn.cursor()
+    try:
+        inserted = write_messages(cursor, records)
+        conn.commit()
+        return inserted
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+class MessageWriter:
+    def __init__(self, connect=db_connection, max_batch_size=MESSAGE_WRITE_BATCH_SIZE,
+                 max_delay_ms=MESSAGE_WRITE_MAX_DELAY_MS, timeout=MESSAGE_WRITE_TIMEOUT):
+        self.connect = connect
+        self.timeout = timeout
+        self._batcher = MicroBatcher(self._flush, max_batch_size=max_batch_size,
+                                     max_wait_ms=max_delay_ms, name="message-writer")
+        self._retried_batches = 0
+        self._failed_rows = 0
+
+    def submit(self, record: Dict[str, Any]):
+        """Queue a message; the future resolves once its batch is committed.
+
+        The result is True if the row was inserted, False if its message_id
+        was already stored, or the exception that kept it from being written.
+        """
+        return self._batcher.submit(record)
+
+    def write(self, record: Dict[str, Any]) -> bool:
+        """Queue a message and block until it is committed; raises if it was not.
+
+        Returns False instead of inserting when a message with the same
+        message_id is already stored. On a timeout the row may still be
+        committed later; resend it with the same message_id.
+        """
+        result = self.submit(record).result(timeout=self.timeout)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def _flush(self, records):
+        with self.connect() as conn:
+            try:
+                return commit_messages(conn, records)
+            except Exception as e:
+                if len(records) == 1:
+                    self._failed_rows += 1
+                    return [e]
+                logger.warning(f"Message batch of {len(records)} failed, retrying rows one by one: {e}")
+
+            self._retried_batches += 1
+            results = []
+            for record in records:
+                try:
+                    results.extend(commit_messages(conn, [record]))
+                except Exception as e:
+                    self._failed_rows += 1
+                    results.append(e)
+            return results
+
+    def stats(self):
+        return dict(self._batcher.stats(),
+                    retried_batches=self._retried_batches,
+                    failed_rows=self._failed_rows)
+
+
+message_writer = MessageWriter()
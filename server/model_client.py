@@ -0,0 +1,122 @@
+"""Thin client for the shared model server (model_server.py).
+
+``RemoteBackend`` mirrors the ``inference.LocalBackend`` interface, but
+sends every operation over a keep-alive HTTP connection to the local model
+server. Errors and timeouts return ``None`` so that AIService falls back
+to its rule-based paths. After a connection failure the server is skipped
+for ``retry_after`` seconds, so chat traffic never waits on a dead server.
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", 30))
+MODEL_SERVER_CONNECT_TIMEOUT = float(os.getenv("MODEL_SERVER_CONNECT_TIMEOUT", 1))
+MODEL_SERVER_RETRY_AFTER = float(os.getenv("MODEL_SERVER_RETRY_AFTER", 5))
+MODEL_SERVER_POOL_SIZE = int(os.getenv("MODEL_SERVER_POOL_SIZE", 10))
+
+
+class RemoteBackend:
+    name = "remote"
+
+    def __init__(self, base_url: str, timeout: float = MODEL_SERVER_TIMEOUT,
+                 connect_timeout: float = MODEL_SERVER_CONNECT_TIMEOUT,
+                 retry_after: float = MODEL_SERVER_RETRY_AFTER, pool_size: int = MODEL_SERVER_POOL_SIZE):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.retry_after = retry_after
+
+        # One session per process: connections to the model server are reused
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+
+        self._lock = threading.Lock()
+        self._down_until = 0.0
+        self._calls = 0
+        self._failures = 0
+        self._skipped = 0
+        self._latency_total = 0.0
+
+    def _call(self, operation: str, payload: Dict) -> Optional[Any]:
+        if time.monotonic() < self._down_until:
+            with self._lock:
+                self._skipped += 1
+            return None
+
+        started = time.monotonic()
+        try:
+            response = self.session.post(
+                f"{self.base_url}/{operation}",
+                json=payload,
+                timeout=(self.connect_timeout, self.timeout)
+            )
+            if response.status_code != 200:
+                logger.error(f"Model server {operation} returned {response.status_code}: {response.text}")
+                result, failed = None, True
+            else:
+                result, failed = response.json().get("result"), False
+        except requests.exceptions.ConnectionError as e:
+            logger.error(f"Model server unreachable, using fallbacks for {self.retry_after}s: {e}")
+            self._down_until = time.monotonic() + self.retry_after
+            result, failed = None, True
+        except (requests.exceptions.RequestException, ValueError) as e:
+            logger.error(f"Model server {operation} failed: {e}")
+            result, failed = None, True
+
+        with self._lock:
+            self._calls += 1
+            self._failures += failed
+            self._latency_total += time.monotonic() - started
+        return result
+
+    def sentiment(self, text: str) -> Optional[Dict]:
+        return self._call("sentiment", {"text": text})
+
+    def sentiment_batch(self, texts: List[str]) -> Optional[List[Dict]]:
+        return self._call("sentiment_batch", {"texts": list(texts)})
+
+    def summarize(self, text: str, max_length: int = 100, min_length: int = 30) -> Optional[str]:
+        return self._call("summarize", {"text": text, "max_length": max_length, "min_length": min_length})
+
+    def count_tokens(self, texts: List[str]) -> Optional[List[int]]:
+        return self._call("count_tokens", {"texts": list(texts)})
+
+    def smart_reply(self, context: str, num_replies: int = 3,
+                    should_stop: Optional[Callable[[], bool]] = None) -> Optional[List[str]]:
+        # A request already sent cannot be interrupted; only skip superseded ones
+        if should_stop is not None and should_stop():
+            return None
+        return self._call("smart_reply", {"context": context, "num_replies": num_replies})
+
+    def detect_language(self, text: str) -> Optional[str]:
+        return self._call("detect_language", {"text": text})
+
+    def detect_language_batch(self, texts: List[str]) -> Optional[List[str]]:
+        return self._call("detect_language_batch", {"texts": list(texts)})
+
+    def translate(self, text: str, target_language: str) -> Optional[str]:
+        return self._call("translate", {"text": text, "target_language": target_language})
+
+    def translate_batch(self, texts: List[str], target_language: str) -> Optional[List[Optional[str]]]:
+        return self._call("translate_batch", {"texts": list(texts), "target_language": target_language})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = self._calls
+            return {
+                'backend': self.name,
+                'url': self.base_url,
+                'calls': calls,
+                'failures': self._failures,
+                'skipped_while_down': self._skipped,
+                'latency_avg_ms': round(self._latency_total / calls * 1000, 3) if calls else 0.0,
+            }
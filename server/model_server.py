@@ -0,0 +1,109 @@
+"""Shared local inference server.
+
+One process owns the transformer models and serves every gunicorn worker,
+so memory no longer grows with the worker count. Start it next to the web
+workers and point them at it:
+
+    python model_server.py --port 8765
+    MODEL_SERVER_URL=http://127.0.0.1:8765 gunicorn ...
+
+Every operation is ``POST /<operation>`` with a JSON body and answers
+``{"result": ...}``; ``GET /health`` reports model state.
+"""
+import argparse
+import json
+import logging
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from inference import LocalBackend
+from models import warm_configured_models
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+MODEL_SERVER_HOST = os.getenv("MODEL_SERVER_HOST", "127.0.0.1")
+MODEL_SERVER_PORT = int(os.getenv("MODEL_SERVER_PORT", 8765))
+
+backend = LocalBackend()
+
+OPERATIONS = {
+    "sentiment": lambda body: backend.sentiment(body["text"]),
+    "sentiment_batch": lambda body: backend.sentiment_batch(body["texts"]),
+    "summarize": lambda body: backend.summarize(body["text"], body.get("max_length", 100), body.get("min_length", 30)),
+    "count_tokens": lambda body: backend.count_tokens(body["texts"]),
+    "smart_reply": lambda body: backend.smart_reply(body["context"], body.get("num_replies", 3)),
+    "detect_language": lambda body: backend.detect_language(body["text"]),
+    "detect_language_batch": lambda body: backend.detect_language_batch(body["texts"]),
+    "translate": lambda body: backend.translate(body["text"], body["target_language"]),
+    "translate_batch": lambda body: backend.translate_batch(body["texts"], body["target_language"]),
+}
+
+
+class ModelRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 keeps client connections open between calls
+    protocol_version = "HTTP/1.1"
+    operations = OPERATIONS
+
+    def _send_json(self, status, body):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send_json(404, {"error": "Not found"})
+            return
+        self._send_json(200, {"status": "ok", **self.health()})
+
+    def health(self):
+        return backend.stats()
+
+    def do_POST(self):
+        operation = self.operations.get(self.path.strip("/"))
+        length = int(self.headers.get("Content-Length", 0))
+        raw = self.rfile.read(length) if length else b""
+
+        if operation is None:
+            self._send_json(404, {"error": f"Unknown operation: {self.path}"})
+            return
+
+        try:
+            body = json.loads(raw or b"{}")
+            result = operation(body)
+        except (KeyError, ValueError) as e:
+            self._send_json(400, {"error": f"Bad request: {e}"})
+            return
+        except Exception as e:
+            logger.error(f"{self.path} failed: {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+
+        self._send_json(200, {"result": result})
+
+    def log_message(self, format, *args):
+        logger.debug(format, *args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared model server for ChatApp workers")
+    parser.add_argument("--host", default=MODEL_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=MODEL_SERVER_PORT)
+    args = parser.parse_args()
+
+    warm_configured_models()
+    server = ThreadingHTTPServer((args.host, args.port), ModelRequestHandler)
+    logger.info(f"Model server listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""Process-wide registry of lazily loaded AI models.
+
+Nothing heavy is imported or loaded when the server starts. Each model is
+loaded the first time it is requested, exactly once per process, and then
+shared by every caller. Models can be disabled or warmed in the background
+through the environment:
+
+    AI_DISABLED_MODELS=summarizer,dialogpt   never load these
+    AI_WARM_MODELS=sentiment                 load these in the background at startup
+
+Translation models are registered per target language as ``translate-<lang>``
+(e.g. ``AI_WARM_MODELS=translate-es``).
+"""
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from batching import run_blocking
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+
+HF_API_KEY = os.getenv("HF_API_KEY")
+
+SENTIMENT_MODEL = "cardiffnlp/twitter-roberta-base-sentiment-latest"
+SUMMARIZER_MODEL = "facebook/bart-large-cnn"
+DIALOGPT_MODEL = "microsoft/DialoGPT-medium"
+
+# One MarianMT model per language pair (English source)
+TRANSLATION_MODELS = {
+    "es": "Helsinki-NLP/opus-mt-en-es",
+    "fr": "Helsinki-NLP/opus-mt-en-fr",
+    "de": "Helsinki-NLP/opus-mt-en-de",
+    "it": "Helsinki-NLP/opus-mt-en-it",
+    "pt": "Helsinki-NLP/opus-mt-en-pt"
+}
+
+
+def _env_list(name):
+    return [item.strip() for item in os.getenv(name, "").split(",") if item.strip()]
+
+
+class ModelRegistry:
+    """Load-on-first-use model holder.
+
+    ``get(name)`` returns the loaded model, or ``None`` when the model is
+    disabled or failed to load (callers then use their fallback paths). A
+    failed load is not retried, so a broken model costs one attempt per
+    process rather than one per request.
+    """
+
+    def __init__(self, disabled=None):
+        self._loaders: Dict[str, Callable[[], Any]] = {}
+        self._model_ids: Dict[str, str] = {}
+        self._versions: Dict[str, str] = {}
+        self._load_hooks = []
+        self._models: Dict[str, Any] = {}
+        self._failed: Dict[str, str] = {}
+        self._load_seconds: Dict[str, float] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._logged_in = False
+        self.disabled = set(disabled or [])
+
+    def register(self, name: str, loader: Callable[[], Any], model_id: Optional[str] = None):
+        with self._lock:
+            self._loaders[name] = loader
+            self._model_ids[name] = model_id or name
+            self._locks.setdefault(name, threading.Lock())
+
+    def model_id(self, name: str) -> str:
+        return self._model_ids.get(name, name)
+
+    def version(self, name: str) -> Optional[str]:
+        """Revision of the loaded weights (hub commit hash when known)."""
+        return self._versions.get(name)
+
+    def on_load(self, hook: Callable[[str, str], None]):
+        """Call ``hook(name, version)`` whenever a model finishes loading."""
+        self._load_hooks.append(hook)
+
+    def enabled(self, name: str) -> bool:
+        return name in self._loaders and name not in self.disabled
+
+    def available(self, name: str) -> bool:
+        """True unless the model is disabled or already failed to load (never triggers a load)."""
+        return self.enabled(name) and name not in self._failed
+
+    def loaded(self, name: str) -> bool:
+        return name in self._models
+
+    def _hf_login(self):
+        if self._logged_in or not HF_API_KEY:
+            return
+        from huggingface_hub import login
+        login(HF_API_KEY)
+        self._logged_in = True
+
+    def get(self, name: str) -> Optional[Any]:
+        if name in self._models:
+            return self._models[name]
+        if not self.available(name):
+            return None
+
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            if name in self._failed:
+                return None
+
+            logger.info(f"Loading model '{name}'...")
+            started = time.monotonic()
+            try:
+                self._hf_login()
+                model = run_blocking(self._loaders[name])
+            except Exception as e:
+                logger.warning(f"Failed to load model '{name}': {e}")
+                self._failed[name] = str(e)
+                return None
+
+            self._load_seconds[name] = round(time.monotonic() - started, 2)
+            self._versions[name] = _model_revision(model)
+            self._models[name] = model
+            logger.info(f"Model '{name}' loaded in {self._load_seconds[name]}s")
+
+        for hook in self._load_hooks:
+            try:
+                hook(name, self._versions[name])
+            except Exception as e:
+                logger.error(f"Model load hook failed for '{name}': {e}")
+        return model
+
+    def warm(self, names):
+        """Load the given models on a background thread."""
+        names = [name for name in names if self.enabled(name)]
+        if not names:
+            return None
+
+        def _warm():
+            for name in names:
+                self.get(name)
+
+        thread = threading.Thread(target=_warm, name="model-warmup", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            name: {
+                'state': ('disabled' if name in self.disabled else
+                          'loaded' if name in self._models else
+                          'failed' if name in self._failed else 'not_loaded'),
+                'load_seconds': self._load_seconds.get(name),
+                'version': self._versions.get(name),
+                'error': self._failed.get(name),
+            }
+            for name in self._loaders
+        }
+
+
+def _model_revision(model) -> str:
+    """Best-effort revision of a pipeline or (tokenizer, model) pair."""
+    if isinstance(model, tuple):
+        model = model[-1]
+    config = getattr(getattr(model, "model", model), "config", None)
+    return str(getattr(config, "_commit_hash", None) or getattr(config, "_name_or_path", None) or "loaded")
+
+
+def _load_sentiment():
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL, device=-1)
+
+
+def _load_summarizer():
+    from transformers import pipeline
+    return pipeline("summarization", model=SUMMARIZER_MODEL, device=-1)
+
+
+def _load_dialogpt():
+    from transformers import AutoModelForCausalLM, AutoTokenizer
+    tokenizer = AutoTokenizer.from_pretrained(DIALOGPT_MODEL)
+    model = AutoModelForCausalLM.from_pretrained(DIALOGPT_MODEL)
+    return tokenizer, model
+
+
+def _marian_loader(model_id):
+    def _load_marian():
+        from transformers import MarianMTModel, MarianTokenizer
+        tokenizer = MarianTokenizer.from_pretrained(model_id)
+        model = MarianMTModel.from_pretrained(model_id)
+        model.eval()
+        return tokenizer, model
+    return _load_marian
+
+
+def translation_model(target_language: str) -> str:
+    """Registry name of the translation model for ``target_language``."""
+    return f"translate-{target_language}"
+
+
+registry = ModelRegistry(disabled=_env_list("AI_DISABLED_MODELS"))
+registry.register("sentiment", _load_sentiment, SENTIMENT_MODEL)
+registry.register("summarizer", _load_summarizer, SUMMARIZER_MODEL)
+registry.register("dialogpt", _load_dialogpt, DIALOGPT_MODEL)
+for _language, _model_id in TRANSLATION_MODELS.items():
+    registry.register(translation_model(_language), _marian_loader(_model_id), _model_id)
+
+
+def warm_configured_models():
+    """Start background loading of the models listed in AI_WARM_MODELS."""
+    return registry.warm(_env_list("AI_WARM_MODELS"))
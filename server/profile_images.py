@@ -0,0 +1,132 @@
+"""Profile images served as cacheable, content-addressed resources.
+
+The image bytes stay in ``users.profile_image``; ``users.profile_image_hash``
+holds their SHA-256. JSON responses only carry the hash and the URL
+``/api/profile-images/<hash>``. Because a hash always names the same bytes,
+the endpoint can answer ``If-None-Match`` without touching the database and
+lets clients cache for a year. On first request the BLOB is written to
+``PROFILE_IMAGE_DIR/<hash>`` so later responses are sent straight from the
+file (``sendfile`` under gunicorn/eventlet).
+
+Run ``python profile_images.py`` once after the migration to hash images of
+existing users.
+"""
+import argparse
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from typing import Optional
+
+from flask import url_for
+
+from db import db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PROFILE_IMAGE_DIR = os.getenv("PROFILE_IMAGE_DIR", os.path.join("static", "profile_images"))
+PROFILE_IMAGE_MAX_AGE = int(os.getenv("PROFILE_IMAGE_MAX_AGE", 365 * 24 * 3600))
+BACKFILL_BATCH_SIZE = 100
+
+HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# Leading bytes -> mimetype for the formats the upload form accepts
+SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"RIFF", "image/webp"),
+]
+
+
+def image_hash(data: Optional[bytes]) -> Optional[str]:
+    return hashlib.sha256(data).hexdigest() if data else None
+
+
+def image_url(hash_value: Optional[str]) -> Optional[str]:
+    """Absolute URL of a profile image (needs a request or app context)"""
+    if not hash_value:
+        return None
+    return url_for('get_profile_image', image_hash=hash_value, _external=True)
+
+
+def guess_mimetype(head: bytes) -> str:
+    for signature, mimetype in SIGNATURES:
+        if head.startswith(signature):
+            return mimetype
+    return "application/octet-stream"
+
+
+def _image_path(hash_value: str) -> str:
+    return os.path.join(PROFILE_IMAGE_DIR, hash_value[:2], hash_value)
+
+
+def cached_image_path(connection, hash_value: str) -> Optional[str]:
+    """Path of the image file for ``hash_value``, materialising it from the database if needed"""
+    path = _image_path(hash_value)
+    if os.path.exists(path):
+        return path
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(
+            "SELECT profile_image FROM users WHERE profile_image_hash = %s LIMIT 1",
+            (hash_value,)
+        )
+        row = cursor.fetchone()
+    finally:
+        cursor.close()
+    if not row or not row[0]:
+        return None
+
+    data = bytes(row[0])
+    if image_hash(data) != hash_value:
+        logger.warning(f"Profile image {hash_value} no longer matches its hash")
+        return None
+
+    # Write then rename so concurrent requests never see a partial file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return path
+
+
+def backfill(conn, batch_size=BACKFILL_BATCH_SIZE):
+    """Hash every stored profile image that has no hash yet."""
+    cursor = conn.cursor()
+    total = 0
+    try:
+        while True:
+            cursor.execute("""
+                SELECT user_id, profile_image FROM users
+                WHERE LENGTH(profile_image) > 0 AND profile_image_hash IS NULL
+                LIMIT %s
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            cursor.executemany(
+                "UPDATE users SET profile_image_hash = %s WHERE user_id = %s",
+                [(image_hash(bytes(data)), user_id) for user_id, data in rows]
+            )
+            conn.commit()
+            total += len(rows)
+            logger.info(f"Hashed {total} profile images")
+    finally:
+        cursor.close()
+    return total
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Hash profile images of existing users")
+    parser.add_argument('--batch-size', type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        count = backfill(conn, args.batch_size)
+    logger.info(f"Backfill complete: {count} profile images hashed")
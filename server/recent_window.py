@@ -0,0 +1,86 @@
+"""Compact per-chat window of recent messages for the AI features.
+
+``MessageRecord`` keeps only the fields smart replies, summaries and
+annotations use, in ``__slots__`` instead of a per-message dict.
+``MessageRing`` is a fixed-capacity ring buffer of records: appends
+overwrite the oldest slot in O(1) and never reallocate, and reads copy out
+only the newest ``limit`` records.
+"""
+from typing import Dict, Iterable, List, Optional
+
+RECORD_FIELDS = ('message_id', 'sender_id', 'sender_email', 'receiver_id', 'message', 'timestamp', 'ai_analysis')
+
+
+class MessageRecord:
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, message_id=None, sender_id=None, sender_email=None, receiver_id=None,
+                 message=None, timestamp=None, ai_analysis=None):
+        self.message_id = message_id
+        self.sender_id = sender_id
+        self.sender_email = sender_email
+        self.receiver_id = receiver_id
+        self.message = message
+        self.timestamp = timestamp
+        self.ai_analysis = ai_analysis
+
+    @classmethod
+    def from_dict(cls, message: Dict) -> "MessageRecord":
+        """Keep the window fields of a message dict (fetched row or socket payload)."""
+        return cls(*(message.get(field) for field in RECORD_FIELDS))
+
+    def to_dict(self) -> Dict:
+        return {field: getattr(self, field) for field in RECORD_FIELDS}
+
+    def update(self, fields: Dict):
+        for field, value in fields.items():
+            if field in RECORD_FIELDS:
+                setattr(self, field, value)
+
+
+class MessageRing:
+    """Fixed-capacity ring of ``MessageRecord``; the oldest record is overwritten when full."""
+    __slots__ = ('_slots', '_start', '_count')
+
+    def __init__(self, capacity: int):
+        self._slots: List[Optional[MessageRecord]] = [None] * max(1, capacity)
+        self._start = 0
+        self._count = 0
+
+    @property
+    def capacity(self) -> int:
+        return len(self._slots)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def append(self, record: MessageRecord):
+        capacity = len(self._slots)
+        self._slots[(self._start + self._count) % capacity] = record
+        if self._count < capacity:
+            self._count += 1
+        else:
+            self._start = (self._start + 1) % capacity
+
+    def replace(self, records: Iterable[MessageRecord]):
+        """Reset the ring to ``records`` (oldest first); only the newest ``capacity`` are kept."""
+        self._slots = [None] * len(self._slots)
+        self._start = self._count = 0
+        for record in records:
+            self.append(record)
+
+    def latest(self, limit: Optional[int] = None) -> List[MessageRecord]:
+        """The newest ``limit`` records (all if None), oldest first."""
+        count = self._count if not limit else min(limit, self._count)
+        capacity = len(self._slots)
+        first = self._start + self._count - count
+        return [self._slots[(first + i) % capacity] for i in range(count)]
+
+    def find(self, message_id: str) -> Optional[MessageRecord]:
+        """Newest record with ``message_id``, searching from the newest."""
+        capacity = len(self._slots)
+        for i in range(self._count - 1, -1, -1):
+            record = self._slots[(self._start + i) % capacity]
+            if record.message_id == message_id:
+                return record
+        return None
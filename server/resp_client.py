@@ -0,0 +1,161 @@
+"""Minimal Redis-protocol (RESP2) client.
+
+Covers the handful of commands the shared cache, presence store and
+pub/sub backplane need, without adding a dependency. Works against Redis
+or any server speaking RESP2 (KeyDB, Dragonfly, a local test stand-in).
+Commands borrow a connection from a small shared pool (not one per thread:
+under eventlet every greenlet is a thread), and are retried once on a
+fresh connection when the link dropped.
+"""
+import os
+import queue
+import socket
+import threading
+from urllib.parse import urlparse
+
+
+RESP_POOL_SIZE = int(os.getenv("RESP_POOL_SIZE", 8))
+RESP_POOL_TIMEOUT = float(os.getenv("RESP_POOL_TIMEOUT", 5))
+
+
+class RespError(Exception):
+    """Error reply from the server."""
+
+
+def encode_command(*args):
+    out = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode("utf-8")
+        out.append(b"$%d\r\n%s\r\n" % (len(data), data))
+    return b"".join(out)
+
+
+class RespConnection:
+    def __init__(self, host, port, db=0, password=None, timeout=1.0):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile("rb")
+        if password:
+            self.execute("AUTH", password)
+        if db:
+            self.execute("SELECT", db)
+
+    def send(self, *args):
+        self.sock.sendall(encode_command(*args))
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError("Connection closed by server")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b"+":
+            return rest.decode("utf-8")
+        if kind == b"-":
+            raise RespError(rest.decode("utf-8"))
+        if kind == b":":
+            return int(rest)
+        if kind == b"$":
+            length = int(rest)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            count = int(rest)
+            if count == -1:
+                return None
+            return [self.read_reply() for _ in range(count)]
+        raise RespError(f"Unknown reply type: {line!r}")
+
+    def execute(self, *args):
+        self.send(*args)
+        return self.read_reply()
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RespClient:
+    """Thread-safe command client; ``url`` looks like ``redis://[:password@]host:port/db``."""
+
+    def __init__(self, url, timeout=1.0, pool_size=RESP_POOL_SIZE, pool_timeout=RESP_POOL_TIMEOUT):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or "127.0.0.1"
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.strip("/") or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.pool_timeout = pool_timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def connect(self, timeout=-1):
+        """Open a new dedicated connection (e.g. ``timeout=None`` for a pub/sub subscriber)."""
+        timeout = self.timeout if timeout == -1 else timeout
+        return RespConnection(self.host, self.port, self.db, self.password, timeout)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            create = self._created < self.pool_size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self.connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+        try:
+            return self._idle.get(timeout=self.pool_timeout)
+        except queue.Empty:
+            raise ConnectionError(f"No RESP connection free within {self.pool_timeout}s")
+
+    def _discard(self, conn):
+        conn.close()
+        with self._lock:
+            self._created -= 1
+
+    def _execute_once(self, *args):
+        conn = self._acquire()
+        try:
+            result = conn.execute(*args)
+        except RespError:
+            # An error reply leaves the connection usable
+            self._idle.put(conn)
+            raise
+        except BaseException:
+            self._discard(conn)
+            raise
+        self._idle.put(conn)
+        return result
+
+    def execute(self, *args):
+        try:
+            return self._execute_once(*args)
+        except (ConnectionError, OSError):
+            # One retry on a fresh connection
+            self._drop()
+            return self._execute_once(*args)
+
+    def _drop(self):
+        """Close the idle connections; they may have been cut by the same failure."""
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(conn)
@@ -0,0 +1,221 @@
+"""Minimal Redis-protocol server for local development, tests and benchmarks.
+
+Implements only the commands ChatApp uses (strings with expiry, sets,
+lists and pub/sub) in memory, so the shared cache, session store and
+Socket.IO backplane can be exercised without installing Redis:
+
+    python resp_server.py --port 6390
+    SOCKETIO_MESSAGE_QUEUE=redis://127.0.0.1:6390 python app.py
+
+Not meant for production: there is no persistence and no eviction.
+"""
+import argparse
+import logging
+import socketserver
+import threading
+import time
+
+from resp_client import encode_command
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _bulk(value):
+    if value is None:
+        return b"$-1\r\n"
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _array(values):
+    return b"*%d\r\n" % len(values) + b"".join(_bulk(value) for value in values)
+
+
+def _int(value):
+    return b":%d\r\n" % value
+
+
+def _range(items, start, stop):
+    count = len(items)
+    start = start + count if start < 0 else start
+    stop = stop + count if stop < 0 else stop
+    return items[max(start, 0):stop + 1]
+
+
+class RespStore:
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+        self.subscribers = {}  # channel -> set of handlers
+        self.lock = threading.Lock()
+
+    def _get(self, key):
+        expires_at = self.expires.get(key)
+        if expires_at is not None and expires_at < time.monotonic():
+            self.data.pop(key, None)
+            self.expires.pop(key, None)
+        return self.data.get(key)
+
+    def execute(self, command, args):
+        with self.lock:
+            return self._execute(command, args)
+
+    def _execute(self, command, args):
+        if command == "PING":
+            return b"+PONG\r\n"
+        if command in ("AUTH", "SELECT"):
+            return b"+OK\r\n"
+        if command == "GET":
+            return _bulk(self._get(args[0]))
+        if command == "SET":
+            key, value = args[0], args[1]
+            self.data[key] = value
+            self.expires.pop(key, None)
+            if len(args) >= 4 and args[2].upper() == b"EX":
+                self.expires[key] = time.monotonic() + int(args[3])
+            return b"+OK\r\n"
+        if command == "DEL":
+            removed = 0
+            for key in args:
+                removed += self.data.pop(key, None) is not None
+                self.expires.pop(key, None)
+            return _int(removed)
+        if command == "EXPIRE":
+            if self._get(args[0]) is None:
+                return _int(0)
+            self.expires[args[0]] = time.monotonic() + int(args[1])
+            return _int(1)
+        if command == "SADD":
+            members = self._get(args[0])
+            if members is None:
+                members = self.data[args[0]] = set()
+            before = len(members)
+            members.update(args[1:])
+            return _int(len(members) - before)
+        if command == "SREM":
+            members = self._get(args[0]) or set()
+            before = len(members)
+            members.difference_update(args[1:])
+            return _int(before - len(members))
+        if command == "SMEMBERS":
+            return _array(sorted(self._get(args[0]) or ()))
+        if command == "RPUSH":
+            items = self._get(args[0])
+            if items is None:
+                items = self.data[args[0]] = []
+            items.extend(args[1:])
+            return _int(len(items))
+        if command == "RPUSHX":
+            items = self._get(args[0])
+            if items is None:
+                return _int(0)
+            items.extend(args[1:])
+            return _int(len(items))
+        if command == "LTRIM":
+            self.data[args[0]] = _range(self._get(args[0]) or [], int(args[1]), int(args[2]))
+            return b"+OK\r\n"
+        if command == "LRANGE":
+            return _array(_range(self._get(args[0]) or [], int(args[1]), int(args[2])))
+        if command == "LSET":
+            items = self._get(args[0])
+            if items is None:
+                return b"-ERR no such key\r\n"
+            try:
+                items[int(args[1])] = args[2]
+            except IndexError:
+                return b"-ERR index out of range\r\n"
+            return b"+OK\r\n"
+        if command == "PUBLISH":
+            handlers = list(self.subscribers.get(args[0], ()))
+            message = encode_command(b"message", args[0], args[1])
+            for handler in handlers:
+                handler.deliver(message)
+            return _int(len(handlers))
+        return b"-ERR unknown command '%s'\r\n" % command.encode("utf-8")
+
+
+class RespRequestHandler(socketserver.StreamRequestHandler):
+    def setup(self):
+        super().setup()
+        self.write_lock = threading.Lock()
+        self.channels = set()
+
+    def deliver(self, data):
+        try:
+            with self.write_lock:
+                self.wfile.write(data)
+        except OSError:
+            pass
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b"*"):
+            return line.split()  # inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        store = self.server.store
+        try:
+            while True:
+                args = self.read_command()
+                if args is None:
+                    break
+                if not args:
+                    continue
+                command = args[0].decode("utf-8").upper()
+                if command == "SUBSCRIBE":
+                    for channel in args[1:]:
+                        with store.lock:
+                            store.subscribers.setdefault(channel, set()).add(self)
+                        self.channels.add(channel)
+                        self.deliver(b"*3\r\n" + _bulk(b"subscribe") + _bulk(channel) + _int(len(self.channels)))
+                    continue
+                self.deliver(store.execute(command, args[1:]))
+        except (OSError, ValueError):
+            pass
+        finally:
+            with store.lock:
+                for channel in self.channels:
+                    store.subscribers.get(channel, set()).discard(self)
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address):
+        super().__init__(address, RespRequestHandler)
+        self.store = RespStore()
+
+
+def start_background(host="127.0.0.1", port=0):
+    """Start a server on a daemon thread and return it (``server.server_address`` has the port)."""
+    server = RespServer((host, port))
+    threading.Thread(target=server.serve_forever, name="resp-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory Redis-protocol stand-in for development")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+
+    server = RespServer((args.host, args.port))
+    logger.info(f"RESP stand-in listening on redis://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
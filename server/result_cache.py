@@ -0,0 +1,195 @@
+"""Content-addressed cache for AI results (translate, enhance, sentiment, summarize).
+
+Keys are a SHA-256 of (operation, model, model version, parameters, text),
+so identical requests share one result no matter who sends them. The
+in-process tier is an LRU bounded by entry count and approximate size,
+with a TTL. An optional shared tier (any Redis-protocol server, set via
+RESULT_CACHE_REDIS_URL) lets several worker processes share results.
+Changing a model's version makes its old entries unreachable.
+"""
+import collections
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from resp_client import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 10000))
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+RESULT_CACHE_TTL = float(os.getenv("RESULT_CACHE_TTL", 24 * 3600))
+RESULT_CACHE_REDIS_URL = os.getenv("RESULT_CACHE_REDIS_URL")
+# Explicit versions for remote models, e.g. "facebook/bart-large-cnn=2,Helsinki-NLP/opus-mt-en-es=3"
+AI_MODEL_VERSIONS = os.getenv("AI_MODEL_VERSIONS", "")
+SHARED_KEY_PREFIX = "chatapp:result:"
+
+
+class SharedTier:
+    """Shared cache tier on a Redis-protocol server; errors are logged and treated as misses."""
+
+    def __init__(self, url, ttl=RESULT_CACHE_TTL):
+        self.client = RespClient(url)
+        self.ttl = ttl
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.client.execute("GET", SHARED_KEY_PREFIX + key)
+        except (RespError, OSError) as e:
+            logger.warning(f"Shared result cache GET failed: {e}")
+            return None
+
+    def set(self, key: str, data: bytes):
+        try:
+            self.client.execute("SET", SHARED_KEY_PREFIX + key, data, "EX", max(1, int(self.ttl)))
+        except (RespError, OSError) as e:
+            logger.warning(f"Shared result cache SET failed: {e}")
+
+
+class ResultCache:
+    def __init__(self, max_entries=RESULT_CACHE_MAX_ENTRIES, max_bytes=RESULT_CACHE_MAX_BYTES,
+                 ttl=RESULT_CACHE_TTL, shared: Optional[SharedTier] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.shared = shared
+
+        # key -> (value, size, expires_at, model)
+        self._entries = collections.OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._model_versions: Dict[str, str] = {}
+
+        self._hits = 0
+        self._shared_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    def model_version(self, model: str) -> str:
+        return self._model_versions.get(model, "default")
+
+    def set_model_version(self, model: str, version: str):
+        """Record a model's version; entries cached for an older version are dropped."""
+        version = str(version)
+        with self._lock:
+            if self._model_versions.get(model) == version:
+                return
+            self._model_versions[model] = version
+            stale = [key for key, entry in self._entries.items() if entry[3] == model]
+            for key in stale:
+                self._remove(key)
+        if stale:
+            logger.info(f"Result cache: {len(stale)} entries for {model} invalidated (version {version})")
+
+    def make_key(self, operation: str, model: str, params: Optional[Dict], text: str) -> str:
+        raw = json.dumps([operation, model, self.model_version(model), params or {}, text],
+                         sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _remove(self, key):
+        _, size, _, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _get_local(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                self._remove(key)
+                self._expirations += 1
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _put_local(self, key, value, size, model):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, time.monotonic() + self.ttl, model)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self._evictions += 1
+
+    def get(self, operation: str, model: str, params: Optional[Dict], text: str) -> Any:
+        """Cached result or ``None`` (counts as a hit or a miss)."""
+        key = self.make_key(operation, model, params, text)
+
+        entry = self._get_local(key)
+        if entry is not None:
+            with self._lock:
+                self._hits += 1
+            return entry[0]
+
+        if self.shared is not None:
+            data = self.shared.get(key)
+            if data is not None:
+                value = json.loads(data)
+                self._put_local(key, value, len(data) + len(key), model)
+                with self._lock:
+                    self._shared_hits += 1
+                return value
+
+        with self._lock:
+            self._misses += 1
+        return None
+
+    def put(self, operation: str, model: str, params: Optional[Dict], text: str, value: Any):
+        if value is None:
+            return
+        key = self.make_key(operation, model, params, text)
+        data = json.dumps(value).encode("utf-8")
+        self._put_local(key, value, len(data) + len(key), model)
+        if self.shared is not None:
+            self.shared.set(key, data)
+
+    def get_or_compute(self, operation: str, model: str, params: Optional[Dict], text: str,
+                       compute: Callable[[], Any]) -> Any:
+        """Return the cached result, or compute and cache it.
+
+        ``compute`` returning ``None`` means "no result" (e.g. the model
+        failed); that is never cached, so callers keep their fallbacks.
+        """
+        value = self.get(operation, model, params, text)
+        if value is None:
+            value = compute()
+            self.put(operation, model, params, text, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._shared_hits + self._misses
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_entries': self.max_entries,
+                'max_bytes': self.max_bytes,
+                'ttl_seconds': self.ttl,
+                'shared_tier': self.shared is not None,
+                'hits': self._hits,
+                'shared_hits': self._shared_hits,
+                'misses': self._misses,
+                'hit_rate': round((self._hits + self._shared_hits) / lookups, 3) if lookups else 0.0,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'model_versions': dict(self._model_versions),
+            }
+
+
+result_cache = ResultCache(shared=SharedTier(RESULT_CACHE_REDIS_URL) if RESULT_CACHE_REDIS_URL else None)
+for _pair in filter(None, (item.strip() for item in AI_MODEL_VERSIONS.split(","))):
+    _model, _, _version = _pair.rpartition("=")
+    result_cache.set_model_version(_model, _version)
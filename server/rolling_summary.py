@@ -0,0 +1,201 @@
+"""Per-chat running summaries, updated incrementally from checkpoints.
+
+``chat_rolling_summary`` stores each chat's current summary and the last
+message it covers. When a summary is requested, only messages after that
+checkpoint are read (keyset on ``idx_chatmessage_chat_ts_seq``), in chunks
+sized for the summarizer. Each chunk is summarized together with the
+summary so far, and the checkpoint is saved after every chunk. A long chat
+is therefore covered from its first message. Work that is interrupted
+resumes where it stopped.
+
+When a chat has no new messages, which is known from ``chat_summary``, the
+stored summary is returned without reading messages or running a model.
+
+Bring every chat's summary up to date with ``python rolling_summary.py``.
+"""
+import argparse
+import logging
+import os
+import threading
+import zlib
+from typing import Callable, Dict, List, Optional
+
+from db import db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Characters of summary + new conversation per model call (BART runs locally below 1024)
+ROLLING_SUMMARY_INPUT_CHARS = int(os.getenv("ROLLING_SUMMARY_INPUT_CHARS", 1000))
+# Model calls per request; a chat further behind continues on the next request
+ROLLING_SUMMARY_MAX_CHUNKS = int(os.getenv("ROLLING_SUMMARY_MAX_CHUNKS", 20))
+FETCH_SIZE = 200
+MIN_MESSAGES = 3
+MIN_NEW_TEXT_CHARS = 300
+
+TOO_SHORT = "Conversation too short to summarize"
+UNAVAILABLE = "Unable to generate summary"
+
+CHECKPOINT_SQL = """
+    SELECT s.last_message_id AS chat_last_message_id,
+           r.summary, r.last_message_id, r.last_timestamp, r.messages_covered
+    FROM chat_summary s
+    LEFT JOIN chat_rolling_summary r ON r.chat_id = s.chat_id
+    WHERE s.chat_id = %s
+"""
+
+NEW_MESSAGES_SQL = """
+    SELECT cm.message_id, cm.timestamp, cm.message, u.email AS sender_email
+    FROM chatmessage cm
+    JOIN users u ON cm.sender_id = u.user_id
+    WHERE cm.chat_id = %s
+      AND (cm.timestamp > %s OR (cm.timestamp = %s AND cm.seq > (SELECT seq FROM chatmessage WHERE message_id = %s)))
+    ORDER BY cm.timestamp ASC, cm.seq ASC
+    LIMIT %s
+"""
+
+FIRST_MESSAGES_SQL = """
+    SELECT cm.message_id, cm.timestamp, cm.message, u.email AS sender_email
+    FROM chatmessage cm
+    JOIN users u ON cm.sender_id = u.user_id
+    WHERE cm.chat_id = %s
+    ORDER BY cm.timestamp ASC, cm.seq ASC
+    LIMIT %s
+"""
+
+SAVE_SQL = """
+    INSERT INTO chat_rolling_summary (chat_id, summary, last_message_id, last_timestamp, messages_covered)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        summary = VALUES(summary),
+        last_message_id = VALUES(last_message_id),
+        last_timestamp = VALUES(last_timestamp),
+        messages_covered = VALUES(messages_covered)
+"""
+
+# Requests for the same chat in one process take turns instead of summarizing twice
+_LOCKS = [threading.Lock() for _ in range(64)]
+
+
+def _lock(chat_id: str) -> threading.Lock:
+    return _LOCKS[zlib.crc32(chat_id.encode("utf-8")) % len(_LOCKS)]
+
+
+def _line(message: Dict) -> str:
+    return f"{message['sender_email'] or 'User'}: {message['message'] or ''}"
+
+
+def _fetch_new(cursor, chat_id: str, checkpoint: Dict, limit: int) -> List[Dict]:
+    if checkpoint['last_message_id'] is None:
+        cursor.execute(FIRST_MESSAGES_SQL, (chat_id, limit))
+    else:
+        last_timestamp = checkpoint['last_timestamp']
+        cursor.execute(NEW_MESSAGES_SQL, (chat_id, last_timestamp, last_timestamp, checkpoint['last_message_id'], limit))
+    return cursor.fetchall()
+
+
+def _chunks(summary: str, messages: List[Dict]):
+    """Split ``messages`` so each chunk's text plus the summary fits one model call."""
+    budget = max(MIN_NEW_TEXT_CHARS, ROLLING_SUMMARY_INPUT_CHARS - len(summary) - 1)
+    chunk, size = [], 0
+    for message in messages:
+        length = len(_line(message)) + 1
+        if chunk and size + length > budget:
+            yield chunk
+            chunk, size = [], 0
+        chunk.append(message)
+        size += length
+    if chunk:
+        yield chunk
+
+
+def update(connection, chat_id: str, summarize: Callable[[str], Optional[str]],
+           max_chunks: int = ROLLING_SUMMARY_MAX_CHUNKS) -> Optional[str]:
+    """Bring the chat's summary up to date and return it.
+
+    ``summarize(text)`` condenses the previous summary followed by the new
+    conversation text, or returns None when no model answered. The update
+    then stops without moving the checkpoint, so the chunk is summarized
+    again next time, and the summary saved so far (or ``UNAVAILABLE``) is
+    returned. Returns ``TOO_SHORT`` for chats with fewer than three
+    messages, and None for unknown chats.
+    """
+    with _lock(chat_id):
+        cursor = connection.cursor(dictionary=True, buffered=True)
+        try:
+            cursor.execute(CHECKPOINT_SQL, (chat_id,))
+            checkpoint = cursor.fetchone()
+            if checkpoint is None:
+                return None
+            if checkpoint['summary'] is not None and checkpoint['last_message_id'] == checkpoint['chat_last_message_id']:
+                return checkpoint['summary']
+
+            summary = checkpoint['summary'] or ""
+            covered = checkpoint['messages_covered'] or 0
+            chunks_done = 0
+            while chunks_done < max_chunks:
+                messages = _fetch_new(cursor, chat_id, checkpoint, FETCH_SIZE)
+                if not messages:
+                    break
+                if not covered and len(messages) < MIN_MESSAGES:
+                    return TOO_SHORT
+
+                for chunk in _chunks(summary, messages):
+                    text = " ".join([summary] + [_line(message) for message in chunk]).strip()
+                    condensed = summarize(text)
+                    if condensed is None:
+                        logger.warning(f"Rolling summary for {chat_id} stopped after {covered} messages: "
+                                       "no summarizer answered")
+                        return summary or UNAVAILABLE
+                    summary = condensed
+                    covered += len(chunk)
+                    last = chunk[-1]
+                    checkpoint['last_message_id'] = last['message_id']
+                    checkpoint['last_timestamp'] = last['timestamp']
+                    cursor.execute(SAVE_SQL, (chat_id, summary, last['message_id'], last['timestamp'], covered))
+                    connection.commit()
+
+                    chunks_done += 1
+                    if chunks_done >= max_chunks:
+                        logger.info(f"Rolling summary for {chat_id} paused after {covered} messages")
+                        break
+                if len(messages) < FETCH_SIZE:
+                    break
+
+            return summary or TOO_SHORT
+        finally:
+            cursor.close()
+
+
+def catch_up(conn, summarize: Callable[[str], Optional[str]]) -> int:
+    """Update the summary of every chat that has messages it does not cover yet."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            SELECT s.chat_id FROM chat_summary s
+            LEFT JOIN chat_rolling_summary r ON r.chat_id = s.chat_id
+            WHERE r.last_message_id IS NULL OR r.last_message_id <> s.last_message_id
+        """)
+        chat_ids = [row[0] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+    for chat_id in chat_ids:
+        update(conn, chat_id, summarize, max_chunks=10 ** 9)
+    return len(chat_ids)
+
+
+if __name__ == "__main__":
+    from app import AIService
+
+    parser = argparse.ArgumentParser(description="Bring every chat's rolling summary up to date")
+    parser.add_argument('--chat-id', help="Only this chat")
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        if args.chat_id:
+            summary = update(conn, args.chat_id, AIService.model_summary, max_chunks=10 ** 9)
+            logger.info(f"Summary for {args.chat_id}: {summary}")
+        else:
+            count = catch_up(conn, AIService.model_summary)
+            logger.info(f"Rolling summaries updated for {count} chats")
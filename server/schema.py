@@ -0,0 +1,168 @@
+"""Idempotent schema migrations for the ChatApp database.
+
+Run ``python schema.py`` after deploying to add any missing indexes,
+columns or tables. Each migration checks ``information_schema`` first, so
+running it repeatedly is safe.
+"""
+import logging
+
+from db import db_connection
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def _index_exists(cursor, table, index):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+        LIMIT 1
+    """, (table, index))
+    return cursor.fetchone() is not None
+
+
+def _column_exists(cursor, table, column):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+        LIMIT 1
+    """, (table, column))
+    return cursor.fetchone() is not None
+
+
+# Tables are created with IF NOT EXISTS
+TABLES = [
+    # Sentiment/language computed once at send time (see message_analysis.py)
+    """
+    CREATE TABLE IF NOT EXISTS message_analysis (
+        message_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        sentiment VARCHAR(16),
+        sentiment_confidence FLOAT,
+        language VARCHAR(8),
+        analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    # Last message / activity per chat and unread count per participant (see chat_summary.py)
+    """
+    CREATE TABLE IF NOT EXISTS chat_summary (
+        chat_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        last_message_id VARCHAR(36),
+        last_message TEXT,
+        last_sender_id INT,
+        last_receiver_id INT,
+        last_activity TIMESTAMP NULL,
+        message_count INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_member_summary (
+        user_id INT NOT NULL,
+        chat_id VARCHAR(36) NOT NULL,
+        unread_count INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (user_id, chat_id)
+    )
+    """,
+    # Running conversation summary and the last message it covers (see rolling_summary.py)
+    """
+    CREATE TABLE IF NOT EXISTS chat_rolling_summary (
+        chat_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        summary TEXT,
+        last_message_id VARCHAR(36),
+        last_timestamp TIMESTAMP NULL,
+        messages_covered INT NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+    """,
+    # Translation of a message per target language (see translation.py)
+    """
+    CREATE TABLE IF NOT EXISTS message_translation (
+        message_id VARCHAR(36) NOT NULL,
+        target_language VARCHAR(8) NOT NULL,
+        translated_text TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (message_id, target_language)
+    )
+    """,
+    # Inverted index for message search (see search_index.py). Terms compare
+    # byte for byte, so "resume" and "résumé" are separate postings.
+    """
+    CREATE TABLE IF NOT EXISTS message_search_terms (
+        term VARCHAR(64) CHARACTER SET utf8mb4 COLLATE utf8mb4_bin NOT NULL,
+        chat_id VARCHAR(36) NOT NULL,
+        message_id VARCHAR(36) NOT NULL,
+        tf SMALLINT NOT NULL,
+        doc_length SMALLINT NOT NULL,
+        PRIMARY KEY (term, chat_id, message_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS message_search_docs (
+        message_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        chat_id VARCHAR(36) NOT NULL,
+        length INT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chat_search_stats (
+        chat_id VARCHAR(36) NOT NULL PRIMARY KEY,
+        messages INT NOT NULL DEFAULT 0,
+        total_length BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+# (table, column name, DDL) - applied only when the column is missing
+COLUMNS = [
+    # Content hash of profile_image, served by /api/profile-images/<hash> (see profile_images.py)
+    ('users', 'profile_image_hash',
+     "ALTER TABLE users ADD COLUMN profile_image_hash CHAR(64) NULL"),
+    # Content hash of a message's attachment file (see attachments.py)
+    ('ChatMessageImages', 'attachment_hash',
+     "ALTER TABLE ChatMessageImages ADD COLUMN attachment_hash CHAR(64) NULL"),
+    # Insert order of messages: breaks ties between the (one-second) timestamps
+    # of messages sent together, in the order message_writer.py queued them
+    ('chatmessage', 'seq',
+     "ALTER TABLE chatmessage ADD COLUMN seq BIGINT NOT NULL AUTO_INCREMENT UNIQUE"),
+]
+
+# (table, index name, DDL) - applied only when the index is missing
+INDEXES = [
+    # Keyset pagination for fetch_messages: WHERE chat_id = ? ORDER BY timestamp, seq
+    ('chatmessage', 'idx_chatmessage_chat_ts_seq',
+     "CREATE INDEX idx_chatmessage_chat_ts_seq ON chatmessage (chat_id, timestamp, seq)"),
+    ('users', 'idx_users_profile_image_hash',
+     "CREATE INDEX idx_users_profile_image_hash ON users (profile_image_hash)"),
+    # fetch_messages joins each message's attachment
+    ('ChatMessageImages', 'idx_chatmessageimages_message_id',
+     "CREATE INDEX idx_chatmessageimages_message_id ON ChatMessageImages (message_id)"),
+    # search_messages looks up the user's chats from either side
+    ('chatsession', 'idx_chatsession_user1', "CREATE INDEX idx_chatsession_user1 ON chatsession (user1_id)"),
+    ('chatsession', 'idx_chatsession_user2', "CREATE INDEX idx_chatsession_user2 ON chatsession (user2_id)"),
+]
+
+
+def apply_migrations(conn):
+    """Apply every missing migration on ``conn`` and commit."""
+    cursor = conn.cursor()
+    try:
+        for ddl in TABLES:
+            cursor.execute(ddl)
+        for table, column, ddl in COLUMNS:
+            if _column_exists(cursor, table, column):
+                continue
+            logger.info(f"Adding column {column} to {table}")
+            cursor.execute(ddl)
+        for table, index, ddl in INDEXES:
+            if _index_exists(cursor, table, index):
+                continue
+            logger.info(f"Creating index {index} on {table}")
+            cursor.execute(ddl)
+        conn.commit()
+    finally:
+        cursor.close()
+
+
+if __name__ == "__main__":
+    with db_connection() as conn:
+        apply_migrations(conn)
+    logger.info("Schema is up to date")
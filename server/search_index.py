@@ -0,0 +1,273 @@
+"""Full-text message search: an inverted index over ``chatmessage.message``.
+
+Three side tables (created by schema.py) hold the index:
+
+* ``message_search_terms`` has one posting per (term, chat_id, message_id)
+  with the term's frequency in the message and the message's length. The
+  primary key puts a chat's postings for a term next to each other, so a
+  search reads only the postings of the chats the user belongs to, and
+  its cost does not grow with the messages of everyone else.
+* ``message_search_docs`` records every indexed message and its length.
+* ``chat_search_stats`` keeps the number and total length of the indexed
+  messages per chat, for the BM25 collection statistics.
+
+``send_message`` indexes each message in the same transaction as its
+insert (``index_messages``, called by message_writer.py). Results are
+ranked with BM25 over the chats searched and paginated.
+
+Index the messages that existed before the index (or that it missed)
+with ``python search_index.py``.
+"""
+import argparse
+import heapq
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from db import db_connection
+
+logger = logging.getLogger(__name__)
+
+SEARCH_PAGE_SIZE = int(os.getenv("SEARCH_PAGE_SIZE", 20))
+MAX_SEARCH_PAGE_SIZE = 100
+# Longer queries keep their first MAX_QUERY_TERMS distinct terms
+MAX_QUERY_TERMS = 16
+SEARCH_INDEX_BATCH_SIZE = int(os.getenv("SEARCH_INDEX_BATCH_SIZE", 1000))
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+MAX_TERM_LENGTH = 64
+MAX_SMALLINT = 32767   # tf and doc_length columns
+
+_TERM_RE = re.compile(r"[^\W_]+")
+STOPWORDS = frozenset("""
+    a an and are as at be but by for from had has have he her his i if in is it its me my no not of on or our
+    she so that the their them they this to was we were what when which who will with you your
+    s t d ll m re ve
+""".split())
+
+INSERT_DOC_SQL = """
+    INSERT {ignore}INTO message_search_docs (message_id, chat_id, length) VALUES (%s, %s, %s)
+"""
+
+INSERT_TERM_SQL = """
+    INSERT {ignore}INTO message_search_terms (term, chat_id, message_id, tf, doc_length)
+    VALUES (%s, %s, %s, %s, %s)
+"""
+
+RECORD_STATS_SQL = """
+    INSERT INTO chat_search_stats (chat_id, messages, total_length)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+        messages = messages + VALUES(messages),
+        total_length = total_length + VALUES(total_length)
+"""
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lowercased words and numbers of ``text``, stopwords removed, in order."""
+    return [
+        term[:MAX_TERM_LENGTH]
+        for term in _TERM_RE.findall((text or "").lower())
+        if term not in STOPWORDS
+    ]
+
+
+def query_terms(query: Optional[str]) -> List[str]:
+    """Distinct terms of a search query, in query order."""
+    return list(dict.fromkeys(tokenize(query)))[:MAX_QUERY_TERMS]
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def _write(cursor, messages: Iterable[Tuple[str, str, Optional[str]]], ignore: bool = False) -> int:
+    docs, postings = [], []
+    stats: Dict[str, List[int]] = {}
+    for message_id, chat_id, text in messages:
+        terms = tokenize(text)
+        docs.append((message_id, chat_id, len(terms)))
+        postings.extend(
+            (term, chat_id, message_id, min(tf, MAX_SMALLINT), min(len(terms), MAX_SMALLINT))
+            for term, tf in Counter(terms).items()
+        )
+        chat = stats.setdefault(chat_id, [0, 0])
+        chat[0] += 1
+        chat[1] += len(terms)
+
+    prefix = "IGNORE " if ignore else ""
+    if docs:
+        cursor.executemany(INSERT_DOC_SQL.format(ignore=prefix), docs)
+    if postings:
+        cursor.executemany(INSERT_TERM_SQL.format(ignore=prefix), postings)
+    if stats and not ignore:
+        cursor.executemany(RECORD_STATS_SQL, [(chat_id, count, length) for chat_id, (count, length) in stats.items()])
+    return len(docs)
+
+
+def index_messages(cursor, messages: Iterable[Tuple[str, str, Optional[str]]]):
+    """Index new (message_id, chat_id, message) rows (caller commits)."""
+    _write(cursor, messages)
+
+
+def member_chats(cursor, user_id: int) -> List[str]:
+    """Ids of the chats ``user_id`` takes part in."""
+    cursor.execute("""
+        SELECT chat_id FROM chatsession WHERE user1_id = %s
+        UNION
+        SELECT chat_id FROM chatsession WHERE user2_id = %s
+    """, (user_id, user_id))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def _collection_stats(cursor, chat_ids: Sequence[str]) -> Tuple[int, float]:
+    """Indexed messages and their average length over ``chat_ids``."""
+    cursor.execute(f"""
+        SELECT COALESCE(SUM(messages), 0), COALESCE(SUM(total_length), 0)
+        FROM chat_search_stats WHERE chat_id IN ({_placeholders(chat_ids)})
+    """, tuple(chat_ids))
+    messages, total_length = cursor.fetchone()
+    messages = int(messages)
+    return messages, (float(total_length) / messages if messages else 0.0)
+
+
+def rank(postings: Iterable[Tuple[str, str, int, int]], messages: int, average_length: float) -> Dict[str, float]:
+    """BM25 score of each message in ``postings`` ((term, message_id, tf, doc_length) rows).
+
+    ``messages`` and ``average_length`` describe the searched collection;
+    a term's document frequency is its number of postings.
+    """
+    by_term: Dict[str, List[Tuple[str, int, int]]] = {}
+    for term, message_id, tf, length in postings:
+        by_term.setdefault(term, []).append((message_id, tf, length))
+
+    average_length = average_length or 1.0
+    scores: Dict[str, float] = {}
+    for rows in by_term.values():
+        df = len(rows)
+        # Clamped: messages can run behind the postings while the bulk indexer catches up
+        idf = math.log(1 + (max(messages, df) - df + 0.5) / (df + 0.5))
+        for message_id, tf, length in rows:
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / average_length)
+            scores[message_id] = scores.get(message_id, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+    return scores
+
+
+def _load_messages(cursor, message_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    cursor.execute(f"""
+        SELECT cm.message_id, cm.chat_id, cm.sender_id, cm.receiver_id, cm.message, cm.timestamp,
+               u.email AS sender_email
+        FROM chatmessage cm
+        JOIN users u ON u.user_id = cm.sender_id
+        WHERE cm.message_id IN ({_placeholders(message_ids)})
+    """, tuple(message_ids))
+    columns = [column[0] for column in cursor.description]
+    return {row[0]: dict(zip(columns, row)) for row in cursor.fetchall()}
+
+
+def search(connection, user_id: int, query: str, page: int = 1, limit: int = SEARCH_PAGE_SIZE,
+           chat_id: Optional[str] = None) -> Dict[str, Any]:
+    """One page of the user's messages matching ``query``, best first.
+
+    Only chats the user belongs to are searched (just ``chat_id`` when
+    given; a chat they are not in yields no results). Returns ``results``
+    (message rows with their ``score``), the ``total`` number of matching
+    messages, and ``page`` / ``limit`` / ``has_more``.
+    """
+    page = max(1, page)
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    response = {'query': query, 'results': [], 'total': 0, 'page': page, 'limit': limit, 'has_more': False}
+
+    terms = query_terms(query)
+    if not terms:
+        return response
+
+    cursor = connection.cursor()
+    try:
+        chat_ids = member_chats(cursor, user_id)
+        if chat_id is not None:
+            chat_ids = [chat_id] if chat_id in chat_ids else []
+        if not chat_ids:
+            return response
+
+        messages, average_length = _collection_stats(cursor, chat_ids)
+        # Range scans on the (term, chat_id, message_id) primary key
+        cursor.execute(f"""
+            SELECT term, message_id, tf, doc_length FROM message_search_terms
+            WHERE term IN ({_placeholders(terms)}) AND chat_id IN ({_placeholders(chat_ids)})
+        """, (*terms, *chat_ids))
+        scores = rank(cursor.fetchall(), messages, average_length)
+
+        offset = (page - 1) * limit
+        ranked = heapq.nsmallest(offset + limit, scores.items(), key=lambda item: (-item[1], item[0]))[offset:]
+        rows = _load_messages(cursor, [message_id for message_id, _ in ranked]) if ranked else {}
+    finally:
+        cursor.close()
+
+    for message_id, score in ranked:
+        row = rows.get(message_id)
+        if row is None:
+            continue  # deleted since it was indexed
+        row['score'] = round(score, 4)
+        response['results'].append(row)
+    response['total'] = len(scores)
+    response['has_more'] = offset + limit < len(scores)
+    return response
+
+
+def build(conn, batch_size: int = SEARCH_INDEX_BATCH_SIZE) -> int:
+    """Index every message that is not in the index yet, then recompute the chat statistics.
+
+    Walks chatmessage by message_id, one committed batch at a time, so it
+    can run (and be interrupted and rerun) while the server is writing.
+    """
+    cursor = conn.cursor()
+    indexed = 0
+    last_id = ""
+    try:
+        while True:
+            cursor.execute("""
+                SELECT cm.message_id, cm.chat_id, cm.message
+                FROM chatmessage cm
+                LEFT JOIN message_search_docs d ON d.message_id = cm.message_id
+                WHERE cm.message_id > %s AND d.message_id IS NULL
+                ORDER BY cm.message_id
+                LIMIT %s
+            """, (last_id, batch_size))
+            batch = cursor.fetchall()
+            if not batch:
+                break
+            indexed += _write(cursor, batch, ignore=True)
+            conn.commit()
+            last_id = batch[-1][0]
+            logger.info(f"Indexed {indexed} messages")
+
+        cursor.execute("""
+            INSERT INTO chat_search_stats (chat_id, messages, total_length)
+            SELECT chat_id, COUNT(*), SUM(length) FROM message_search_docs GROUP BY chat_id
+            ON DUPLICATE KEY UPDATE messages = VALUES(messages), total_length = VALUES(total_length)
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return indexed
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Index existing chat messages for search")
+    parser.add_argument("--batch-size", type=int, default=SEARCH_INDEX_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with db_connection() as conn:
+        count = build(conn, args.batch_size)
+    logger.info(f"Search index is up to date ({count} messages indexed)")
@@ -0,0 +1,304 @@
+"""Presence and recent-message store shared by the socket handlers.
+
+Replaces the old process-global ``user_socket_map`` / ``chat_message_cache``
+dicts:
+
+* presence keeps O(1) indexes in both directions (sid -> user and
+  user -> set of sids), so a user can be connected from several tabs or
+  devices and a disconnect never scans every connected user;
+* each chat keeps a bounded ring buffer of its most recent messages
+  (``recent_window.MessageRing`` of slotted records), and the least
+  recently used chats are evicted once ``max_chats`` is reached.
+
+A chat's window is hydrated from the database once (``set_messages``);
+after that ``append_message`` keeps it current. Appends to a chat that is
+not in the store are ignored, so ``window`` never returns a partial
+history: it returns None and the caller hydrates instead.
+
+Two backends implement the same interface:
+
+    MemoryBackend   per-process, split into independently locked shards
+    RespBackend     Redis-protocol server(s), shared by every worker process;
+                    several URLs shard keys across servers by hash
+
+``SESSION_STORE_REDIS_URL`` selects the shared backend (comma-separated for
+several shards); otherwise the in-memory backend is used.
+"""
+import collections
+import json
+import logging
+import os
+import threading
+import zlib
+from typing import Any, Dict, List, Optional
+
+from recent_window import MessageRecord, MessageRing
+from resp_client import RespClient, RespError
+
+logger = logging.getLogger(__name__)
+
+CHAT_BUFFER_SIZE = int(os.getenv("CHAT_BUFFER_SIZE", 50))
+CHAT_BUFFER_MAX_CHATS = int(os.getenv("CHAT_BUFFER_MAX_CHATS", 5000))
+SESSION_STORE_SHARDS = int(os.getenv("SESSION_STORE_SHARDS", 16))
+SESSION_STORE_REDIS_URL = os.getenv("SESSION_STORE_REDIS_URL")
+# Idle seconds before shared presence entries / chat buffers expire
+SESSION_STORE_TTL = int(os.getenv("SESSION_STORE_TTL", 24 * 3600))
+KEY_PREFIX = "chatapp:"
+
+
+def _shard_index(key: str, count: int) -> int:
+    return zlib.crc32(key.encode("utf-8")) % count
+
+
+class _Shard:
+    __slots__ = ("lock", "user_by_sid", "sids_by_user", "chats")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.user_by_sid: Dict[str, str] = {}
+        self.sids_by_user: Dict[str, set] = {}
+        # chat_id -> MessageRing, least recently used first
+        self.chats = collections.OrderedDict()
+
+
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, buffer_size=CHAT_BUFFER_SIZE, max_chats=CHAT_BUFFER_MAX_CHATS, shards=SESSION_STORE_SHARDS):
+        self.buffer_size = buffer_size
+        self.shard_count = max(1, shards)
+        self.max_chats_per_shard = max(1, max_chats // self.shard_count)
+        self._shards = [_Shard() for _ in range(self.shard_count)]
+        self._evictions = 0
+
+    def _shard(self, key: str) -> _Shard:
+        return self._shards[_shard_index(key, self.shard_count)]
+
+    # Presence
+
+    def add_session(self, user: str, sid: str):
+        self.remove_session(sid)  # a sid re-registering as another user
+        shard = self._shard(sid)
+        with shard.lock:
+            shard.user_by_sid[sid] = user
+        shard = self._shard(user)
+        with shard.lock:
+            shard.sids_by_user.setdefault(user, set()).add(sid)
+
+    def remove_session(self, sid: str) -> Optional[str]:
+        shard = self._shard(sid)
+        with shard.lock:
+            user = shard.user_by_sid.pop(sid, None)
+        if user is None:
+            return None
+        shard = self._shard(user)
+        with shard.lock:
+            sids = shard.sids_by_user.get(user)
+            if sids is not None:
+                sids.discard(sid)
+                if not sids:
+                    del shard.sids_by_user[user]
+        return user
+
+    def sessions(self, user: str) -> List[str]:
+        shard = self._shard(user)
+        with shard.lock:
+            return list(shard.sids_by_user.get(user, ()))
+
+    def user_for(self, sid: str) -> Optional[str]:
+        shard = self._shard(sid)
+        with shard.lock:
+            return shard.user_by_sid.get(sid)
+
+    # Recent messages
+
+    def set_messages(self, chat_id: str, messages: List[Dict]):
+        ring = MessageRing(self.buffer_size)
+        ring.replace(MessageRecord.from_dict(message) for message in messages)
+        shard = self._shard(chat_id)
+        with shard.lock:
+            shard.chats[chat_id] = ring
+            shard.chats.move_to_end(chat_id)
+            while len(shard.chats) > self.max_chats_per_shard:
+                shard.chats.popitem(last=False)
+                self._evictions += 1
+
+    def append_message(self, chat_id: str, message: Dict) -> bool:
+        """Add a message to a hydrated chat; False (and nothing stored) for a cold chat."""
+        record = MessageRecord.from_dict(message)
+        shard = self._shard(chat_id)
+        with shard.lock:
+            ring = shard.chats.get(chat_id)
+            if ring is None:
+                return False
+            ring.append(record)
+            shard.chats.move_to_end(chat_id)
+        return True
+
+    def window(self, chat_id: str, limit: Optional[int] = None) -> Optional[List[Dict]]:
+        """The newest ``limit`` messages, or None if the chat has not been hydrated."""
+        shard = self._shard(chat_id)
+        with shard.lock:
+            ring = shard.chats.get(chat_id)
+            if ring is None:
+                return None
+            shard.chats.move_to_end(chat_id)
+            records = ring.latest(limit)
+            return [record.to_dict() for record in records]
+
+    def recent_messages(self, chat_id: str, limit: Optional[int] = None) -> List[Dict]:
+        return self.window(chat_id, limit) or []
+
+    def update_message(self, chat_id: str, message_id: str, fields: Dict) -> bool:
+        shard = self._shard(chat_id)
+        with shard.lock:
+            ring = shard.chats.get(chat_id)
+            record = ring.find(message_id) if ring is not None else None
+            if record is None:
+                return False
+            record.update(fields)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        users = sessions = chats = buffered = 0
+        for shard in self._shards:
+            with shard.lock:
+                users += len(shard.sids_by_user)
+                sessions += len(shard.user_by_sid)
+                chats += len(shard.chats)
+                buffered += sum(len(ring) for ring in shard.chats.values())
+        return {
+            'backend': self.name,
+            'shards': self.shard_count,
+            'buffer_size': self.buffer_size,
+            'online_users': users,
+            'sessions': sessions,
+            'chats': chats,
+            'buffered_messages': buffered,
+            'chat_evictions': self._evictions,
+        }
+
+
+class RespBackend:
+    """Shared backend on one or more Redis-protocol servers.
+
+    Keys are routed to a server by CRC32, so adding URLs spreads presence and
+    chat buffers across servers. Idle chats and stale presence entries
+    expire after ``ttl`` seconds; the server's own eviction policy bounds
+    memory beyond that.
+    """
+    name = "resp"
+
+    def __init__(self, urls: List[str], buffer_size=CHAT_BUFFER_SIZE, ttl=SESSION_STORE_TTL):
+        self.nodes = [RespClient(url) for url in urls]
+        self.buffer_size = buffer_size
+        self.ttl = ttl
+        self._errors = 0
+
+    def _node(self, key: str) -> RespClient:
+        return self.nodes[_shard_index(key, len(self.nodes))]
+
+    def _execute(self, key: str, *args, default=None):
+        try:
+            return self._node(key).execute(args[0], key, *args[1:])
+        except (RespError, OSError) as e:
+            self._errors += 1
+            logger.warning(f"Session store {args[0]} {key} failed: {e}")
+            return default
+
+    @staticmethod
+    def _decode(value) -> Optional[str]:
+        return value.decode("utf-8") if isinstance(value, bytes) else value
+
+    # Presence
+
+    def add_session(self, user: str, sid: str):
+        self.remove_session(sid)
+        user_key = f"{KEY_PREFIX}presence:user:{user}"
+        self._execute(f"{KEY_PREFIX}presence:sid:{sid}", "SET", user, "EX", self.ttl)
+        self._execute(user_key, "SADD", sid)
+        self._execute(user_key, "EXPIRE", self.ttl)
+
+    def remove_session(self, sid: str) -> Optional[str]:
+        sid_key = f"{KEY_PREFIX}presence:sid:{sid}"
+        user = self._decode(self._execute(sid_key, "GET"))
+        if user is None:
+            return None
+        self._execute(sid_key, "DEL")
+        self._execute(f"{KEY_PREFIX}presence:user:{user}", "SREM", sid)
+        return user
+
+    def sessions(self, user: str) -> List[str]:
+        members = self._execute(f"{KEY_PREFIX}presence:user:{user}", "SMEMBERS", default=[])
+        return [self._decode(sid) for sid in members or []]
+
+    def user_for(self, sid: str) -> Optional[str]:
+        return self._decode(self._execute(f"{KEY_PREFIX}presence:sid:{sid}", "GET"))
+
+    # Recent messages
+
+    def _chat_key(self, chat_id: str) -> str:
+        return f"{KEY_PREFIX}chat:{chat_id}:recent"
+
+    @staticmethod
+    def _encode(message: Dict) -> str:
+        return json.dumps(MessageRecord.from_dict(message).to_dict(), default=str)
+
+    def append_message(self, chat_id: str, message: Dict) -> bool:
+        """Add a message to a hydrated chat; RPUSHX leaves cold (missing) chats alone."""
+        key = self._chat_key(chat_id)
+        if not self._execute(key, "RPUSHX", self._encode(message)):
+            return False
+        self._execute(key, "LTRIM", -self.buffer_size, -1)
+        self._execute(key, "EXPIRE", self.ttl)
+        return True
+
+    def set_messages(self, chat_id: str, messages: List[Dict]):
+        key = self._chat_key(chat_id)
+        self._execute(key, "DEL")
+        messages = messages[-self.buffer_size:]
+        if messages:
+            self._execute(key, "RPUSH", *[self._encode(message) for message in messages])
+            self._execute(key, "EXPIRE", self.ttl)
+
+    def window(self, chat_id: str, limit: Optional[int] = None) -> Optional[List[Dict]]:
+        """The newest ``limit`` messages, or None if the chat is not stored (empty chats included)."""
+        key = self._chat_key(chat_id)
+        items = self._execute(key, "LRANGE", -(limit or self.buffer_size), -1, default=[])
+        if not items:
+            return None
+        self._execute(key, "EXPIRE", self.ttl)
+        return [json.loads(item) for item in items]
+
+    def recent_messages(self, chat_id: str, limit: Optional[int] = None) -> List[Dict]:
+        return self.window(chat_id, limit) or []
+
+    def update_message(self, chat_id: str, message_id: str, fields: Dict) -> bool:
+        key = self._chat_key(chat_id)
+        items = self._execute(key, "LRANGE", 0, -1, default=[]) or []
+        for index in range(len(items) - 1, -1, -1):
+            message = json.loads(items[index])
+            if message.get('message_id') == message_id:
+                message.update((k, v) for k, v in fields.items() if k in message)
+                # Best effort: a concurrent append can shift the entry before LSET
+                self._execute(key, "LSET", index - len(items), json.dumps(message, default=str))
+                return True
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'backend': self.name,
+            'shards': len(self.nodes),
+            'buffer_size': self.buffer_size,
+            'errors': self._errors,
+        }
+
+
+def create_session_store():
+    if SESSION_STORE_REDIS_URL:
+        urls = [url.strip() for url in SESSION_STORE_REDIS_URL.split(",") if url.strip()]
+        return RespBackend(urls)
+    return MemoryBackend()
+
+
+session_store = create_session_store()
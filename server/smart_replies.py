@@ -0,0 +1,203 @@
+"""Smart-reply suggestions computed ahead of time, one chat at a time.
+
+Generating DialoGPT candidates takes seconds on CPU, so waiting for the
+user to ask is too late. ``send_message`` calls ``schedule`` for every new
+message, and background workers generate suggestions for the chat's new
+last message. Results are kept per (chat_id, last_message_id), and
+``get_smart_replies`` returns them at once if the chat has not moved on.
+
+Only the newest message of a chat is worth answering. A queued job is
+replaced when a newer message arrives. A generation already running is
+stopped between decoding steps through its ``should_stop`` callback, and
+its output is thrown away.
+"""
+import collections
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SMART_REPLY_WORKERS = int(os.getenv("SMART_REPLY_WORKERS", 1))
+SMART_REPLY_MAX_PENDING = int(os.getenv("SMART_REPLY_MAX_PENDING", 200))
+SMART_REPLY_CACHE_CHATS = int(os.getenv("SMART_REPLY_CACHE_CHATS", 5000))
+SMART_REPLY_WAIT = float(os.getenv("SMART_REPLY_WAIT", 30))
+
+
+class SmartReplyPrecomputer:
+    """Per-chat speculative generation with supersede/cancel semantics.
+
+    ``generate(history, should_stop)`` returns the suggestions for a list of
+    message dicts; it should poll ``should_stop()`` and return early once it
+    is true.
+    """
+
+    def __init__(self, generate: Callable[[List[Dict], Callable[[], bool]], List[str]],
+                 workers: int = SMART_REPLY_WORKERS, max_pending: int = SMART_REPLY_MAX_PENDING,
+                 max_chats: int = SMART_REPLY_CACHE_CHATS, name: str = "smart-replies"):
+        self.generate = generate
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_chats = max_chats
+        self.name = name
+
+        self._latest = collections.OrderedDict()    # chat_id -> newest message_id seen
+        self._pending = collections.OrderedDict()   # chat_id -> (message_id, history), oldest first
+        self._running = {}                          # chat_id -> message_id being generated
+        self._results = collections.OrderedDict()   # chat_id -> (message_id, suggestions), LRU
+        self._cond = threading.Condition()
+        self._threads = []
+
+        # Metrics
+        self._scheduled = 0
+        self._superseded = 0
+        self._cancelled = 0
+        self._dropped = 0
+        self._completed = 0
+        self._failed = 0
+        self._hits = 0
+        self._waits = 0
+        self._misses = 0
+        self._generation_total = 0.0
+
+    def _ensure_workers(self):
+        if self._threads:
+            return
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _remember_latest(self, chat_id, message_id):
+        """Caller holds the lock."""
+        self._latest[chat_id] = message_id
+        self._latest.move_to_end(chat_id)
+        while len(self._latest) > self.max_chats:
+            self._latest.popitem(last=False)
+
+    def _is_current(self, chat_id, message_id) -> bool:
+        # No lock: this is the should_stop callback, polled from inside the
+        # generation, which may run on a native thread (eventlet tpool) that
+        # must not block on a green lock held by a greenlet. A single dict
+        # read is atomic.
+        return self._latest.get(chat_id) == message_id
+
+    def schedule(self, chat_id: str, message_id: str, history: List[Dict]):
+        """Generate suggestions for ``message_id``, the new last message of the chat."""
+        with self._cond:
+            self._ensure_workers()
+            self._remember_latest(chat_id, message_id)
+            self._scheduled += 1
+
+            if self._pending.pop(chat_id, None) is not None:
+                self._superseded += 1
+            elif len(self._pending) >= self.max_pending:
+                self._pending.popitem(last=False)
+                self._dropped += 1
+
+            self._pending[chat_id] = (message_id, history)
+            self._cond.notify_all()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending)
+                chat_id, (message_id, history) = self._pending.popitem(last=False)
+                self._running[chat_id] = message_id
+
+            started = time.monotonic()
+            try:
+                suggestions = self.generate(history, lambda: not self._is_current(chat_id, message_id))
+                failed = False
+            except Exception as e:
+                logger.error(f"{self.name}: generation failed: {e}")
+                suggestions, failed = None, True
+
+            with self._cond:
+                self._generation_total += time.monotonic() - started
+                if self._running.get(chat_id) == message_id:
+                    del self._running[chat_id]
+
+                if failed:
+                    self._failed += 1
+                elif self._latest.get(chat_id) != message_id:
+                    self._cancelled += 1
+                else:
+                    self._completed += 1
+                    self._results[chat_id] = (message_id, suggestions)
+                    self._results.move_to_end(chat_id)
+                    while len(self._results) > self.max_chats:
+                        self._results.popitem(last=False)
+                self._cond.notify_all()
+
+    def _cached(self, chat_id, message_id):
+        """Suggestions for exactly this message, if ready; caller holds the lock."""
+        entry = self._results.get(chat_id)
+        if entry is not None and entry[0] == message_id:
+            self._results.move_to_end(chat_id)
+            return entry[1]
+        return None
+
+    def _in_progress(self, chat_id, message_id) -> bool:
+        """Queued or being generated; caller holds the lock."""
+        pending = self._pending.get(chat_id)
+        return (pending is not None and pending[0] == message_id) or self._running.get(chat_id) == message_id
+
+    def get(self, chat_id: str, message_id: str, history: List[Dict],
+            timeout: float = SMART_REPLY_WAIT) -> Optional[List[str]]:
+        """Suggestions for the chat as of ``message_id``.
+
+        Returns at once when they were precomputed. Otherwise the job is
+        scheduled (unless it is already queued or running) and the caller
+        waits up to ``timeout`` seconds; None if it did not finish in time.
+        """
+        with self._cond:
+            suggestions = self._cached(chat_id, message_id)
+            if suggestions is not None:
+                self._hits += 1
+                return suggestions
+
+            latest = self._latest.get(chat_id)
+            if self._in_progress(chat_id, message_id):
+                self._waits += 1
+                start = False
+            else:
+                self._misses += 1
+                # Never move a chat back to an older message than one already seen
+                start = latest is None or latest == message_id
+
+        if start:
+            self.schedule(chat_id, message_id, history)
+
+        with self._cond:
+            # Done, superseded, or failed (no longer queued or running)
+            self._cond.wait_for(
+                lambda: self._cached(chat_id, message_id) is not None
+                or not self._in_progress(chat_id, message_id),
+                timeout=timeout
+            )
+            return self._cached(chat_id, message_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            finished = self._completed + self._cancelled + self._failed
+            lookups = self._hits + self._waits + self._misses
+            return {
+                'workers': self.workers,
+                'pending': len(self._pending),
+                'running': len(self._running),
+                'cached_chats': len(self._results),
+                'scheduled': self._scheduled,
+                'superseded': self._superseded,
+                'cancelled': self._cancelled,
+                'dropped': self._dropped,
+                'completed': self._completed,
+                'failed': self._failed,
+                'hits': self._hits,
+                'waits': self._waits,
+                'misses': self._misses,
+                'hit_rate': round(self._hits / lookups, 3) if lookups else 0.0,
+                'generation_avg_ms': round(self._generation_total / finished * 1000, 3) if finished else 0.0,
+            }
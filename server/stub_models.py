@@ -0,0 +1,92 @@
+"""Stand-in for model_server.py that answers without loading any model.
+
+Every model server operation returns a cheap, deterministic result of the
+shape the real models give: keyword sentiment, n-gram language detection,
+first-sentence summaries, canned smart replies and tagged "translations".
+``--latency-ms`` adds a fixed delay per call to stand in for inference
+time. Point the web server at it to exercise the AI paths without
+transformers or a GPU (bench_load.py does this):
+
+    python stub_models.py --port 8766 --latency-ms 20
+    MODEL_SERVER_URL=http://127.0.0.1:8766 python app.py
+"""
+import argparse
+import logging
+import time
+from http.server import ThreadingHTTPServer
+
+import langid
+import text_rules
+from model_server import MODEL_SERVER_HOST, ModelRequestHandler
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SMART_REPLIES = ["Sounds good!", "Thanks, I'll take a look.", "Can we talk later?", "Sure.", "Got it."]
+
+
+def _sentiment(text):
+    label = text_rules.keyword_sentiment(text)["sentiment"]
+    return {"label": label, "score": 0.9 if label != "neutral" else 0.6}
+
+
+def _summarize(text, max_length=100):
+    # The model's max_length counts tokens; words are close enough here
+    first = text.strip().split("\n")[0]
+    return " ".join(first.split()[:max_length])
+
+
+# Seconds added to every call (--latency-ms)
+latency = 0.0
+
+
+def _delayed(operation):
+    def run(body):
+        if latency:
+            time.sleep(latency)
+        return operation(body)
+    return run
+
+
+STUB_OPERATIONS = {name: _delayed(operation) for name, operation in {
+    "sentiment": lambda body: _sentiment(body["text"]),
+    "sentiment_batch": lambda body: [_sentiment(text) for text in body["texts"]],
+    "summarize": lambda body: _summarize(body["text"], body.get("max_length", 100)),
+    "count_tokens": lambda body: [len(text.split()) for text in body["texts"]],
+    "smart_reply": lambda body: SMART_REPLIES[:body.get("num_replies", 3)],
+    "detect_language": lambda body: langid.detect(body["text"])[0],
+    "detect_language_batch": lambda body: [language for language, _ in langid.detect_batch(body["texts"])],
+    "translate": lambda body: f"[{body['target_language']}] {body['text']}",
+    "translate_batch": lambda body: [f"[{body['target_language']}] {text}" for text in body["texts"]],
+}.items()}
+
+
+class StubModelRequestHandler(ModelRequestHandler):
+    operations = STUB_OPERATIONS
+
+    def health(self):
+        return {"backend": "stub", "latency_ms": latency * 1000}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Model server stand-in with canned results")
+    parser.add_argument("--host", default=MODEL_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every call")
+    args = parser.parse_args()
+
+    global latency
+    latency = args.latency_ms / 1000
+    langid.get_identifier()
+    server = ThreadingHTTPServer((args.host, args.port), StubModelRequestHandler)
+    logger.info(f"Stub model server listening on http://{args.host}:{args.port} ({args.latency_ms} ms per call)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
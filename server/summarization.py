@@ -0,0 +1,182 @@
+"""Token-aware map-reduce summarization of long conversations.
+
+BART reads at most 1024 tokens, so one call can only cover a small part of
+a busy chat. ``MapReduceSummarizer`` does the following:
+
+* splits the conversation into chunks of at most ``chunk_tokens`` tokens,
+  counted with the summarization model's own tokenizer;
+* summarizes the chunks in parallel on a pool of ``workers`` threads (map);
+* summarizes the partial summaries again, packed into chunks the same way,
+  until one summary is left (reduce).
+
+The whole run has a latency budget. Chunks that have not finished when it
+runs out, or whose model call failed (``summarize`` raised or returned
+None), are replaced by their leading sentences, and a reduce level that
+cannot start in time joins the partial summaries instead. The result says
+whether it is ``complete``, i.e. the model summarized every chunk.
+
+Compare wall-clock time against chat length with ``python bench_summarization.py``.
+"""
+import logging
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# BART's 1024-token window minus room for special tokens
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 900))
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", 4))
+SUMMARY_LATENCY_BUDGET = float(os.getenv("SUMMARY_LATENCY_BUDGET", 20))
+SUMMARY_MAX_MESSAGES = int(os.getenv("SUMMARY_MAX_MESSAGES", 2000))
+
+# Used when no tokenizer is available: BPE averages about 1.3 tokens per word
+TOKENS_PER_WORD = 1.3
+LEAD_SENTENCES = 2
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def estimate_tokens(texts: List[str]) -> List[int]:
+    return [int(len(text.split()) * TOKENS_PER_WORD) + 1 for text in texts]
+
+
+def conversation_lines(messages: List[Dict]) -> List[str]:
+    """One "sender: message" line per non-empty message"""
+    return [
+        f"{(msg.get('sender_email') or 'User').split('@')[0]}: {msg['message']}"
+        for msg in messages if (msg.get('message') or '').strip()
+    ]
+
+
+def lead(text: str, sentences: int = LEAD_SENTENCES) -> str:
+    """Extractive stand-in for a summary: the first few sentences"""
+    return " ".join(_SENTENCE_RE.split(text.strip())[:sentences])
+
+
+class MapReduceSummarizer:
+    def __init__(self, summarize: Callable[[str], Optional[str]],
+                 count_tokens: Callable[[List[str]], Optional[List[int]]] = estimate_tokens,
+                 chunk_tokens: int = SUMMARY_CHUNK_TOKENS, workers: int = SUMMARY_WORKERS,
+                 latency_budget: float = SUMMARY_LATENCY_BUDGET, name: str = "summarizer"):
+        self.summarize = summarize
+        self.count_tokens = count_tokens
+        self.chunk_tokens = chunk_tokens
+        self.workers = workers
+        self.latency_budget = latency_budget
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+        # Metrics
+        self._runs = 0
+        self._incomplete = 0
+        self._chunks = 0
+        self._elapsed_total = 0.0
+
+    def _token_counts(self, texts: List[str]) -> List[int]:
+        counts = self.count_tokens(texts) if texts else []
+        return counts if counts is not None else estimate_tokens(texts)
+
+    def split(self, lines: List[str]) -> List[str]:
+        """Pack consecutive lines into chunks of at most ``chunk_tokens`` tokens.
+
+        A single line longer than the budget is cut at word boundaries.
+        """
+        pieces = []
+        for line, tokens in zip(lines, self._token_counts(lines)):
+            if tokens <= self.chunk_tokens:
+                pieces.append((line, tokens))
+                continue
+            words = line.split()
+            step = max(1, int(len(words) * self.chunk_tokens / tokens))
+            parts = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+            pieces.extend(zip(parts, self._token_counts(parts)))
+
+        chunks, current, size = [], [], 0
+        for text, tokens in pieces:
+            if current and size + tokens > self.chunk_tokens:
+                chunks.append("\n".join(current))
+                current, size = [], 0
+            current.append(text)
+            size += tokens
+        if current:
+            chunks.append("\n".join(current))
+        return chunks
+
+    def _map(self, chunks: List[str], deadline: float):
+        """Summarize ``chunks`` in parallel; returns (summaries, all summarized by the model)"""
+        futures = [self._pool.submit(self.summarize, chunk) for chunk in chunks]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+
+        summaries, finished = [], True
+        for chunk, future in zip(chunks, futures):
+            result = None
+            if future.done() and not future.cancelled():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Chunk summarization failed: {e}")
+            else:
+                future.cancel()
+                finished = False
+            if not result:
+                result = lead(chunk)
+                finished = False
+            summaries.append(result)
+        return summaries, finished
+
+    def run(self, lines: List[str], latency_budget: Optional[float] = None) -> Dict[str, Any]:
+        """Summarize a conversation given as lines of text"""
+        started = time.monotonic()
+        deadline = started + (self.latency_budget if latency_budget is None else latency_budget)
+
+        chunks = self.split(lines)
+        total_chunks = len(chunks)
+        levels = 0
+        complete = True
+
+        while chunks:
+            summaries, finished = self._map(chunks, deadline)
+            levels += 1
+            complete = complete and finished
+            if len(summaries) == 1:
+                summary = summaries[0]
+                break
+            if time.monotonic() >= deadline:
+                # No time for another level: keep the opening of each partial summary
+                complete = False
+                summary = " ".join(lead(partial, 1) for partial in summaries)
+                break
+            chunks = self.split(summaries)
+            if len(chunks) >= len(summaries):
+                # Summaries no longer shrink (budget too small for two of them)
+                summary = " ".join(summaries)
+                break
+            total_chunks += len(chunks)
+        else:
+            summary = ""
+
+        elapsed = time.monotonic() - started
+        self._runs += 1
+        self._incomplete += not complete
+        self._chunks += total_chunks
+        self._elapsed_total += elapsed
+        return {
+            'summary': summary,
+            'complete': complete,
+            'chunks': total_chunks,
+            'levels': levels,
+            'elapsed_ms': round(elapsed * 1000, 1),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': self.workers,
+            'chunk_tokens': self.chunk_tokens,
+            'latency_budget_seconds': self.latency_budget,
+            'runs': self._runs,
+            'incomplete_runs': self._incomplete,
+            'chunks': self._chunks,
+            'elapsed_avg_ms': round(self._elapsed_total / self._runs * 1000, 1) if self._runs else 0.0,
+        }
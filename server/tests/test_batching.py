@@ -0,0 +1,99 @@
+"""MicroBatcher flushing by size and by wait time, and error propagation."""
+import threading
+import time
+
+import pytest
+
+from batching import MicroBatcher, run_blocking
+
+
+class Recorder:
+    def __init__(self, delay=0.0):
+        self.batches = []
+        self.delay = delay
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if self.delay:
+            time.sleep(self.delay)
+        return [item * 2 for item in items]
+
+
+def test_single_item_is_flushed_after_max_wait():
+    process = Recorder()
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=50)
+
+    started = time.monotonic()
+    assert batcher.submit(3).result(timeout=2) == 6
+    assert time.monotonic() - started >= 0.04
+    assert process.batches == [[3]]
+
+
+def test_concurrent_items_share_a_batch_in_order():
+    process = Recorder()
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=100)
+
+    futures = batcher.submit_many([1, 2, 3])
+    assert [future.result(timeout=2) for future in futures] == [2, 4, 6]
+    assert process.batches == [[1, 2, 3]]
+
+
+def test_full_batch_is_flushed_without_waiting():
+    process = Recorder()
+    batcher = MicroBatcher(process, max_batch_size=2, max_wait_ms=5000)
+
+    started = time.monotonic()
+    futures = batcher.submit_many([1, 2, 3, 4])
+    assert [future.result(timeout=2) for future in futures[:2]] == [2, 4]
+    assert time.monotonic() - started < 1
+    assert [future.result(timeout=2) for future in futures[2:]] == [6, 8]
+    assert process.batches == [[1, 2], [3, 4]]
+
+
+def test_items_queued_during_a_batch_form_the_next_one():
+    process = Recorder(delay=0.2)
+    batcher = MicroBatcher(process, max_batch_size=8, max_wait_ms=10)
+
+    first = batcher.submit(1)
+    time.sleep(0.05)   # the first batch is being processed
+    rest = batcher.submit_many([2, 3])
+    assert first.result(timeout=2) == 2
+    assert [future.result(timeout=2) for future in rest] == [4, 6]
+    assert process.batches == [[1], [2, 3]]
+
+
+def test_failed_batch_fails_every_future():
+    def fail(items):
+        raise ValueError("model unavailable")
+
+    batcher = MicroBatcher(fail, max_batch_size=4, max_wait_ms=20)
+    futures = batcher.submit_many([1, 2])
+    for future in futures:
+        with pytest.raises(ValueError):
+            future.result(timeout=2)
+    assert batcher.stats()['errors'] == 1
+
+
+def test_wrong_number_of_results_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:1], max_batch_size=4, max_wait_ms=20)
+    futures = batcher.submit_many([1, 2])
+    with pytest.raises(RuntimeError):
+        futures[0].result(timeout=2)
+
+
+def test_stats_count_batches_and_sizes():
+    batcher = MicroBatcher(Recorder(), max_batch_size=4, max_wait_ms=50)
+    for future in batcher.submit_many([1, 2, 3]):
+        future.result(timeout=2)
+
+    stats = batcher.stats()
+    assert stats['batches'] == 1
+    assert stats['items'] == 3
+    assert stats['largest_batch'] == 3
+    assert stats['batch_size_histogram']['4'] == 1
+    assert stats['pending'] == 0
+
+
+def test_run_blocking_runs_inline_without_eventlet_patching():
+    assert run_blocking(lambda a, b=0: a + b, 1, b=2) == 3
+    assert run_blocking(threading.current_thread) is threading.current_thread()
@@ -0,0 +1,133 @@
+"""ConnectionPool checkout, release and health checks, without a database."""
+import threading
+import time
+
+import pytest
+from mysql.connector import Error
+
+from db import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.in_transaction = False
+        self.pings = 0
+        self.rollbacks = 0
+        self.closed = False
+        self.ping_error = None
+        self.rollback_error = None
+
+    def ping(self, reconnect=False, attempts=1, delay=0):
+        self.pings += 1
+        if self.ping_error:
+            raise self.ping_error
+
+    def is_connected(self):
+        raise AssertionError("is_connected() pings the server; the pool must not call it")
+
+    def rollback(self):
+        self.rollbacks += 1
+        if self.rollback_error:
+            raise self.rollback_error
+        self.in_transaction = False
+
+    def close(self):
+        self.closed = True
+
+
+class FakePool(ConnectionPool):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.opened = []
+
+    def _connect(self):
+        conn = FakeConnection()
+        self.opened.append(conn)
+        return conn
+
+
+def test_released_connection_is_reused():
+    pool = FakePool(size=2)
+    conn = pool.acquire()
+    pool.release(conn)
+    assert pool.acquire() is conn
+    assert len(pool.opened) == 1
+
+
+def test_connections_are_opened_lazily_up_to_size():
+    pool = FakePool(size=2, timeout=0.05)
+    first, second = pool.acquire(), pool.acquire()
+    assert first is not second
+    assert pool.stats()['open'] == 2
+    assert pool.stats()['in_use'] == 2
+
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert pool.stats()['timeouts'] == 1
+
+
+def test_waiter_gets_the_next_released_connection():
+    pool = FakePool(size=1, timeout=2)
+    conn = pool.acquire()
+    threading.Timer(0.1, pool.release, args=(conn,)).start()
+    assert pool.acquire() is conn
+
+
+def test_recently_used_connection_is_not_pinged():
+    pool = FakePool(size=1, ping_interval=30)
+    conn = pool.acquire()
+    for _ in range(5):
+        pool.release(conn)
+        conn = pool.acquire()
+    assert conn.pings == 0
+
+
+def test_idle_connection_is_pinged():
+    pool = FakePool(size=1, ping_interval=0.05)
+    conn = pool.acquire()
+    pool.release(conn)
+    time.sleep(0.1)
+    assert pool.acquire() is conn
+    assert conn.pings == 1
+
+
+def test_failed_ping_replaces_the_connection():
+    pool = FakePool(size=1, ping_interval=0.05)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.ping_error = Error(msg="gone away")
+    time.sleep(0.1)
+
+    replacement = pool.acquire()
+    assert replacement is not conn
+    assert conn.closed
+    assert pool.stats()['reconnects'] == 1
+    assert pool.stats()['open'] == 1
+
+
+def test_release_rolls_back_open_transaction():
+    pool = FakePool(size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+    pool.release(conn)
+    assert conn.rollbacks == 1
+    assert pool.stats()['idle'] == 1
+
+
+def test_broken_connection_is_dropped_on_release():
+    pool = FakePool(size=1)
+    conn = pool.acquire()
+    conn.in_transaction = True
+    conn.rollback_error = Error(msg="lost connection")
+    pool.release(conn)
+
+    assert pool.stats()['open'] == 0
+    assert pool.acquire() is not conn
+
+
+def test_connection_context_manager_releases():
+    pool = FakePool(size=1)
+    with pool.connection() as conn:
+        assert pool.stats()['in_use'] == 1
+    assert pool.stats()['in_use'] == 0
+    assert pool.acquire() is conn
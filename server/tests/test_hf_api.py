@@ -0,0 +1,179 @@
+"""HFClient against a local stub of the Inference API."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from hf_api import CircuitBreaker, HFClient
+
+
+class StubAPI:
+    """Answers POST /<model> with queued (status, body, headers) replies, then with ``default``."""
+
+    def __init__(self):
+        self.replies = []
+        self.default = (200, {"ok": True}, {})
+        self.delay = 0.0
+        self.requests = []
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stub.requests.append((time.monotonic(), self.path, json.loads(self.rfile.read(length))))
+                if stub.delay:
+                    time.sleep(stub.delay)
+                status, body, headers = stub.replies.pop(0) if stub.replies else stub.default
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub():
+    api = StubAPI()
+    yield api
+    api.close()
+
+
+def make_client(stub, **kwargs):
+    options = dict(timeout=2, max_attempts=3, backoff_base=0.01, backoff_max=5, deadline=5,
+                   breaker_threshold=5, breaker_reset=30)
+    options.update(kwargs)
+    return HFClient(base_url=stub.url, api_key=None, **options)
+
+
+def test_returns_json_body(stub):
+    stub.default = (200, [{"label": "POSITIVE", "score": 0.9}], {})
+    client = make_client(stub)
+    assert client.call("sentiment", {"inputs": "great"}) == [{"label": "POSITIVE", "score": 0.9}]
+    assert stub.requests[0][1:] == ("/sentiment", {"inputs": "great"})
+
+
+def test_waits_for_retry_after_before_retrying(stub):
+    stub.replies = [(429, {"error": "rate limited"}, {"Retry-After": "1"})]
+    client = make_client(stub)
+
+    assert client.call("m", {"inputs": "x"}) == {"ok": True}
+    assert len(stub.requests) == 2
+    assert stub.requests[1][0] - stub.requests[0][0] >= 1.0
+    assert client.stats()["retries"] == 1
+
+
+def test_model_loading_is_retried_with_estimated_time(stub):
+    stub.replies = [(503, {"error": "Model is loading", "estimated_time": 0.2}, {})]
+    client = make_client(stub)
+
+    assert client.call("m", {"inputs": "x"}) == {"ok": True}
+    assert stub.requests[1][0] - stub.requests[0][0] >= 0.2
+
+
+def test_client_error_is_not_retried(stub):
+    stub.default = (400, {"error": "bad input"}, {})
+    client = make_client(stub)
+
+    assert client.call("m", {"inputs": "x"}) is None
+    assert len(stub.requests) == 1
+    assert client.stats()["breakers"] == {"m": "closed"}
+
+
+def test_breaker_opens_then_half_open_trial_closes_it(stub):
+    stub.default = (500, {"error": "boom"}, {})
+    client = make_client(stub, max_attempts=1, breaker_threshold=2, breaker_reset=0.3)
+
+    assert client.call("m", {"inputs": "a"}) is None
+    assert client.call("m", {"inputs": "b"}) is None
+    assert client.stats()["breakers"] == {"m": "open"}
+
+    # Rejected without reaching the server
+    assert client.call("m", {"inputs": "c"}) is None
+    assert len(stub.requests) == 2
+    assert client.stats()["short_circuited"] == 1
+
+    time.sleep(0.35)
+    stub.default = (200, {"ok": True}, {})
+    assert client.call("m", {"inputs": "d"}) == {"ok": True}
+    assert client.stats()["breakers"] == {"m": "closed"}
+
+
+def test_half_open_trial_answered_with_failure_closes_breaker(stub):
+    stub.default = (500, {"error": "boom"}, {})
+    client = make_client(stub, max_attempts=1, breaker_threshold=1, breaker_reset=0.2)
+    assert client.call("m", {"inputs": "a"}) is None
+
+    time.sleep(0.25)
+    stub.default = (400, {"error": "bad input"}, {})
+    assert client.call("m", {"inputs": "b"}) is None
+    # The trial got an answer, so the next call goes through
+    stub.default = (200, {"ok": True}, {})
+    assert client.call("m", {"inputs": "c"}) == {"ok": True}
+
+
+def test_half_open_trial_is_released_when_the_attempt_raises(stub):
+    client = make_client(stub, max_attempts=1, breaker_threshold=1, breaker_reset=0.2)
+    breaker = client._breaker("m")
+    breaker.record_failure()
+    time.sleep(0.25)
+
+    def broken_post(*args):
+        raise RuntimeError("unexpected")
+
+    real_post, client._post = client._post, broken_post
+    assert client.call("m", {"inputs": "a"}) is None
+    assert not breaker.trial_in_flight
+
+    client._post = real_post
+    assert client.call("m", {"inputs": "b"}) == {"ok": True}
+    assert breaker.state == "closed"
+
+
+def test_identical_calls_in_flight_share_one_request(stub):
+    stub.delay = 0.3
+    client = make_client(stub)
+
+    first = client.submit("m", {"inputs": "same"})
+    second = client.submit("m", {"inputs": "same"})
+    other = client.submit("m", {"inputs": "different"})
+
+    assert first is second
+    assert first.result(timeout=5) == {"ok": True}
+    assert other.result(timeout=5) == {"ok": True}
+    assert len(stub.requests) == 2
+    assert client.stats()["coalesced"] == 1
+
+
+def test_call_waits_no_longer_than_the_deadline(stub):
+    stub.delay = 2
+    client = make_client(stub, deadline=0.5, timeout=10)
+
+    started = time.monotonic()
+    assert client.call("m", {"inputs": "slow"}) is None
+    assert time.monotonic() - started < 1.0
+
+
+def test_breaker_lets_one_trial_through_when_half_open():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.state == "half_open"
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release()
+    assert breaker.allow()
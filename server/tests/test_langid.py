@@ -0,0 +1,64 @@
+"""Language identification with the shipped n-gram profiles."""
+import numpy as np
+import pytest
+
+import langid
+from langid import NgramLanguageIdentifier
+
+SAMPLES = {
+    "en": "Where are we meeting tomorrow morning?",
+    "es": "¿Dónde nos vemos mañana por la tarde?",
+    "fr": "Où est-ce qu'on se retrouve demain soir ?",
+    "de": "Wo treffen wir uns morgen früh?",
+    "it": "Dove ci vediamo domani sera?",
+    "pt": "Onde nos encontramos amanhã à noite?",
+}
+
+
+def test_detect_batch_identifies_each_language():
+    results = langid.detect_batch(list(SAMPLES.values()))
+    assert [language for language, _ in results] == list(SAMPLES)
+    assert all(confidence >= langid.LANGID_MIN_CONFIDENCE for _, confidence in results)
+
+
+def test_detect_batch_matches_detect_one_by_one():
+    texts = list(SAMPLES.values()) + ["ok", "", "Thanks! See you at 5"]
+    assert langid.detect_batch(texts) == [langid.detect(text) for text in texts]
+
+
+def test_texts_without_letters_get_the_default_language():
+    assert langid.detect_batch(["", "12345 !!!", "🙂"]) == [(langid.DEFAULT_LANGUAGE, 0.0)] * 3
+
+
+def test_empty_batch():
+    assert langid.detect_batch([]) == []
+
+
+def test_low_confidence_falls_back_to_the_default():
+    identifier = NgramLanguageIdentifier.train(langid.read_corpus(), min_confidence=1.01, default="xx")
+    language, confidence = identifier.detect(SAMPLES["de"])
+    assert language == "xx"
+    assert confidence <= 1.0
+
+
+def test_probabilities_are_normalized_per_text():
+    posterior, ngrams = langid.get_identifier().probabilities(list(SAMPLES.values()) + [""])
+    assert posterior.shape == (len(SAMPLES) + 1, len(langid.get_identifier().languages))
+    assert np.allclose(posterior.sum(axis=1), 1.0)
+    assert ngrams[-1] == 0 and (ngrams[:-1] > 0).all()
+
+
+def test_shipped_profiles_match_the_corpus(tmp_path):
+    trained = NgramLanguageIdentifier.train(langid.read_corpus())
+    path = tmp_path / "profiles.npz"
+    trained.save(str(path))
+    loaded = NgramLanguageIdentifier.load(str(path))
+
+    assert loaded.languages == trained.languages == langid.get_identifier().languages
+    assert np.array_equal(loaded.table, trained.table)
+    assert np.allclose(langid.get_identifier().table, trained.table)
+
+
+@pytest.mark.parametrize("text", ["I LOVE THIS", "i love this"])
+def test_detection_ignores_case(text):
+    assert langid.detect(text)[0] == "en"
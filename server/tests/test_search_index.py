@@ -0,0 +1,81 @@
+"""Tokenizing and BM25 ranking of the search index."""
+import pytest
+
+import search_index
+from search_index import query_terms, rank, tokenize
+
+
+class RecordingCursor:
+    def __init__(self):
+        self.statements = []
+
+    def executemany(self, sql, rows):
+        self.statements.append((" ".join(sql.split()[:4]), list(rows)))
+
+
+def test_tokenize_lowercases_and_drops_stopwords_and_punctuation():
+    assert tokenize("The Deploy is at 10, and it's GREEN!") == ["deploy", "10", "green"]
+
+
+def test_tokenize_keeps_accented_words_and_splits_underscores():
+    assert tokenize("Café résumé snake_case") == ["café", "résumé", "snake", "case"]
+
+
+def test_tokenize_handles_empty_text():
+    assert tokenize(None) == []
+    assert tokenize("") == []
+
+
+def test_tokenize_truncates_long_terms():
+    assert tokenize("x" * 100) == ["x" * search_index.MAX_TERM_LENGTH]
+
+
+def test_query_terms_are_distinct_in_query_order_and_capped():
+    assert query_terms("budget Review budget the review") == ["budget", "review"]
+    words = [f"w{n}" for n in range(40)]
+    assert query_terms(" ".join(words)) == words[:search_index.MAX_QUERY_TERMS]
+
+
+def test_rank_prefers_rare_terms():
+    postings = [
+        ("deploy", "m1", 1, 5),
+        ("deploy", "m2", 1, 5),
+        ("deploy", "m3", 1, 5),
+        ("invoice", "m3", 1, 5),
+    ]
+    scores = rank(postings, messages=10, average_length=5)
+    assert scores["m3"] > scores["m1"] == pytest.approx(scores["m2"])
+
+
+def test_rank_rewards_term_frequency_with_saturation():
+    scores = rank([("a", "once", 1, 10), ("a", "twice", 2, 10), ("a", "many", 20, 10)], 10, 10)
+    assert scores["many"] > scores["twice"] > scores["once"]
+    # BM25 saturates: ten times the occurrences is far from ten times the score
+    assert scores["many"] < 3 * scores["once"]
+
+
+def test_rank_penalizes_long_messages():
+    scores = rank([("a", "short", 1, 3), ("a", "long", 1, 30)], 10, 10)
+    assert scores["short"] > scores["long"]
+
+
+def test_rank_tolerates_stale_collection_stats():
+    # The postings can outnumber the counted messages while the bulk indexer catches up
+    scores = rank([("a", f"m{n}", 1, 5) for n in range(5)], messages=2, average_length=0)
+    assert all(score > 0 for score in scores.values())
+
+
+def test_index_messages_writes_docs_postings_and_chat_stats():
+    cursor = RecordingCursor()
+    search_index.index_messages(cursor, [
+        ("m1", "c1", "deploy the deploy"),
+        ("m2", "c1", "lunch"),
+    ])
+    statements = dict(cursor.statements)
+
+    assert statements["INSERT INTO message_search_docs (message_id,"] == [("m1", "c1", 2), ("m2", "c1", 1)]
+    assert statements["INSERT INTO message_search_terms (term,"] == [
+        ("deploy", "c1", "m1", 2, 2),
+        ("lunch", "c1", "m2", 1, 1),
+    ]
+    assert statements["INSERT INTO chat_search_stats (chat_id,"] == [("c1", 2, 3)]
@@ -0,0 +1,70 @@
+"""Rule ordering and matching of the precompiled text rules."""
+from text_rules import (CASUAL, GRAMMAR, PROFESSIONAL, SENTIMENT_KEYWORDS, KeywordMatcher, RuleSet,
+                        fix_grammar, fix_grammar_batch, keyword_sentiment, word_rule)
+
+
+def test_earliest_rule_wins_at_the_same_position():
+    rules = RuleSet([("abc", "first"), ("ab", "second"), ("abcd", "third")])
+    assert rules.apply("abcd") == "firstd"
+
+
+def test_replaced_text_is_not_scanned_again():
+    rules = RuleSet([("a", "b"), ("b", "c")])
+    assert rules.apply("ab") == "bc"
+
+
+def test_callable_replacement_gets_the_match():
+    rules = RuleSet([(r"(?P<n>\d+)", lambda match: str(int(match.group("n")) * 2))])
+    assert rules.apply("2 and 21") == "4 and 42"
+
+
+def test_start_guard_does_not_change_results():
+    rules = [("cat", "dog"), (r"\s+", " ")]
+    text = "a  cat\tsat"
+    assert RuleSet(rules, starts=r"c\s").apply(text) == RuleSet(rules).apply(text) == "a dog sat"
+
+
+def test_specific_grammar_rules_take_precedence_over_the_generic_modal_rule():
+    assert fix_grammar("i could be might go") == "I might be go."
+    assert fix_grammar("it might be could rain") == "It could be rain."
+    assert fix_grammar("he would be can come") == "He would be come."
+    assert fix_grammar("we should will leave") == "We should leave."
+
+
+def test_grammar_only_capitalizes_a_lowercase_standalone_i():
+    assert GRAMMAR.apply("i think it is fine") == "I think it is fine"
+    assert GRAMMAR.apply("Iris is in") == "Iris is in"
+
+
+def test_grammar_collapses_whitespace_and_finishes_the_sentence():
+    assert fix_grammar("  hello   there\nfriend ") == "Hello there friend."
+    assert fix_grammar_batch(["ok", "done!"]) == ["Ok.", "Done!"]
+
+
+def test_word_rules_keep_capitalization_and_whole_words():
+    assert PROFESSIONAL.apply("Hey u, YEAH we're gonna go") == "Hello you, YES we're going to go"
+    assert PROFESSIONAL.apply("bossy urge hey!") == "bossy urge hello!"
+    assert CASUAL.apply("Please kindly reply") == "Hey just reply"
+
+
+def test_word_rule_prefers_the_longest_word():
+    assert RuleSet([word_rule({"u": "you", "ur": "your"})]).apply("ur u") == "your you"
+
+
+def test_keywords_count_distinct_whole_words():
+    assert SENTIMENT_KEYWORDS.count("Good, good and GREAT but bad") == {"positive": 2, "negative": 1}
+    assert SENTIMENT_KEYWORDS.count("badge of goodness") == {"positive": 0, "negative": 0}
+
+
+def test_keyword_matcher_prefers_longer_keywords():
+    matcher = KeywordMatcher({"a": ["love"], "b": ["loved"]})
+    assert matcher.count("I loved it") == {"a": 0, "b": 1}
+    assert matcher.count("I love it") == {"a": 1, "b": 0}
+
+
+def test_keyword_sentiment():
+    assert keyword_sentiment("I love this, it is great")["sentiment"] == "positive"
+    assert keyword_sentiment("awful and terrible, but good")["sentiment"] == "negative"
+    assert keyword_sentiment("the badge arrived") == {
+        "sentiment": "neutral", "confidence": 0.5, "method": "keyword_fallback"
+    }
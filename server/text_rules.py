@@ -0,0 +1,205 @@
+"""Precompiled rule engine for rule-based enhancement and keyword sentiment.
+
+The rules are compiled once, at import. Each rule set is a single regex
+alternation, so a message is rewritten or scanned in one left-to-right
+pass, however many rules or keywords the set holds:
+
+* ``RuleSet`` rewrites text. Every rule is a (pattern, replacement) pair,
+  where the replacement is a string or a function of the match. Where
+  several rules match at the same position, the earliest rule wins.
+  Replaced text is not scanned again.
+* ``word_rule`` turns a ``{word: replacement}`` dict into one rule that
+  matches any of the words and keeps their capitalization.
+* ``KeywordMatcher`` counts the distinct keywords of each group (e.g.
+  positive / negative) that occur in a text as whole words, so "bad" no
+  longer matches inside "badge".
+
+Word lists are compiled into prefix tries (see ``_alternation``), so the
+cost of a pass does not grow with the number of words.
+
+Every engine has an ``apply_batch`` / ``count_batch`` for lists of
+messages. Measure the per-message cost with ``python bench_text_rules.py``.
+"""
+import re
+from typing import Callable, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+Replacement = Union[str, Callable[[re.Match], str]]
+
+
+def _trie_pattern(node: Dict) -> str:
+    branches = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not branches:
+        return ""
+    pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if "" in node:
+        # A word ends here; the greedy ? still tries the longer words first
+        pattern = (pattern if len(branches) == 1 and len(pattern) == 1 else f"(?:{pattern})") + "?"
+    return pattern
+
+
+def _alternation(words: Iterable[str]) -> str:
+    """Regex matching any of ``words``, factored by common prefix.
+
+    A flat ``a|b|c`` makes the regex engine try every word at every
+    candidate position. Nested as a trie, each position costs at most the
+    length of the longest word, however many words there are.
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+    return _trie_pattern(trie)
+
+
+def _match_case(source: str, replacement: str) -> str:
+    if source.isupper() and len(source) > 1:
+        return replacement.upper()
+    if source[:1].isupper():
+        return replacement[:1].upper() + replacement[1:]
+    return replacement
+
+
+def word_rule(replacements: Mapping[str, str]) -> Tuple[str, Callable[[re.Match], str]]:
+    """One rule replacing any of the (lowercase) words, matched case-insensitively."""
+    lookup = {word.lower(): replacement for word, replacement in replacements.items()}
+    pattern = r"\b(?i:" + _alternation(lookup) + r")\b"
+    return pattern, lambda match: _match_case(match.group(0), lookup[match.group(0).lower()])
+
+
+class RuleSet:
+    """Ordered rewrite rules compiled into one alternation.
+
+    ``starts`` is a character class body (e.g. ``r"ab\s"``) covering every
+    character a match can begin with. It becomes a lookahead in front of
+    the alternation, so positions that cannot start
+    any rule are skipped without trying the rules one by one.
+    """
+
+    def __init__(self, rules: Sequence[Tuple[str, Replacement]], starts: Optional[str] = None):
+        self.replacements: List[Replacement] = [replacement for _, replacement in rules]
+        alternation = "|".join(f"(?P<r{i}>{pattern})" for i, (pattern, _) in enumerate(rules))
+        guard = f"(?=[{starts}])" if starts else ""
+        self.pattern = re.compile(f"{guard}(?:{alternation})")
+
+    @classmethod
+    def words(cls, replacements: Mapping[str, str]) -> "RuleSet":
+        """Rule set of a single ``word_rule``."""
+        starts = {char for word in replacements for char in (word[:1].lower(), word[:1].upper())}
+        return cls([word_rule(replacements)], starts=re.escape("".join(sorted(starts))))
+
+    def _replace(self, match: re.Match) -> str:
+        replacement = self.replacements[int(match.lastgroup[1:])]
+        return replacement(match) if callable(replacement) else replacement
+
+    def apply(self, text: str) -> str:
+        return self.pattern.sub(self._replace, text)
+
+    def apply_batch(self, texts: Iterable[str]) -> List[str]:
+        sub, replace = self.pattern.sub, self._replace
+        return [sub(replace, text) for text in texts]
+
+
+class KeywordMatcher:
+    """Whole-word, case-insensitive keyword groups compiled into one alternation.
+
+    The text is lowercased once and scanned with a case-sensitive pattern
+    that starts with the keywords themselves, so the regex engine can skip
+    ahead to positions where a keyword might begin. The word boundary
+    before a match is checked in Python, only for the few candidates found.
+    """
+
+    def __init__(self, groups: Mapping[str, Iterable[str]]):
+        self.groups = list(groups)
+        self.group_of = {word.lower(): group for group, words in groups.items() for word in words}
+        self.pattern = re.compile(r"(?:" + _alternation(self.group_of) + r")\b")
+
+    def count(self, text: str) -> Dict[str, int]:
+        """Distinct keywords of each group found in ``text``."""
+        text = text.lower()
+        found = set()
+        for match in self.pattern.finditer(text):
+            start = match.start()
+            if start and (text[start - 1].isalnum() or text[start - 1] == "_"):
+                continue  # inside a longer word
+            found.add(match.group())
+        counts = dict.fromkeys(self.groups, 0)
+        for word in found:
+            counts[self.group_of[word]] += 1
+        return counts
+
+    def count_batch(self, texts: Iterable[str]) -> List[Dict[str, int]]:
+        count = self.count
+        return [count(text) for text in texts]
+
+
+def _modal_fix(match: re.Match) -> str:
+    # "could might" -> "could", "would be can" -> "would be"
+    return match.group("modal") + (" be" if match.group("be") else "")
+
+
+_MODALS = "could|would|should|might|may|will|can"
+
+GRAMMAR = RuleSet([
+    (r"\b(?-i:i)\b", "I"),
+    (r"\b(?i:could\s+be\s+might)\b", "might be"),
+    (r"\b(?i:might\s+be\s+could)\b", "could be"),
+    (rf"\b(?i:(?P<modal>{_MODALS})\s+(?P<be>be\s+)?(?:{_MODALS}))\b", _modal_fix),
+    (r"\s{2,}|[^\S ]", " "),
+], starts=r"iCcMmSsWw\s")
+
+PROFESSIONAL = RuleSet.words({
+    'hey': 'hello',
+    'yeah': 'yes',
+    'nope': 'no',
+    'gonna': 'going to',
+    'wanna': 'want to',
+    'u': 'you',
+    'ur': 'your',
+    'boss': 'manager',
+})
+
+CASUAL = RuleSet.words({
+    'please': 'hey',
+    'kindly': 'just',
+})
+
+SENTIMENT_KEYWORDS = KeywordMatcher({
+    'positive': ['happy', 'good', 'great', 'excellent', 'love', 'loved', 'loves', 'like', 'liked',
+                 'amazing', 'wonderful', 'fantastic'],
+    'negative': ['sad', 'bad', 'hate', 'hated', 'hates', 'terrible', 'awful', 'horrible', 'disgusting'],
+})
+
+
+def finish_sentence(text: str) -> str:
+    """Trimmed, first letter capitalized, ending in ., ! or ?"""
+    text = text.strip()
+    if text and not text[0].isupper():
+        text = text[0].upper() + text[1:]
+    if text and text[-1] not in '.!?':
+        text += '.'
+    return text
+
+
+def fix_grammar(text: str) -> str:
+    """Grammar rules in one pass, then sentence capitalization and punctuation."""
+    return finish_sentence(GRAMMAR.apply(text))
+
+
+def fix_grammar_batch(texts: Iterable[str]) -> List[str]:
+    return [finish_sentence(text) for text in GRAMMAR.apply_batch(texts)]
+
+
+def keyword_sentiment(text: str) -> Dict[str, object]:
+    """Positive / negative / neutral by keyword counts (the fallback when no model answers)."""
+    counts = SENTIMENT_KEYWORDS.count(text)
+    if counts['positive'] > counts['negative']:
+        return {"sentiment": "positive", "confidence": 0.6, "method": "keyword_fallback"}
+    if counts['negative'] > counts['positive']:
+        return {"sentiment": "negative", "confidence": 0.6, "method": "keyword_fallback"}
+    return {"sentiment": "neutral", "confidence": 0.5, "method": "keyword_fallback"}
+
+
+def keyword_sentiment_batch(texts: Iterable[str]) -> List[Dict[str, object]]:
+    return [keyword_sentiment(text) for text in texts]
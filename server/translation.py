@@ -0,0 +1,97 @@
+"""Stored translations of chat messages, one per (message_id, target_language).
+
+A message is translated at most once per language: results are kept in the
+``message_translation`` side table (created by schema.py) and read back on
+later requests, from any worker. ``translate_messages`` handles a whole page
+of history at once. Stored translations are one query, and every message
+still missing goes to the model in a single batched call.
+"""
+import logging
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+UPSERT_SQL = """
+    INSERT INTO message_translation (message_id, target_language, translated_text)
+    VALUES (%s, %s, %s)
+    ON DUPLICATE KEY UPDATE translated_text = VALUES(translated_text)
+"""
+
+
+def _placeholders(values) -> str:
+    return ", ".join(["%s"] * len(values))
+
+
+def load_translations(cursor, chat_id: str, message_ids: List[str], target_language: str) -> Dict[str, str]:
+    """Stored translations of the chat's messages ``message_ids``, keyed by message_id."""
+    if not message_ids:
+        return {}
+    cursor.execute(f"""
+        SELECT mt.message_id, mt.translated_text
+        FROM message_translation mt
+        JOIN chatmessage cm ON cm.message_id = mt.message_id
+        WHERE mt.target_language = %s AND cm.chat_id = %s AND mt.message_id IN ({_placeholders(message_ids)})
+    """, (target_language, chat_id, *message_ids))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+
+def save_translations(cursor, target_language: str, translations: Dict[str, str]):
+    """Store ``{message_id: translated_text}`` (caller commits)."""
+    cursor.executemany(UPSERT_SQL, [
+        (message_id, target_language, text) for message_id, text in translations.items()
+    ])
+
+
+def _load_messages(cursor, chat_id: str, message_ids: List[str]) -> List[tuple]:
+    """(message_id, message, stored language) of the ids that belong to the chat"""
+    cursor.execute(f"""
+        SELECT cm.message_id, cm.message, ma.language
+        FROM chatmessage cm
+        LEFT JOIN message_analysis ma ON ma.message_id = cm.message_id
+        WHERE cm.chat_id = %s AND cm.message_id IN ({_placeholders(message_ids)})
+    """, (chat_id, *message_ids))
+    return cursor.fetchall()
+
+
+def translate_messages(connection, chat_id: str, message_ids: List[str], target_language: str,
+                       translate_batch: Callable[[List[str]], Optional[List[Optional[str]]]]) -> Dict[str, str]:
+    """Translations of the chat's messages ``message_ids`` into ``target_language``.
+
+    ``translate_batch(texts)`` returns one translation per text, None for a
+    text it could not translate. Those are left out of the result and are
+    not stored, so they are retried next time. Ids that are not in the chat
+    are ignored. Messages without text, or already in the target language,
+    map to their original text.
+    """
+    message_ids = list(dict.fromkeys(message_ids))
+    if not message_ids:
+        return {}
+
+    cursor = connection.cursor()
+    try:
+        translations = load_translations(cursor, chat_id, message_ids, target_language)
+        missing = [message_id for message_id in message_ids if message_id not in translations]
+        if not missing:
+            return translations
+
+        pending = {}
+        for message_id, text, language in _load_messages(cursor, chat_id, missing):
+            if not (text or "").strip() or language == target_language:
+                translations[message_id] = text or ""
+            else:
+                pending[message_id] = text
+        if not pending:
+            return translations
+
+        translated = translate_batch(list(pending.values())) or [None] * len(pending)
+        fresh = {
+            message_id: text
+            for message_id, text in zip(pending, translated) if text
+        }
+        if fresh:
+            save_translations(cursor, target_language, fresh)
+            connection.commit()
+        translations.update(fresh)
+        return translations
+    finally:
+        cursor.close()